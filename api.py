@@ -0,0 +1,403 @@
+#!/usr/bin/env python3
+"""
+Asynchronous HTTP API for DDM valuations.
+
+Serves the page's default valuation (valuation.value_stock) to other
+services, next to the Streamlit UI in the same image. Only the standard
+library's asyncio is used; like the CLI, this never imports streamlit or
+plotly.
+
+Endpoints (JSON in and out):
+
+    GET  /health                   liveness, tickers in flight, market inputs
+    GET  /value/<TICKER>           one result row (valuation.RESULT_FIELDS) and "market"
+    POST /value                    {"tickers": [...]} -> {"results": [...], "market": {...}}, in request order
+    GET  /metrics                  Prometheus counters and histograms (with --metrics)
+
+Valuation options go in the query string of GET /value/<TICKER> or in the
+POST body: ``long_term_growth``, ``cost_of_equity`` (default: CAPM from each
+ticker's beta) and ``years``. Tickers that cannot be valued come back as
+rows with ``error`` set, with status 200.
+
+The market-wide inputs come from the background warmer (warmup.py), never
+from the request path. ``market`` in each response gives them with their
+``source`` ("live", or "default" when no refresh has succeeded yet), the
+time the data was fetched, its age in seconds and whether it is stale.
+
+- The event loop never blocks on the network: fetches run on a fixed pool
+  of threads behind a shared token bucket, with retries, and concurrent
+  requests for the same ticker share one fetch. The fundamentals cache and
+  yfinance's per-process HTTP session are shared by the whole pool. The
+  fetched tickers of a request are then valued as one batch on the same
+  pool, so large requests do not hold up the others either.
+- Clients can keep connections open (HTTP/1.1 keep-alive) and send
+  requests one after another on them.
+- Backpressure: at most ``max_pending`` tickers are admitted at a time;
+  beyond that requests get 503 with Retry-After instead of queueing without
+  bound, and responses are only written as fast as the client reads them.
+
+Usage:
+    ddm-api --port 8080
+    ddm-api --replay fixtures/ --latency 0.05      # offline, e.g. for benchmarks/bench_api.py
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from collections import namedtuple
+from contextlib import ExitStack
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+from ddm_core import FORECAST_YEARS, partial_year_fraction
+from fetch_pipeline import DEFAULT_RATE, DEFAULT_WORKERS, TokenBucket, with_retries
+from instrumentation import REGISTRY, enable_metrics, increment, observe
+from market_data import fetch_stock_data, use_provider
+from providers import ReplayProvider
+from valuation import DEFAULT_LONG_TERM_GROWTH, RESULT_FIELDS, value_stocks
+from warmup import MARKET_WARMUP_WAIT, get_market_warmer
+
+DEFAULT_PORT = 8080
+DEFAULT_MAX_PENDING = 2000      # tickers admitted at once
+MAX_BATCH = 1000                # tickers per POST /value
+MAX_BODY_BYTES = 1024 * 1024
+MAX_HEADERS = 100
+KEEP_ALIVE_TIMEOUT = 15.0       # seconds an idle connection is kept open
+
+Request = namedtuple("Request", ["method", "path", "query", "headers", "body", "keep_alive"])
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message, headers=()):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers
+
+
+async def read_request(reader):
+    """The next request on a connection, or None when the client closed it"""
+    try:
+        line = await reader.readline()
+        if not line:
+            return None
+        method, target, version = line.decode("latin-1").rstrip("\r\n").split(" ")
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            if len(headers) >= MAX_HEADERS:
+                raise HTTPError(431, "too many headers")
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+    except (ValueError, UnicodeDecodeError):
+        # Also raised by readline for lines over the stream's limit
+        raise HTTPError(400, "malformed request") from None
+
+    if "chunked" in headers.get("transfer-encoding", ""):
+        raise HTTPError(411, "chunked request bodies are not supported, send Content-Length")
+    try:
+        length = int(headers.get("content-length", 0))
+    except ValueError:
+        raise HTTPError(400, "invalid Content-Length") from None
+    if length > MAX_BODY_BYTES:
+        raise HTTPError(413, f"request body over {MAX_BODY_BYTES} bytes")
+    body = await reader.readexactly(length) if length else b""
+
+    connection = headers.get("connection", "").lower()
+    keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+    url = urlsplit(target)
+    return Request(method, unquote(url.path), dict(parse_qsl(url.query)), headers, body, keep_alive)
+
+
+def encode_response(status, body, content_type="application/json", keep_alive=True, headers=()):
+    if not isinstance(body, bytes):
+        body = (json.dumps(body) if content_type == "application/json" else body).encode("utf-8")
+    lines = [f"HTTP/1.1 {status} {HTTPStatus(status).phrase}",
+             f"Content-Type: {content_type}",
+             f"Content-Length: {len(body)}",
+             f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+    lines.extend(f"{name}: {value}" for name, value in headers)
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body
+
+
+def valuation_options(params):
+    """(long_term_growth, k_e, years) from query parameters or a JSON body"""
+    try:
+        long_term_growth = float(params.get("long_term_growth", DEFAULT_LONG_TERM_GROWTH))
+        k_e = params.get("cost_of_equity")
+        k_e = None if k_e is None else float(k_e)
+        years = int(params.get("years", FORECAST_YEARS))
+    except (TypeError, ValueError):
+        raise HTTPError(400, "long_term_growth and cost_of_equity must be numbers, years an integer") from None
+    if years < 1:
+        raise HTTPError(400, "years must be at least 1")
+    return long_term_growth, k_e, years
+
+
+class ValuationService:
+    """
+    Values tickers for the HTTP handlers without blocking the event loop.
+
+    ``fetch`` is called as ``fetch(ticker, limiter=...)`` on the worker
+    threads, like in fetch_pipeline. The market inputs are read from
+    ``warmer`` (default: the process-wide MarketWarmer).
+    """
+
+    def __init__(self, max_workers=DEFAULT_WORKERS, rate=DEFAULT_RATE, retries=3, backoff=0.5,
+                 max_pending=DEFAULT_MAX_PENDING, fetch=fetch_stock_data, warmer=None):
+        self.fetch_fn = fetch
+        self.retries = retries
+        self.backoff = backoff
+        self.max_pending = max_pending
+        self.limiter = TokenBucket(rate)
+        self.pending = 0
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ddm-api-fetch")
+        self._inflight = {}     # ticker -> Future of the fetch in progress
+        self._warmer = warmer
+
+    @property
+    def warmer(self):
+        if self._warmer is None:
+            self._warmer = get_market_warmer()
+        return self._warmer
+
+    async def market_snapshot(self):
+        """
+        The warmer's latest snapshot. Only right after the process starts do
+        requests wait, up to MARKET_WARMUP_WAIT seconds, for its first refresh.
+        """
+        warmer = self.warmer
+        if not warmer.wait_ready(0):
+            await asyncio.get_running_loop().run_in_executor(self._executor, warmer.wait_ready, MARKET_WARMUP_WAIT)
+        return warmer.snapshot()
+
+    def describe_market(self, snapshot):
+        """The market inputs of ``snapshot`` and where they come from, for a response"""
+        return dict(snapshot.inputs._asdict(), source=snapshot.source, fetched_at=snapshot.fetched_at,
+                    age=snapshot.age(), stale=snapshot.is_stale(self.warmer.max_age))
+
+    def _fetch(self, ticker):
+        return with_retries(lambda: self.fetch_fn(ticker, limiter=self.limiter),
+                            retries=self.retries, backoff=self.backoff)
+
+    async def fetch(self, ticker):
+        """Fundamentals of ``ticker``; concurrent callers for the same ticker share one fetch"""
+        future = self._inflight.get(ticker)
+        if future is None:
+            future = asyncio.get_running_loop().run_in_executor(self._executor, self._fetch, ticker)
+            self._inflight[ticker] = future
+            future.add_done_callback(lambda done: self._inflight.pop(ticker, None)
+                                     if self._inflight.get(ticker) is done else None)
+        # A client that disconnects must not cancel the fetch for the others
+        return await asyncio.shield(future)
+
+    async def _fetch_or_error(self, ticker):
+        try:
+            return await self.fetch(ticker)
+        except Exception as e:
+            return e
+
+    async def value_many(self, tickers, long_term_growth=DEFAULT_LONG_TERM_GROWTH, k_e=None,
+                         years=FORECAST_YEARS):
+        """
+        (dicts with RESULT_FIELDS in the order of ``tickers``, market snapshot
+        used); fetch failures are reported in ``error``. The fetched tickers
+        are valued in one batch on the worker threads.
+        """
+        tickers = [ticker.strip().upper() for ticker in tickers]
+        snapshot = await self.market_snapshot()
+        fetched = await asyncio.gather(*(self._fetch_or_error(ticker) for ticker in tickers))
+        ok = [i for i, data in enumerate(fetched) if not isinstance(data, Exception)]
+        year_fraction, _ = partial_year_fraction()
+        valued = await asyncio.get_running_loop().run_in_executor(
+            self._executor, value_stocks, [tickers[i] for i in ok], [fetched[i] for i in ok], snapshot.inputs,
+            long_term_growth, k_e, year_fraction, years)
+        rows = []
+        valued = iter(valued)
+        for ticker, data in zip(tickers, fetched):
+            if isinstance(data, Exception):
+                row = dict.fromkeys(RESULT_FIELDS)
+                row.update(ticker=ticker, error=str(data))
+            else:
+                row = next(valued)
+            rows.append(row)
+        return rows, snapshot
+
+    async def value(self, ticker, long_term_growth=DEFAULT_LONG_TERM_GROWTH, k_e=None, years=FORECAST_YEARS):
+        """(dict with RESULT_FIELDS for ``ticker``, market snapshot used)"""
+        rows, snapshot = await self.value_many([ticker], long_term_growth, k_e, years)
+        return rows[0], snapshot
+
+    def admit(self, count):
+        """Reserve room for ``count`` tickers or raise a 503"""
+        if self.pending + count > self.max_pending:
+            increment("ddm_api_rejected_total")
+            raise HTTPError(503, "too many tickers in flight, retry shortly", headers=[("Retry-After", "1")])
+        self.pending += count
+
+    def release(self, count):
+        self.pending -= count
+
+    async def route(self, request):
+        """(status, body, content type) for ``request``; raises HTTPError"""
+        if request.path == "/health":
+            market = self.describe_market(self.warmer.snapshot())
+            return 200, {"status": "ok", "pending": self.pending, "market_inputs": market}, "application/json"
+        if request.path == "/metrics":
+            return 200, REGISTRY.render_prometheus(), "text/plain; version=0.0.4"
+
+        if request.path.startswith("/value/") and request.method in ("GET", "HEAD"):
+            ticker = request.path[len("/value/"):]
+            if not ticker.strip() or "/" in ticker:
+                raise HTTPError(404, "expected /value/<TICKER>")
+            options = valuation_options(request.query)
+            self.admit(1)
+            try:
+                row, snapshot = await self.value(ticker, *options)
+                return 200, dict(row, market=self.describe_market(snapshot)), "application/json"
+            finally:
+                self.release(1)
+
+        if request.path == "/value":
+            if request.method != "POST":
+                raise HTTPError(405, "use POST /value with a JSON body, or GET /value/<TICKER>",
+                                headers=[("Allow", "POST")])
+            try:
+                payload = json.loads(request.body or b"{}")
+            except ValueError:
+                raise HTTPError(400, "request body is not valid JSON") from None
+            tickers = payload.get("tickers") if isinstance(payload, dict) else None
+            if not isinstance(tickers, list) or not all(isinstance(t, str) and t.strip() for t in tickers):
+                raise HTTPError(400, 'expected {"tickers": ["WMT", ...]}')
+            if len(tickers) > MAX_BATCH:
+                raise HTTPError(413, f"at most {MAX_BATCH} tickers per request")
+            options = valuation_options(payload)
+            self.admit(len(tickers))
+            try:
+                rows, snapshot = await self.value_many(tickers, *options)
+                return 200, {"results": rows, "market": self.describe_market(snapshot)}, "application/json"
+            finally:
+                self.release(len(tickers))
+
+        raise HTTPError(404, f"no route for {request.path}")
+
+    async def handle(self, reader, writer):
+        """Serve the requests of one connection until the client closes it or goes idle"""
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(read_request(reader), KEEP_ALIVE_TIMEOUT)
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+                    break
+                except HTTPError as e:
+                    writer.write(encode_response(e.status, {"error": str(e)}, keep_alive=False, headers=e.headers))
+                    await writer.drain()
+                    break
+                if request is None:
+                    break
+
+                start = time.perf_counter()
+                headers = ()
+                try:
+                    status, body, content_type = await self.route(request)
+                except HTTPError as e:
+                    status, body, content_type, headers = e.status, {"error": str(e)}, "application/json", e.headers
+                route = request.path.split("/")[1] or "/"
+                increment("ddm_api_requests_total", route=route, status=str(status))
+                observe("ddm_api_request_seconds", time.perf_counter() - start, route=route)
+
+                response = encode_response(status, body, content_type, request.keep_alive, headers)
+                if request.method == "HEAD":
+                    response = response[:response.index(b"\r\n\r\n") + 4]
+                writer.write(response)
+                # Waits while the client is not reading, instead of buffering responses without bound
+                await writer.drain()
+                if not request.keep_alive:
+                    break
+        except (ConnectionError, asyncio.CancelledError):
+            # Client went away, or the server is shutting down with this connection open
+            pass
+        finally:
+            writer.close()
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+
+async def start_server(service, host="127.0.0.1", port=DEFAULT_PORT):
+    """Listen for connections; returns the asyncio server (port 0 picks a free port)"""
+    return await asyncio.start_server(service.handle, host, port, backlog=1024)
+
+
+async def serve(service, host, port):
+    server = await start_server(service, host, port)
+    address = server.sockets[0].getsockname()
+    print(f"DDM valuation API listening on http://{address[0]}:{address[1]}", file=sys.stderr, flush=True)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.close()
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="ddm-api",
+        description="Serve Dividend Discount Model valuations over HTTP. "
+                    "For the web interface run: streamlit run app.py")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", DEFAULT_PORT)),
+                        help=f"port to listen on (default: $PORT or {DEFAULT_PORT})")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help=f"concurrent fetch threads (default: {DEFAULT_WORKERS})")
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE,
+                        help=f"maximum network requests per second (default: {DEFAULT_RATE:g})")
+    parser.add_argument("--retries", type=int, default=3, help="retries per ticker (default: 3)")
+    parser.add_argument("--max-pending", type=int, default=DEFAULT_MAX_PENDING,
+                        help=f"tickers in flight before requests are refused with 503 "
+                             f"(default: {DEFAULT_MAX_PENDING})")
+    parser.add_argument("--cache-dir", help="directory for the on-disk caches (default: $DDM_CACHE_DIR "
+                                            "or ~/.cache/ddm-calculator)")
+    parser.add_argument("--replay", metavar="DIR",
+                        help="serve market data from recorded fixtures in DIR instead of Yahoo Finance, cached in "
+                             "a provider/ subdirectory of --cache-dir or else a temporary directory")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="with --replay, seconds of simulated latency per request (default: 0)")
+    parser.add_argument("--jitter", type=float, default=0.0,
+                        help="with --replay, extra uniformly random latency up to this many seconds (default: 0)")
+    parser.add_argument("--failure-rate", type=float, default=0.0,
+                        help="with --replay, probability that a request fails (default: 0)")
+    parser.add_argument("--seed", type=int, help="with --replay, seed for the latency and failure draws")
+    parser.add_argument("--metrics", action="store_true",
+                        help="collect Prometheus-format counters and timing histograms and serve them at /metrics")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.cache_dir:
+        # Read when the default cache and history store are first created
+        os.environ["DDM_CACHE_DIR"] = args.cache_dir
+    if args.metrics:
+        enable_metrics()
+    with ExitStack() as stack:
+        if args.replay:
+            stack.enter_context(use_provider(ReplayProvider(args.replay, latency=args.latency, jitter=args.jitter,
+                                                            failure_rate=args.failure_rate, seed=args.seed),
+                                             args.cache_dir))
+        service = ValuationService(max_workers=args.workers, rate=args.rate, retries=args.retries,
+                                   max_pending=args.max_pending)
+        try:
+            asyncio.run(serve(service, args.host, args.port))
+        except KeyboardInterrupt:
+            pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,12 +1,19 @@
 import streamlit as st
-import datetime
-from datetime import datetime, timedelta
-from dateutil.relativedelta import relativedelta
-import yfinance as yf
-import pandas as pd
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 import numpy as np
-import plotly.graph_objects as go
-import plotly.express as px
+
+from betas import DEFAULT_BETA_WINDOW
+from charts import counts_figure, report_figure
+from ddm_core import FORECAST_YEARS, partial_year_fraction, schedule_implied_cost_of_equity
+from fundamentals_cache import get_default_cache
+from instrumentation import REGISTRY, metrics_enabled, stage, start_trace, stop_trace, summarize_trace
+from monte_carlo import simulate_intrinsic_value
+from market_data import fetch_stock_data, get_rolling_beta
+from page_widgets import chart_panel
+from result_cache import get_result_cache
+from warmup import MARKET_WARMUP_WAIT, get_market_warmer
 
 # Page configuration
 st.set_page_config(
@@ -24,96 +31,106 @@ if 'custom_lt_growth' not in st.session_state:
     st.session_state.custom_lt_growth = True
 if 'custom_ke' not in st.session_state:
     st.session_state.custom_ke = True
+if 'ticker_data' not in st.session_state:
+    st.session_state.ticker_data = {}
+if 'rolling_betas' not in st.session_state:
+    st.session_state.rolling_betas = {}
 
 # Title and description
 st.title("📈 Dividend Discount Model Calculator")
-st.markdown("**5-Year Dividend Discount Model for Equity Valuation**")
+st.markdown("**Multi-Year Dividend Discount Model for Equity Valuation**")
 st.markdown("*This tool assumes annual fiscal year end and dividend payment date of 31 December*")
 
+# Starts refreshing the market-wide inputs in the background as soon as the first session opens
+get_market_warmer()
+
 # Sidebar for inputs
 st.sidebar.header("📊 Model Parameters")
 st.sidebar.markdown("*Adjust the parameters below to customize the model*")
 
-def perpetuity_pv(cash_flow, growth_rate, discount_rate):    
-    perpetuity_pv = cash_flow*(1+growth_rate) / (discount_rate - growth_rate)
-    return perpetuity_pv
-
-def get_stock_data(ticker):
+def get_stock_data(ticker, refresh=False):
     try:
-        ticker_find = yf.Ticker(ticker)
-        info = ticker_find.info
-
-        def safe_timestamp(ts):
-            return datetime.fromtimestamp(ts) if ts else None
-
-        book = info.get('bookValue')
-        shares = info.get('sharesOutstanding')
-
-        data = {
-            "Company Name": info.get('longName'), 
-            "Next Dividend Date (datetime)": safe_timestamp(info.get('dividendDate')),
-            "Net Income (last FY)": info.get('netIncomeToCommon'),
-            "Book Value per Share": book,
-            "Shares Outstanding": shares,
-            "Total Book Value (equity est.)": book * shares if book and shares else None,
-            "Dividend Per Share (forward)": info.get('dividendRate'),
-            "Dividend Per Share (trailing)": info.get('trailingAnnualDividendRate'),
-            "Beta": info.get('beta'),
-            "Return on Equity (ROE)": info.get('returnOnEquity'),
-            "Dividend Payout Ratio": info.get('payoutRatio'),
-            "Last Stock Price": info.get('currentPrice')
-        }
-        return data
+        return fetch_stock_data(ticker, refresh=refresh)
     except Exception as e:
         st.error(f"Error fetching data for {ticker}: {str(e)}")
         return None
 
-def get_risk_free_rate():
-    try:
-        tnx = yf.Ticker("^TNX")
-        hist = tnx.history(period="5d")
-        latest_raw = hist['Close'].iloc[-1]
-        latest_yield = latest_raw / 100
-        return latest_yield
-    except:
-        return 0.0422  # Default fallback
+def adjustment_for_partial_year():
+    """Fraction of the year left until the 31 December dividend date, and that date"""
+    # From the start of today, so every session on the same day can share cached valuations
+    today = datetime.today().replace(hour=0, minute=0, second=0, microsecond=0)
+    return partial_year_fraction(today)
 
-def get_equity_returns():
-    try:
-        one_year = timedelta(days=365, hours=5, minutes=49, seconds=12)
-        sp500 = yf.Ticker("^SP500TR")
-        hist = sp500.history(period="max")
-        
-        end_close = hist['Close'].iloc[-1]
-        start_close = hist['Close'].iloc[0]
+def load_valuation_inputs(ticker, refresh=False):
+    """
+    Fetch the data for ``ticker`` into the session, reusing whatever this
+    session already fetched unless ``refresh`` is set. The market-wide
+    inputs come from the background warmer; ``refresh`` also refetches them.
+    """
+    fetch_ticker = refresh or ticker not in st.session_state.ticker_data
+    warmer = get_market_warmer()
+    
+    # Refetch the market-wide inputs in the background while the stock data loads
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        market_future = (pool.submit(contextvars.copy_context().run, warmer.refresh, True)
+                         if refresh else None)
+        if fetch_ticker:
+            with stage("stock_data"):
+                data = get_stock_data(ticker, refresh=refresh)
+            if data is not None:
+                with stage("adjustment_for_partial_year"):
+                    partial_year = adjustment_for_partial_year()
+                # The fetch time of the cached fundamentals versions every valuation made from them
+                data_version = get_default_cache().fetched_at(ticker)
+                if refresh:
+                    get_result_cache().invalidate(ticker)
+                st.session_state.ticker_data[ticker] = (data, partial_year, data_version)
+        if market_future is not None:
+            market_future.result()
+    with stage("market_inputs_wait"):
+        warmer.wait_ready(MARKET_WARMUP_WAIT)
 
-        cagr = ((end_close / start_close) ** (1/((hist.index[-1] - hist.index[0])/one_year)))-1
-        return cagr
-    except:
-        return 0.1119  # Default fallback
+def show_market_freshness(snapshot, max_age):
+    """Where the market inputs come from and how old they are"""
+    if snapshot.source == "default":
+        st.warning("⚠️ Live market data unavailable; using the default risk-free rate and market return.")
+        return
+    fetched = datetime.fromtimestamp(snapshot.fetched_at)
+    if snapshot.is_stale(max_age):
+        st.warning(f"⚠️ Market inputs are stale (last fetched {fetched:%Y-%m-%d %H:%M}).")
+    else:
+        st.caption(f"Market inputs as of {fetched:%H:%M} ({snapshot.age() / 60:.0f} min ago)")
 
-def adjustment_for_partial_year(ticker):
-    today = datetime.today()
-    year = today.year
-    
-    try:
-        ticker_find = yf.Ticker(ticker)
-        info = ticker_find.info
+def show_performance(trace, chart_sizes=None):
+    """Expander with the time spent in each stage of this run"""
+    with st.expander("⏱️ Performance", expanded=False):
+        summary = summarize_trace(trace)
+        if not summary:
+            st.markdown("*Nothing was timed in this run.*")
+            return
         
-        def safe_timestamp(ts):
-            return datetime.fromtimestamp(ts) if ts else None
-
-        end = datetime(year, 12, 31)
-        one_year = timedelta(days=365, hours=5, minutes=49, seconds=12)
+        import pandas as pd
+        
+        stages_df = pd.DataFrame(
+            [(name, total * 1000, calls) for name, (total, calls) in summary.items()],
+            columns=['Stage', 'Time (ms)', 'Calls']
+        )
+        st.dataframe(stages_df.round({'Time (ms)': 2}), use_container_width=True)
         
-        try:
-            year_frac = (end-today)/one_year
-        except TypeError:
-            return None, None
+        if chart_sizes:
+            sizes = ", ".join(f"{name} {size / 1024:,.1f} KB" for name, size in chart_sizes.items() if size)
+            st.markdown(f"**Chart payloads:** {sizes}")
         
-        return year_frac, end
-    except:
-        return 0.5, datetime(year, 12, 31)  # Default fallback
+        cache_stats = get_default_cache().stats()
+        st.markdown(f"**Fundamentals cache:** {cache_stats['hits']} hits, {cache_stats['misses']} misses, "
+                    f"{cache_stats['entries']} entries")
+        result_stats = get_result_cache().stats()
+        st.markdown(f"**Result cache (all sessions):** {result_stats['hits']} hits, {result_stats['misses']} misses, "
+                    f"{result_stats['coalesced']} coalesced, {result_stats['entries']} entries "
+                    f"({result_stats['bytes'] / 1e6:.1f} MB)")
+        
+        if metrics_enabled():
+            st.code(REGISTRY.render_prometheus(), language="text")
 
 # Main app logic
 def main():
@@ -148,13 +165,23 @@ def main():
     else:
         k_e = 0.10  # Will be calculated later
     
+    beta_from_history = st.sidebar.checkbox("Estimate Beta from Price History", value=False,
+                                            help="Regress the stock's daily returns on the S&P 500 total return "
+                                                 "instead of using Yahoo Finance's beta")
+    if beta_from_history:
+        beta_window = int(st.sidebar.number_input("Beta Window (trading days)", value=DEFAULT_BETA_WINDOW,
+                                                  min_value=20, max_value=2520, step=21))
+    
+    forecast_years = int(st.sidebar.number_input("Forecast Horizon (years)", value=FORECAST_YEARS,
+                                                 min_value=1, max_value=50, step=1))
+    
     # Handle the three mutually exclusive approaches
     if approach == "Use Custom Cash Flows":
         st.sidebar.subheader("Custom Cash Flows")
         st.sidebar.markdown("*Enter your dividend projections. Growth rates will be calculated automatically.*")
         
         cf_list = []
-        for i in range(1, 6):
+        for i in range(1, forecast_years + 1):
             cf = st.sidebar.number_input(f"Year {i} Dividend ($)", 
                                        value=1.0, format="%.2f", min_value=0.0, key=f"cf_{i}")
             cf_list.append(cf)
@@ -179,224 +206,239 @@ def main():
         cf_list = None  # Will be calculated later
         div_growth_from_prev = None  # Will be calculated later
     
-    if st.button("Calculate Valuation", type="primary"):
-        if ticker:
-            with st.spinner("Fetching market data and calculating valuation..."):
-                # Get market data
-                risk_free_rate = get_risk_free_rate()
-                sp500_cagr = get_equity_returns()
-                market_risk_premium = sp500_cagr - risk_free_rate
-                
-                # Get stock data
-                data = get_stock_data(ticker)
-                
-                if data is None:
-                    st.error("Could not fetch data for this ticker. Please check the ticker symbol.")
-                    return
-                
-                # Extract key metrics
-                roe = data['Return on Equity (ROE)']
-                div_payout = data['Dividend Payout Ratio']
-                near_term_div_growth = roe * (1 - div_payout)
-                next_date = data['Next Dividend Date (datetime)']
-                latest_dividend = data["Dividend Per Share (trailing)"]
-                beta = data['Beta']
-                last_price = data['Last Stock Price']
-                name = data['Company Name']
-                
-                # Use calculated cost of equity if not custom
-                if not custom_ke:
-                    k_e = risk_free_rate + beta * (market_risk_premium)
-                
-                year_fraction, div_payment_date = adjustment_for_partial_year(ticker)
-                
-                # Display company info
-                st.header(f"📋 {name}")
-                
-                # Create columns for metrics
-                col1, col2, col3 = st.columns(3)
-                
-                with col1:
-                    st.metric("Current Stock Price", f"${last_price:,.2f}")
-                    st.metric("Trailing Dividend", f"${latest_dividend:,.2f}")
-                    st.metric("Beta", f"{beta:.3f}")
-                
-                with col2:
-                    st.metric("ROE", f"{roe*100:.2f}%")
-                    st.metric("Payout Ratio", f"{div_payout*100:.2f}%")
-                    st.metric("Calculated Growth", f"{near_term_div_growth*100:.2f}%")
-                
-                with col3:
-                    st.metric("Risk-free Rate", f"{risk_free_rate*100:.2f}%")
-                    st.metric("Market Risk Premium", f"{market_risk_premium*100:.2f}%")
-                    st.metric("Cost of Equity", f"{k_e*100:.2f}%")
-                
-                # Warning for non-dividend stocks
-                if next_date is None:
-                    st.warning("⚠️ This stock does not pay a dividend. Consider using a different valuation method.")
-                
-                # Handle cash flows based on approach
-                if approach == "Use Custom Cash Flows":
-                    # Use the custom cash flows entered by user
-                    # Calculate growth rates from the custom cash flows
-                    div_growth_from_prev = [(cf_list[0] - latest_dividend) / latest_dividend]
-                    div_growth_from_prev += [(cf_list[i] - cf_list[i - 1]) / cf_list[i - 1] for i in range(1, len(cf_list))]
-                    
-                    # Display the calculated growth rates
-                    st.sidebar.markdown("**Calculated Growth Rates:**")
-                    for i, growth in enumerate(div_growth_from_prev):
-                        st.sidebar.markdown(f"Year {i+1}: {growth*100:.2f}%")
-                    
-                elif approach == "Use Custom Short-term Growth":
-                    # Calculate cash flows using the custom growth rate
-                    cf_list = [latest_dividend * (1 + short_term_growth) ** i for i in range(1, 6)]
-                    div_growth_from_prev = [short_term_growth] * 5
-                    
-                    # Display the calculated cash flows
-                    st.sidebar.markdown("**Calculated Cash Flows:**")
-                    for i, cf in enumerate(cf_list):
-                        st.sidebar.markdown(f"Year {i+1}: ${cf:.2f}")
-                        
-                else:  # Use Default Growth (ROE × Plowback)
-                    # Calculate cash flows using the default growth rate
-                    cf_list = [latest_dividend * (1 + near_term_div_growth) ** i for i in range(1, 6)]
-                    div_growth_from_prev = [near_term_div_growth] * 5
-                    
-                    # Display the calculated cash flows
-                    st.sidebar.markdown("**Calculated Cash Flows:**")
-                    for i, cf in enumerate(cf_list):
-                        st.sidebar.markdown(f"Year {i+1}: ${cf:.2f}")
-                
-                # Calculate valuation
-                periods = [1, 2, 3, 4, 5]
-                adjustment_for_partial_year_list = [year_fraction, 1.0, 1.0, 1.0, 1.0]
-                
-                terminal_value = [0] * 5
-                perp_cf = cf_list[-1]
-                term_val = perpetuity_pv(perp_cf, long_term_growth, k_e)
-                terminal_value[-1] = term_val
-                
-                dividend_dates = [div_payment_date, 
-                                div_payment_date + relativedelta(years=1), 
-                                div_payment_date + relativedelta(years=2), 
-                                div_payment_date + relativedelta(years=3), 
-                                div_payment_date + relativedelta(years=4)]
-                
-                periods_to_discount = [year_fraction, 1 + year_fraction, 2 + year_fraction, 3 + year_fraction, 4 + year_fraction]
-                
-                adjusted_cash_flows = [a*b for a, b in zip(cf_list, adjustment_for_partial_year_list)]
-                in_period_sum = [sum(x) for x in zip(adjusted_cash_flows, terminal_value)]
-                period_pv = [a/(1+k_e)**b for a, b in zip(in_period_sum, periods_to_discount)]
-                
-                # Create results dataframe
-                cash_flow_table = pd.DataFrame({
-                    'Periods': periods, 
-                    'Dividend Date': dividend_dates, 
-                    'Periods to Discount': periods_to_discount, 
-                    'Dividend Cash Flows': cf_list,
-                    'Dividend Growth from Previous': div_growth_from_prev,
-                    'Adjustment for Partial Year': adjustment_for_partial_year_list,
-                    'Adjusted Dividend Cash Flow': adjusted_cash_flows,
-                    'Terminal Value': terminal_value,
-                    'Period Sum': in_period_sum,
-                    'Period PV': period_pv
-                })
-                
-                cash_flow_table = cash_flow_table.set_index('Periods')
-                stock_value = cash_flow_table['Period PV'].sum()
-                
-                # Display results
-                st.header("📊 Valuation Results")
-                
-                col1, col2, col3 = st.columns(3)
-                with col1:
-                    st.metric("Intrinsic Value", f"${stock_value:,.2f}")
-                with col2:
-                    st.metric("Current Price", f"${last_price:,.2f}")
-                with col3:
-                    if stock_value > last_price:
-                        st.metric("Recommendation", "BUY", delta="Undervalued")
-                    elif stock_value < last_price:
-                        st.metric("Recommendation", "SELL", delta="Overvalued", delta_color="inverse")
-                    else:
-                        st.metric("Recommendation", "HOLD", delta="Fair Value")
-                
-                # Display cash flow table - TRANSPOSED like in original code
-                st.subheader("📋 Cash Flow Analysis")
-                
-                # Create a clean version of the table for display
-                display_table = cash_flow_table.copy()
-                
-                # Convert dates to strings to avoid Arrow serialization issues
-                display_table['Dividend Date'] = display_table['Dividend Date'].astype(str)
-                
-                # Round numeric columns
-                numeric_columns = ['Dividend Cash Flows', 'Dividend Growth from Previous', 
-                                 'Adjustment for Partial Year', 'Adjusted Dividend Cash Flow',
-                                 'Terminal Value', 'Period Sum', 'Period PV']
-                
-                for col in numeric_columns:
-                    if col in display_table.columns:
-                        display_table[col] = display_table[col].round(2)
-                
-                # Display the transposed table
-                st.dataframe(display_table.T, use_container_width=True)
-                
-                # Create visualization
-                st.subheader("📈 Cash Flow Visualization")
-                
-                # Prepare data for plotting
-                plot_data = cash_flow_table.reset_index()
-                
-                fig = go.Figure()
-                
-                # Add dividend cash flows
-                fig.add_trace(go.Bar(
-                    x=plot_data['Periods'],
-                    y=plot_data['Dividend Cash Flows'],
-                    name='Dividend Cash Flows',
-                    marker_color='lightblue'
-                ))
-                
-                # Add terminal value
-                fig.add_trace(go.Bar(
-                    x=plot_data['Periods'],
-                    y=plot_data['Terminal Value'],
-                    name='Terminal Value',
-                    marker_color='orange'
-                ))
-                
-                # Add present values
-                fig.add_trace(go.Scatter(
-                    x=plot_data['Periods'],
-                    y=plot_data['Period PV'],
-                    mode='lines+markers',
-                    name='Present Value',
-                    line=dict(color='red', width=3)
-                ))
-                
-                fig.update_layout(
-                    title="Cash Flow Breakdown by Period",
-                    xaxis_title="Period",
-                    yaxis_title="Value ($)",
-                    barmode='stack',
-                    height=500
-                )
-                
-                st.plotly_chart(fig, use_container_width=True)
-                
-                # Summary statistics
-                st.subheader("📊 Summary Statistics")
-                summary_stats = {
-                    "Total Present Value": f"${stock_value:,.2f}",
-                    "Current Market Price": f"${last_price:,.2f}",
-                    "Valuation Difference": f"${stock_value - last_price:,.2f}",
-                    "Valuation Ratio": f"{stock_value/last_price:.2f}",
-                    "Implied Return": f"{((stock_value/last_price)**(1/5) - 1)*100:.2f}%"
-                }
-                
-                summary_df = pd.DataFrame(list(summary_stats.items()), columns=['Metric', 'Value'])
-                st.dataframe(summary_df, use_container_width=True)
+    # Monte Carlo simulation (optional)
+    st.sidebar.subheader("Monte Carlo Simulation")
+    run_simulation = st.sidebar.checkbox("Run Monte Carlo Simulation", value=False)
+    if run_simulation:
+        st.sidebar.markdown("*Standard deviations of the simulated inputs. Cost of equity is drawn via CAPM.*")
+        simulation_paths = st.sidebar.number_input("Number of Paths", value=1_000_000, step=100_000,
+                                                   min_value=1_000, max_value=10_000_000)
+        growth_sd = st.sidebar.number_input("Short-term Growth Std Dev", value=0.02, format="%.4f", min_value=0.0)
+        lt_growth_sd = st.sidebar.number_input("Long-term Growth Std Dev", value=0.005, format="%.4f", min_value=0.0)
+        beta_sd = st.sidebar.number_input("Beta Std Dev", value=0.15, format="%.4f", min_value=0.0)
+        mrp_sd = st.sidebar.number_input("Market Risk Premium Std Dev", value=0.015, format="%.4f", min_value=0.0)
+    
+    st.sidebar.subheader("Diagnostics")
+    show_timings = st.sidebar.checkbox("Show Performance Details", value=False)
+    trace = start_trace() if show_timings else stop_trace()
+    
+    button_col, refresh_col = st.columns([1, 5])
+    with button_col:
+        calculate = st.button("Calculate Valuation", type="primary")
+    with refresh_col:
+        refresh = st.button("🔄 Refresh Data", help="Refetch market and ticker data instead of reusing this session's")
+    
+    if ticker and (calculate or refresh):
+        with st.spinner("Fetching market data..."):
+            load_valuation_inputs(ticker, refresh=refresh)
+        if ticker not in st.session_state.ticker_data:
+            st.error("Could not fetch data for this ticker. Please check the ticker symbol.")
+            return
+    
+    # Everything below recomputes live from the session's data whenever an input changes
+    if not ticker or ticker not in st.session_state.ticker_data:
+        return
+    
+    data, (year_fraction, div_payment_date), data_version = st.session_state.ticker_data[ticker]
+    warmer = get_market_warmer()
+    market_snapshot = warmer.snapshot()
+    market = market_snapshot.inputs
+    risk_free_rate = market.risk_free_rate
+    market_risk_premium = market.market_risk_premium
+    
+    # pandas and plotly are only needed once there is a valuation to show
+    import pandas as pd
+    from valuation_report import (build_cash_flow_figure, build_cash_flow_table, build_display_table,
+                                  build_sensitivity_figure, cash_flow_schedule)
+    
+    # Extract key metrics
+    roe = data['Return on Equity (ROE)']
+    div_payout = data['Dividend Payout Ratio']
+    near_term_div_growth = roe * (1 - div_payout)
+    next_date = data['Next Dividend Date (datetime)']
+    latest_dividend = data["Dividend Per Share (trailing)"]
+    beta = data['Beta']
+    last_price = data['Last Stock Price']
+    name = data['Company Name']
+    
+    if beta_from_history:
+        beta_key = (ticker, beta_window)
+        if refresh or beta_key not in st.session_state.rolling_betas:
+            st.session_state.rolling_betas[beta_key] = get_rolling_beta(ticker, beta_window, refresh=refresh)
+        if st.session_state.rolling_betas[beta_key] is None:
+            st.warning("⚠️ Could not estimate beta from price history; using Yahoo Finance's beta.")
+        else:
+            beta = st.session_state.rolling_betas[beta_key]
+    
+    # Use calculated cost of equity if not custom
+    if not custom_ke:
+        k_e = risk_free_rate + beta * (market_risk_premium)
+    
+    # Display company info
+    st.header(f"📋 {name}")
+    
+    # Create columns for metrics
+    col1, col2, col3 = st.columns(3)
+    
+    with col1:
+        st.metric("Current Stock Price", f"${last_price:,.2f}")
+        st.metric("Trailing Dividend", f"${latest_dividend:,.2f}")
+        st.metric("Beta", f"{beta:.3f}")
+    
+    with col2:
+        st.metric("ROE", f"{roe*100:.2f}%")
+        st.metric("Payout Ratio", f"{div_payout*100:.2f}%")
+        st.metric("Calculated Growth", f"{near_term_div_growth*100:.2f}%")
+    
+    with col3:
+        st.metric("Risk-free Rate", f"{risk_free_rate*100:.2f}%")
+        st.metric("Market Risk Premium", f"{market_risk_premium*100:.2f}%")
+        st.metric("Cost of Equity", f"{k_e*100:.2f}%")
+        show_market_freshness(market_snapshot, warmer.max_age)
+    
+    # Warning for non-dividend stocks
+    if next_date is None:
+        st.warning("⚠️ This stock does not pay a dividend. Consider using a different valuation method.")
+    
+    # Handle cash flows based on approach
+    if approach == "Use Custom Cash Flows":
+        # Use the custom cash flows entered by user
+        # Calculate growth rates from the custom cash flows
+        div_growth_from_prev = [(cf_list[0] - latest_dividend) / latest_dividend]
+        div_growth_from_prev += [(cf_list[i] - cf_list[i - 1]) / cf_list[i - 1] for i in range(1, len(cf_list))]
+        
+        # Display the calculated growth rates
+        st.sidebar.markdown("**Calculated Growth Rates:**")
+        for i, growth in enumerate(div_growth_from_prev):
+            st.sidebar.markdown(f"Year {i+1}: {growth*100:.2f}%")
+        
+    elif approach == "Use Custom Short-term Growth":
+        # Calculate cash flows using the custom growth rate
+        cf_list = [latest_dividend * (1 + short_term_growth) ** i for i in range(1, forecast_years + 1)]
+        div_growth_from_prev = [short_term_growth] * forecast_years
+        
+        # Display the calculated cash flows
+        st.sidebar.markdown("**Calculated Cash Flows:**")
+        for i, cf in enumerate(cf_list):
+            st.sidebar.markdown(f"Year {i+1}: ${cf:.2f}")
+            
+    else:  # Use Default Growth (ROE × Plowback)
+        # Calculate cash flows using the default growth rate
+        cf_list = [latest_dividend * (1 + near_term_div_growth) ** i for i in range(1, forecast_years + 1)]
+        div_growth_from_prev = [near_term_div_growth] * forecast_years
+        
+        # Display the calculated cash flows
+        st.sidebar.markdown("**Calculated Cash Flows:**")
+        for i, cf in enumerate(cf_list):
+            st.sidebar.markdown(f"Year {i+1}: ${cf:.2f}")
+    
+    # Calculate valuation, or reuse the result of any session that used exactly the same inputs
+    def compute_valuation():
+        with stage("compute.cash_flows"):
+            schedule = cash_flow_schedule(cf_list, div_growth_from_prev, year_fraction, div_payment_date,
+                                          k_e, long_term_growth)
+        with stage("compute.cash_flow_table"):
+            table = build_cash_flow_table(schedule)
+        return table, table['Period PV'].sum()
+    
+    valuation_key = (ticker, approach, tuple(cf_list), tuple(div_growth_from_prev), year_fraction,
+                     div_payment_date, k_e, long_term_growth, data_version)
+    with stage("compute.valuation"):
+        cash_flow_table, stock_value = get_result_cache().get_or_compute(valuation_key, compute_valuation)
+    
+    # Display results
+    st.header("📊 Valuation Results")
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Intrinsic Value", f"${stock_value:,.2f}")
+    with col2:
+        st.metric("Current Price", f"${last_price:,.2f}")
+    with col3:
+        if stock_value > last_price:
+            st.metric("Recommendation", "BUY", delta="Undervalued")
+        elif stock_value < last_price:
+            st.metric("Recommendation", "SELL", delta="Overvalued", delta_color="inverse")
+        else:
+            st.metric("Recommendation", "HOLD", delta="Fair Value")
+    
+    # Display cash flow table - TRANSPOSED like in original code
+    st.subheader("📋 Cash Flow Analysis")
+    
+    # Display the transposed table
+    with stage("render.display_table"):
+        st.dataframe(build_display_table(cash_flow_table), use_container_width=True)
+    
+    # Create visualization
+    st.subheader("📈 Cash Flow Visualization")
+    
+    # Serialized size of every chart sent this run, for the performance expander
+    chart_sizes = {}
+    with stage("render.chart"):
+        fig = build_cash_flow_figure(cash_flow_table)
+    chart_sizes["cash_flows"] = report_figure("cash_flows", fig)
+    st.plotly_chart(fig, use_container_width=True)
+    
+    # Re-values the same cash flows over a 200 × 200 grid, so only while the toggle is on
+    chart_panel("Show Sensitivity Heatmap (Cost of Equity × Long-term Growth)", "sensitivity",
+                lambda: build_sensitivity_figure(cf_list, year_fraction, k_e, long_term_growth), chart_sizes)
+    
+    # Summary statistics
+    st.subheader("📊 Summary Statistics")
+    # The cost of equity at which the same cash flows are worth exactly the market price
+    with stage("compute.implied_return"):
+        implied_return = float(schedule_implied_cost_of_equity(last_price, cf_list, long_term_growth, year_fraction))
+    summary_stats = {
+        "Total Present Value": f"${stock_value:,.2f}",
+        "Current Market Price": f"${last_price:,.2f}",
+        "Valuation Difference": f"${stock_value - last_price:,.2f}",
+        "Valuation Ratio": f"{stock_value/last_price:.2f}",
+        "Implied Return": f"{implied_return*100:.2f}%" if np.isfinite(implied_return) else "N/A"
+    }
+    
+    summary_df = pd.DataFrame(list(summary_stats.items()), columns=['Metric', 'Value'])
+    st.dataframe(summary_df, use_container_width=True)
+    
+    if run_simulation:
+        st.subheader("🎲 Monte Carlo Simulation")
+        
+        # Centre the growth draws on the growth rate the chosen approach implies
+        if approach == "Use Custom Cash Flows":
+            growth_mean = (cf_list[-1] / latest_dividend) ** (1 / len(cf_list)) - 1
+        else:
+            growth_mean = div_growth_from_prev[0]
+        
+        with stage("compute.monte_carlo"):
+            simulation = simulate_intrinsic_value(
+                latest_dividend, growth_mean, growth_sd, long_term_growth, lt_growth_sd,
+                beta, beta_sd, risk_free_rate, market_risk_premium, mrp_sd,
+                year_fraction, last_price, paths=int(simulation_paths), years=forecast_years)
+        
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("Median Intrinsic Value", f"${simulation.percentiles[50]:,.2f}")
+        with col2:
+            st.metric("P(Value > Price)", f"{simulation.prob_above_price*100:.1f}%")
+        with col3:
+            st.metric("Valid Paths (k_e > g)", f"{simulation.valid_fraction*100:.1f}%")
+        
+        bands_df = pd.DataFrame({
+            'Percentile': [f"{p}th" for p in simulation.percentiles],
+            'Intrinsic Value': [f"${v:,.2f}" for v in simulation.percentiles.values()]
+        })
+        st.dataframe(bands_df, use_container_width=True)
+        
+        edges, counts = simulation.histogram
+        if counts.sum():
+            # Binned during the simulation, so neither the server nor the browser ever holds every path
+            chart_panel("Show Distribution of Simulated Values", "simulation_chart",
+                        lambda: counts_figure(edges, counts, "Distribution of Simulated Intrinsic Value",
+                                              "Intrinsic Value ($)", "Share of Paths", total=simulation.paths,
+                                              marker=(last_price, "Current Price")),
+                        chart_sizes)
+    
+    if show_timings:
+        show_performance(trace, chart_sizes)
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+Out-of-core backtest of the page's BUY/SELL signal over point-in-time snapshots.
+
+Snapshots are stored like the history store: one ``.npy`` file of
+fundamentals records per rebalance date (``<root>/<YYYY-MM-DD>.npy``),
+sorted by ticker. ``ddm-calculator --snapshot DIR`` adds today's partition.
+A backtest walks the dates in order and memory-maps at most two partitions
+at a time - the one being valued and the next one, for forward returns - so
+decades × thousands of tickers never have to fit in memory.
+
+At each date the model is the page's default approach: growth = ROE ×
+plowback, CAPM cost of equity, and the market inputs of ``get_risk_free_rate``
+and ``get_equity_returns`` computed from the locally stored ^TNX and
+^SP500TR histories truncated at that date, so nothing from the future leaks
+in. A date before the stored history of either symbol begins is valued with
+its default constant instead; such periods are flagged in the
+``default_inputs`` column and on stderr. ``ddm-calculator --snapshot``
+backfills both histories back to the first snapshot. Nothing here touches
+the network.
+
+Usage:
+    ddm-backtest snapshots/ > signal_returns.csv
+    ddm-backtest snapshots/ --start 2000-01-01 --signals signals.csv
+"""
+
+import argparse
+import csv
+import os
+import re
+import sys
+import threading
+from collections import namedtuple
+from datetime import datetime
+
+import numpy as np
+
+from ddm_core import FORECAST_YEARS, ONE_YEAR, batch_intrinsic_value, partial_year_fraction
+from history_store import cagr_from_history, get_history_store
+from instrumentation import stage
+from market_data import DEFAULT_EQUITY_RETURN, DEFAULT_RISK_FREE_RATE, MarketInputs
+from valuation import DEFAULT_LONG_TERM_GROWTH
+
+SNAPSHOT_DTYPE = np.dtype([("ticker", "U12"), ("price", "<f8"), ("trailing_dividend", "<f8"),
+                           ("roe", "<f8"), ("payout", "<f8"), ("beta", "<f8")])
+
+# Snapshot columns and the fetch_stock_data keys they are taken from
+SNAPSHOT_FIELDS = {
+    "price": "Last Stock Price",
+    "trailing_dividend": "Dividend Per Share (trailing)",
+    "roe": "Return on Equity (ROE)",
+    "payout": "Dividend Payout Ratio",
+    "beta": "Beta",
+}
+
+# Market histories read at each rebalance date
+BACKTEST_HISTORY = ("^TNX", "^SP500TR")
+
+_DATE_FILE = re.compile(r"^(\d{4}-\d{2}-\d{2})\.npy$")
+
+
+class SnapshotStore:
+    """Directory of point-in-time fundamentals, one partition per date"""
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(self.root, exist_ok=True)
+
+    def path(self, date):
+        return os.path.join(self.root, f"{np.datetime64(date, 'D')}.npy")
+
+    def dates(self):
+        """Partition dates in ascending order"""
+        matches = (_DATE_FILE.match(name) for name in os.listdir(self.root))
+        return sorted(np.datetime64(m.group(1), "D") for m in matches if m)
+
+    def load(self, date):
+        """Memory-mapped records of one date"""
+        return np.load(self.path(date), mmap_mode="r")
+
+    def write(self, date, records):
+        """Store ``records`` (SNAPSHOT_DTYPE) as the partition of ``date``, replacing any existing one"""
+        records = np.sort(np.asarray(records, dtype=SNAPSHOT_DTYPE), order="ticker")
+        path = self.path(date)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as fh:
+            np.save(fh, records)
+        os.replace(tmp, path)
+
+    def write_stock_data(self, date, stock_data):
+        """Store ``{ticker: fetch_stock_data(ticker)}`` as the partition of ``date``"""
+        records = np.empty(len(stock_data), dtype=SNAPSHOT_DTYPE)
+        records["ticker"] = [ticker.upper() for ticker in stock_data]
+        for column, key in SNAPSHOT_FIELDS.items():
+            values = (data.get(key) for data in stock_data.values())
+            records[column] = [np.nan if value is None else value for value in values]
+        self.write(date, records)
+
+
+def point_in_time_inputs(date, history=None):
+    """
+    Risk-free rate and S&P 500 CAGR as they were known at the end of ``date``,
+    and the symbols (^TNX, ^SP500TR) whose default had to be used instead.
+
+    Reads the stored histories without refreshing them and falls back to the
+    same defaults as market_data when nothing was stored before ``date``.
+    """
+    history = history or get_history_store()
+    cutoff = np.datetime64(date, "D") + np.timedelta64(1, "D")
+    defaults = []
+
+    risk_free_rate = None
+    records = history.load("^TNX")
+    if records is not None:
+        end = np.searchsorted(records["date"], cutoff)
+        if end:
+            risk_free_rate = float(records["close"][end - 1]) / 100
+    if risk_free_rate is None:
+        risk_free_rate = DEFAULT_RISK_FREE_RATE
+        defaults.append("^TNX")
+
+    equity_return = None
+    records = history.load("^SP500TR")
+    if records is not None:
+        end = np.searchsorted(records["date"], cutoff)
+        if end > 1 and records["date"][end - 1] > records["date"][0]:
+            equity_return = cagr_from_history(records["date"][:end], records["close"][:end])
+    if equity_return is None:
+        equity_return = DEFAULT_EQUITY_RETURN
+        defaults.append("^SP500TR")
+
+    return MarketInputs(risk_free_rate, equity_return), tuple(defaults)
+
+
+def market_inputs_at(date, history=None):
+    """Market inputs of point_in_time_inputs, without the symbols that fell back to defaults"""
+    return point_in_time_inputs(date, history)[0]
+
+
+def value_snapshot(records, market, date, long_term_growth=DEFAULT_LONG_TERM_GROWTH, years=FORECAST_YEARS):
+    """
+    Intrinsic values and signals (1 BUY, -1 SELL, 0 HOLD or not valued) of one partition.
+
+    Tickers with missing inputs or k_e <= long-term growth get a NaN value.
+    """
+    year_fraction, _ = partial_year_fraction(datetime.fromisoformat(str(np.datetime64(date, "D"))))
+    growth = records["roe"] * (1 - records["payout"])
+    k_e = market.risk_free_rate + records["beta"] * market.market_risk_premium
+    values = batch_intrinsic_value(records["trailing_dividend"], growth, k_e, long_term_growth, year_fraction, years)
+    signals = np.sign(np.nan_to_num(values - records["price"], nan=0.0)).astype(np.int8)
+    return values, signals
+
+
+BacktestPeriod = namedtuple("BacktestPeriod", [
+    "date",
+    "next_date",
+    "tickers",
+    "price",
+    "value",
+    "signal",
+    "forward_return",     # price change plus dividends accrued at the trailing rate; NaN if the ticker left
+    "default_inputs",     # market symbols with no history before the date, valued with the default constant
+])
+
+
+def run_backtest(snapshots, history=None, long_term_growth=DEFAULT_LONG_TERM_GROWTH, years=FORECAST_YEARS,
+                 start=None, end=None):
+    """
+    Yield one BacktestPeriod per rebalance date between ``start`` and ``end``
+    that has a following partition to measure returns against.
+    """
+    dates = snapshots.dates()
+    if start is not None:
+        dates = [d for d in dates if d >= np.datetime64(start, "D")]
+    if end is not None:
+        dates = [d for d in dates if d <= np.datetime64(end, "D")]
+
+    for date, next_date in zip(dates, dates[1:]):
+        with stage("backtest.period"):
+            current = snapshots.load(date)
+            following = snapshots.load(next_date)
+            market, default_inputs = point_in_time_inputs(date, history)
+            values, signals = value_snapshot(current, market, date, long_term_growth, years)
+
+            # Both partitions are sorted by ticker, so matching them is a merge
+            _, here, there = np.intersect1d(current["ticker"], following["ticker"],
+                                            assume_unique=True, return_indices=True)
+            held = (next_date - date) / np.timedelta64(int(ONE_YEAR.total_seconds()), "s")
+            price = np.asarray(current["price"])
+            forward_return = np.full(len(current), np.nan)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                forward_return[here] = (following["price"][there]
+                                        + np.nan_to_num(current["trailing_dividend"][here]) * held) / price[here] - 1
+
+        yield BacktestPeriod(date, next_date, np.asarray(current["ticker"]), price, values, signals, forward_return,
+                             default_inputs)
+
+
+SERIES_FIELDS = ("date", "next_date", "tickers", "valued", "buys", "sells",
+                 "buy_return", "sell_return", "universe_return", "spread", "hit_rate", "default_inputs")
+
+
+def _mean(values):
+    values = values[np.isfinite(values)]
+    return float(values.mean()) if len(values) else None
+
+
+def summarize_period(period):
+    """One row of the signal return series: equal-weighted returns of the BUY and SELL legs"""
+    returns = period.forward_return
+    buy_return = _mean(returns[period.signal == 1])
+    sell_return = _mean(returns[period.signal == -1])
+    universe_return = _mean(returns)
+
+    hit_rate = None
+    called = (period.signal != 0) & np.isfinite(returns)
+    if universe_return is not None and called.any():
+        # A call is right when the ticker beat (BUY) or lagged (SELL) the universe
+        hit_rate = float(np.mean(np.sign(returns[called] - universe_return) == period.signal[called]))
+
+    return {
+        "date": str(period.date),
+        "next_date": str(period.next_date),
+        "tickers": len(period.tickers),
+        "valued": int(np.isfinite(period.value).sum()),
+        "buys": int((period.signal == 1).sum()),
+        "sells": int((period.signal == -1).sum()),
+        "buy_return": buy_return,
+        "sell_return": sell_return,
+        "universe_return": universe_return,
+        "spread": buy_return - sell_return if buy_return is not None and sell_return is not None else None,
+        "hit_rate": hit_rate,
+        "default_inputs": " ".join(period.default_inputs),
+    }
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="ddm-backtest",
+        description="Backtest the DDM BUY/SELL signal over point-in-time snapshots and write the per-period "
+                    "signal return series as CSV. Only local data is read.")
+    parser.add_argument("snapshots", help="snapshot directory (see ddm-calculator --snapshot)")
+    parser.add_argument("--start", help="first rebalance date (YYYY-MM-DD)")
+    parser.add_argument("--end", help="last rebalance date (YYYY-MM-DD)")
+    parser.add_argument("-o", "--output", help="write the return series to this file instead of stdout")
+    parser.add_argument("--signals", metavar="FILE", help="also write every ticker's value, signal and return as CSV")
+    parser.add_argument("--cache-dir", help="directory holding the ^TNX and ^SP500TR history (default: "
+                                            "$DDM_CACHE_DIR or ~/.cache/ddm-calculator)")
+    parser.add_argument("--long-term-growth", type=float, default=DEFAULT_LONG_TERM_GROWTH,
+                        help=f"long-term growth rate (default: {DEFAULT_LONG_TERM_GROWTH})")
+    parser.add_argument("--years", type=int, default=FORECAST_YEARS,
+                        help=f"years of explicitly forecast dividends (default: {FORECAST_YEARS})")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.cache_dir:
+        os.environ["DDM_CACHE_DIR"] = args.cache_dir
+
+    snapshots = SnapshotStore(args.snapshots)
+    out = open(args.output, "w", encoding="utf-8", newline="") if args.output else sys.stdout
+    signals_out = open(args.signals, "w", encoding="utf-8", newline="") if args.signals else None
+    periods = 0
+    defaulted = {}
+    growth = {"buy_return": 1.0, "sell_return": 1.0, "universe_return": 1.0}
+    try:
+        writer = csv.DictWriter(out, fieldnames=SERIES_FIELDS, lineterminator="\n")
+        writer.writeheader()
+        if signals_out:
+            signals_writer = csv.writer(signals_out, lineterminator="\n")
+            signals_writer.writerow(["date", "ticker", "price", "intrinsic_value", "signal", "forward_return"])
+
+        for period in run_backtest(snapshots, long_term_growth=args.long_term_growth, years=args.years,
+                                   start=args.start, end=args.end):
+            row = summarize_period(period)
+            writer.writerow(row)
+            out.flush()
+            if signals_out:
+                signals_writer.writerows(zip([row["date"]] * len(period.tickers), period.tickers.tolist(),
+                                             period.price.tolist(), period.value.tolist(),
+                                             period.signal.tolist(), period.forward_return.tolist()))
+            periods += 1
+            for symbol in period.default_inputs:
+                defaulted.setdefault(symbol, []).append(row["date"])
+            for leg in growth:
+                growth[leg] *= 1 + (row[leg] or 0.0)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        if signals_out:
+            signals_out.close()
+
+    for symbol, dates in defaulted.items():
+        print(f"warning: no stored {symbol} history on or before {dates[0]}; {len(dates)} periods were valued with "
+              f"the default constant instead (see the default_inputs column). Run ddm-calculator --snapshot to "
+              f"backfill it.", file=sys.stderr)
+    print(f"{periods} periods; cumulative return BUY {growth['buy_return'] - 1:+.2%}, "
+          f"SELL {growth['sell_return'] - 1:+.2%}, universe {growth['universe_return'] - 1:+.2%}",
+          file=sys.stderr)
+    return 0 if periods else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,38 @@
+"""
+JSON baselines shared by the benchmark scripts.
+
+A baseline maps benchmark names to timings. CI saves one from a known-good
+commit with --save and later runs compare against it with --baseline.
+"""
+
+import json
+import platform
+import sys
+
+
+def save_baseline(path, results, unit):
+    with open(path, "w", encoding="utf-8") as fh:
+        json.dump({"python": sys.version.split()[0], "machine": platform.machine(),
+                   "unit": unit, "results": results}, fh, indent=2, sort_keys=True)
+    print(f"\nSaved baseline to {path}")
+
+
+def check_baseline(path, results, tolerance):
+    """Print every result slower than the baseline by more than ``tolerance``; True when there are none"""
+    with open(path, encoding="utf-8") as fh:
+        baseline = json.load(fh)
+    unit = baseline["unit"]
+    regressions = [name for name, value in results.items()
+                   if name in baseline["results"] and value > baseline["results"][name] * (1 + tolerance)]
+    for name in regressions:
+        print(f"REGRESSION {name}: {results[name]:.3f} {unit} vs baseline {baseline['results'][name]:.3f} {unit}")
+    if not regressions:
+        print(f"\nNo regressions beyond {tolerance:.0%} against {path}")
+    return not regressions
+
+
+def add_baseline_arguments(parser):
+    parser.add_argument("--save", help="write the results to this JSON baseline")
+    parser.add_argument("--baseline", help="compare against this JSON baseline (exit status 1 on regressions)")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed slowdown against the baseline (default: 0.25 = 25%%)")
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Benchmark: load test of the HTTP valuation API on replayed data
+
+Writes synthetic fixtures for --tickers tickers, starts api.py on them in a
+subprocess with injected latency (no network needed), then sends --requests
+GET /value/<TICKER> requests for random tickers over --connections
+keep-alive connections. The first request for a ticker goes to the replay
+provider, later ones are served from the fundamentals cache. Reports
+requests per second, p50/p99 latency and the status codes seen (503 means
+the server's backpressure refused the request).
+
+Usage:
+    python benchmarks/bench_api.py [--tickers 500] [--requests 20000] [--connections 64]
+                                   [--latency 0.05] [--batch 0]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from providers import write_synthetic_fixtures  # noqa: E402
+
+
+async def request(reader, writer, method, path, body=b""):
+    """Send one request on a kept-alive connection and return (status, body)"""
+    head = f"{method} {path} HTTP/1.1\r\nHost: bench\r\nContent-Length: {len(body)}\r\n\r\n"
+    writer.write(head.encode("latin-1") + body)
+    await writer.drain()
+    status_line, *headers = (await reader.readuntil(b"\r\n\r\n")).decode("latin-1").split("\r\n")
+    length = next(int(line.split(":", 1)[1]) for line in headers if line.lower().startswith("content-length"))
+    return int(status_line.split(" ")[1]), await reader.readexactly(length)
+
+
+async def client(port, tickers, count, batch, latencies, statuses, rng):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    try:
+        for _ in range(count):
+            start = time.perf_counter()
+            if batch:
+                body = json.dumps({"tickers": rng.sample(tickers, batch)}).encode("utf-8")
+                status, _ = await request(reader, writer, "POST", "/value", body)
+            else:
+                status, _ = await request(reader, writer, "GET", f"/value/{rng.choice(tickers)}")
+            latencies.append(time.perf_counter() - start)
+            statuses[status] += 1
+    finally:
+        writer.close()
+
+
+async def load(port, tickers, args):
+    latencies, statuses = [], Counter()
+    per_client = [args.requests // args.connections + (i < args.requests % args.connections)
+                  for i in range(args.connections)]
+    start = time.perf_counter()
+    await asyncio.gather(*(client(port, tickers, count, args.batch, latencies, statuses, random.Random(i))
+                           for i, count in enumerate(per_client)))
+    return time.perf_counter() - start, np.array(latencies), statuses
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tickers", type=int, default=500, help="number of synthetic tickers")
+    parser.add_argument("--requests", type=int, default=20000, help="total requests")
+    parser.add_argument("--connections", type=int, default=64, help="concurrent keep-alive connections")
+    parser.add_argument("--batch", type=int, default=0, help="tickers per POST /value (0: single-ticker GETs)")
+    parser.add_argument("--latency", type=float, default=0.05, help="replay latency per upstream request (s)")
+    parser.add_argument("--workers", type=int, default=32, help="server fetch threads")
+    parser.add_argument("--max-pending", type=int, default=2000, help="server backpressure limit (tickers)")
+    args = parser.parse_args()
+
+    tickers = [f"T{i:05d}" for i in range(args.tickers)]
+    with tempfile.TemporaryDirectory() as root:
+        write_synthetic_fixtures(os.path.join(root, "fixtures"), tickers)
+        server = subprocess.Popen(
+            [sys.executable, os.path.join(ROOT, "api.py"), "--port", "0", "--replay", os.path.join(root, "fixtures"),
+             "--cache-dir", os.path.join(root, "cache"), "--latency", str(args.latency), "--rate", "100000",
+             "--workers", str(args.workers), "--max-pending", str(args.max_pending)],
+            stderr=subprocess.PIPE, text=True)
+        try:
+            line = server.stderr.readline()
+            if "listening" not in line:
+                raise SystemExit(f"server did not start: {line}{server.stderr.read()}")
+            port = int(line.rsplit(":", 1)[1])
+            wall, latencies, statuses = asyncio.run(load(port, tickers, args))
+        finally:
+            server.terminate()
+            server.wait()
+
+    p50, p99 = np.percentile(latencies, [50, 99])
+    kind = f"POST /value × {args.batch} tickers" if args.batch else "GET /value/<TICKER>"
+    print(f"Requests:           {args.requests:,} {kind} over {args.connections} connections "
+          f"({args.tickers:,} tickers, {args.latency*1e3:.0f} ms upstream latency)")
+    print(f"Throughput:         {args.requests/wall:10,.0f} requests/s  ({wall:.2f} s)")
+    print(f"Latency:            p50 {p50*1e3:.2f} ms   p99 {p99*1e3:.2f} ms   max {latencies.max()*1e3:.1f} ms")
+    print(f"Status codes:       {dict(sorted(statuses.items()))}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Benchmark: out-of-core backtest over synthetic point-in-time snapshots
+
+Writes --dates monthly partitions of --tickers tickers (30 years × 5,000 by
+default), then streams them through run_backtest and reports throughput and
+how much the peak resident memory grew while backtesting.
+
+Usage:
+    python benchmarks/bench_backtest.py [--dates 360] [--tickers 5000]
+"""
+
+import argparse
+import os
+import resource
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backtest import SNAPSHOT_DTYPE, SnapshotStore, run_backtest, summarize_period  # noqa: E402
+from history_store import HistoryStore  # noqa: E402
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def write_universe(snapshots, dates, n, seed=0):
+    rng = np.random.default_rng(seed)
+    records = np.empty(n, dtype=SNAPSHOT_DTYPE)
+    records["ticker"] = [f"T{i:05d}" for i in range(n)]
+    price = rng.uniform(10, 200, n)
+    for date in dates:
+        price *= np.exp(rng.normal(0.005, 0.06, n))
+        records["price"] = price
+        records["trailing_dividend"] = price * rng.uniform(0.0, 0.05, n)
+        records["roe"] = rng.uniform(0.0, 0.35, n)
+        records["payout"] = rng.uniform(0.2, 0.9, n)
+        records["beta"] = rng.uniform(0.4, 1.6, n)
+        snapshots.write(date, records)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dates", type=int, default=360, help="number of monthly rebalance dates")
+    parser.add_argument("--tickers", type=int, default=5000, help="tickers per snapshot")
+    args = parser.parse_args()
+
+    dates = np.datetime64("1995-01", "M") + np.arange(args.dates)
+    with tempfile.TemporaryDirectory() as root:
+        snapshots = SnapshotStore(os.path.join(root, "snapshots"))
+        start = time.perf_counter()
+        write_universe(snapshots, dates.astype("datetime64[D]"), args.tickers)
+        write_time = time.perf_counter() - start
+
+        history = HistoryStore(os.path.join(root, "history"), fetch=None)
+        baseline = peak_rss_mb()
+        start = time.perf_counter()
+        periods = 0
+        for period in run_backtest(snapshots, history):
+            summarize_period(period)
+            periods += 1
+        elapsed = time.perf_counter() - start
+
+    ticker_periods = periods * args.tickers
+    print(f"Snapshots:          {args.dates} dates × {args.tickers:,} tickers (written in {write_time:.2f} s)")
+    print(f"Backtest:           {elapsed:10.2f} s  ({ticker_periods/elapsed:,.0f} ticker-periods/s)")
+    print(f"Per period:         {elapsed/max(periods, 1)*1e3:10.2f} ms")
+    print(f"Peak RSS growth:    {peak_rss_mb() - baseline:10.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
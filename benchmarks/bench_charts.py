@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Benchmark: figure build time and payload size, naive vs reduced on the server
+
+Builds each chart the straightforward way (every value handed to plotly)
+and through charts.py, and reports the time to build and serialize the
+figure and the size of its JSON - what the browser has to download and
+render on every rerun:
+
+- a Monte Carlo distribution of --paths simulated values (go.Histogram vs
+  server-side bins);
+- the --grid × --grid sensitivity heatmap (full grid vs strided, float32);
+- a scatter of a --universe ticker universe (go.Scatter vs decimated WebGL).
+
+Usage:
+    python benchmarks/bench_charts.py [--paths 1000000] [--grid 200] [--universe 20000]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import plotly.graph_objects as go
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from charts import downsample_grid, histogram_figure, scatter_figure  # noqa: E402
+from ddm_core import sensitivity_grid  # noqa: E402
+
+
+def measure(build):
+    start = time.perf_counter()
+    size = len(build().to_json())
+    return time.perf_counter() - start, size
+
+
+def report(label, naive, reduced):
+    (naive_time, naive_size), (reduced_time, reduced_size) = measure(naive), measure(reduced)
+    print(f"{label:<22} naive {naive_time*1e3:8.1f} ms {naive_size/1024:10,.1f} KB   "
+          f"reduced {reduced_time*1e3:7.1f} ms {reduced_size/1024:8,.1f} KB   ({naive_size/reduced_size:,.0f}x smaller)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--paths", type=int, default=1_000_000, help="simulated values in the distribution")
+    parser.add_argument("--grid", type=int, default=200, help="rows and columns of the sensitivity grid")
+    parser.add_argument("--universe", type=int, default=20_000, help="tickers in the scatter")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    values = rng.lognormal(3, 0.5, args.paths).astype(np.float32)
+    report("Monte Carlo histogram",
+           lambda: go.Figure(go.Histogram(x=values, nbinsx=100)),
+           lambda: histogram_figure(values, "Distribution", "Intrinsic Value ($)", total=args.paths))
+
+    ke = np.linspace(0.05, 0.15, args.grid)
+    lt_g = np.linspace(0.0, 0.06, args.grid)
+    grid = sensitivity_grid([1.05 ** i for i in range(1, 6)], 0.5, ke, lt_g)
+    report("Sensitivity heatmap",
+           lambda: go.Figure(go.Heatmap(x=lt_g, y=ke, z=grid)),
+           lambda: go.Figure(go.Heatmap(**dict(zip("xyz", downsample_grid(lt_g, ke, grid.astype(np.float32)))))))
+
+    price = rng.uniform(10, 400, args.universe)
+    value = price * rng.lognormal(0, 0.4, args.universe)
+    names = [f"T{i:05d}" for i in range(args.universe)]
+    report("Universe scatter",
+           lambda: go.Figure(go.Scatter(x=price, y=value, text=names, mode="markers")),
+           lambda: scatter_figure(price, value, "Value vs Price", "Price ($)", "Intrinsic Value ($)", text=names))
+
+
+if __name__ == "__main__":
+    main()
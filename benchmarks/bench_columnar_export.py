@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Benchmark: streaming a nightly run's valuation rows to Arrow and Parquet
+
+Values --tickers synthetic tickers (100k by default), writes the rows as CSV
+(the CLI's default) and through ColumnarWriter in each columnar format, in
+float64 and float32, then reports write time, file size, how much the peak
+resident memory grew while writing, and how long read_results takes to
+reload the file.
+
+Usage:
+    python benchmarks/bench_columnar_export.py [--tickers 100000] [--years 5]
+"""
+
+import argparse
+import csv
+import os
+import resource
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pyarrow.parquet  # noqa: F401  imported up front so the import is not counted as the writers' memory
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ddm_core import batch_intrinsic_value  # noqa: E402
+from result_export import COLUMNAR_FORMATS, ColumnarWriter, read_results  # noqa: E402
+from valuation import DEFAULT_LONG_TERM_GROWTH, RESULT_FIELDS  # noqa: E402
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def synthetic_rows(n, years, year_fraction, seed=0):
+    """Rows shaped like value_stock's, 1% of them failures"""
+    rng = np.random.default_rng(seed)
+    price = rng.uniform(10, 200, n)
+    d0 = price * rng.uniform(0.005, 0.05, n)
+    g = rng.uniform(0.0, 0.12, n)
+    k = rng.uniform(0.06, 0.14, n)
+    value = batch_intrinsic_value(d0, g, k, DEFAULT_LONG_TERM_GROWTH, year_fraction, years)
+    failed = rng.random(n) < 0.01
+    for i in range(n):
+        if failed[i]:
+            row = dict.fromkeys(RESULT_FIELDS)
+            row.update(ticker=f"T{i:06d}", error="missing beta")
+        else:
+            row = {"ticker": f"T{i:06d}", "name": f"Company {i}", "price": float(price[i]),
+                   "trailing_dividend": float(d0[i]), "growth": float(g[i]), "k_e": float(k[i]),
+                   "intrinsic_value": float(value[i]), "upside": float(value[i] / price[i] - 1),
+                   "implied_return": float(k[i]), "error": None}
+        yield row
+
+
+def measure(label, path, write):
+    baseline = peak_rss_mb()
+    start = time.perf_counter()
+    write()
+    elapsed = time.perf_counter() - start
+    size = os.path.getsize(path) / 1e6
+    print(f"{label:<18} write {elapsed:7.2f} s  {size:8.1f} MB  RSS +{peak_rss_mb() - baseline:6.1f} MB", end="")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tickers", type=int, default=100_000, help="rows in the run")
+    parser.add_argument("--years", type=int, default=5, help="forecast years (length of the cash-flow vectors)")
+    args = parser.parse_args()
+    # Rows are generated lazily for each writer, as they would arrive from the fetch pipeline
+    year_fraction = 0.5
+
+    with tempfile.TemporaryDirectory() as root:
+        path = os.path.join(root, "results.csv")
+
+        def write_csv():
+            with open(path, "w", newline="") as fh:
+                writer = csv.DictWriter(fh, fieldnames=RESULT_FIELDS)
+                writer.writeheader()
+                writer.writerows(synthetic_rows(args.tickers, args.years, year_fraction))
+
+        measure("csv", path, write_csv)
+        print()
+        for fmt in COLUMNAR_FORMATS:
+            for float32 in (False, True):
+                path = os.path.join(root, f"results{32 if float32 else 64}.{fmt}")
+
+                def write_columnar():
+                    with ColumnarWriter(path, fmt, args.years, year_fraction=year_fraction,
+                                        float32=float32) as writer:
+                        for row in synthetic_rows(args.tickers, args.years, year_fraction):
+                            writer.write(row)
+
+                measure(f"{fmt} {'float32' if float32 else 'float64'}", path, write_columnar)
+                start = time.perf_counter()
+                table = read_results(path)
+                print(f"  reload {(time.perf_counter() - start) * 1e3:7.1f} ms ({table.num_rows:,} rows)")
+
+
+if __name__ == "__main__":
+    main()
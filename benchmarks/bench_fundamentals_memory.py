@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Benchmark: memory of a ticker universe, dict of fetch_stock_data dicts vs FundamentalsTable
+
+Builds a --tickers universe of synthetic fundamentals both ways and reports
+the bytes allocated for it (tracemalloc, ticker strings and index included),
+then the time to refresh every price in place and to value the whole
+universe: gathering the model inputs from the dicts into arrays for
+batch_intrinsic_value, against one FundamentalsTable.value call on the
+columns. A sample is also valued with value_stock to check the results.
+
+Usage:
+    python benchmarks/bench_fundamentals_memory.py [--tickers 50000]
+"""
+
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ddm_core import batch_intrinsic_value  # noqa: E402
+from fundamentals_table import FundamentalsTable  # noqa: E402
+from market_data import MarketInputs, stock_data_from_info  # noqa: E402
+from valuation import DEFAULT_LONG_TERM_GROWTH, value_stock  # noqa: E402
+
+
+def make_infos(n, seed=0):
+    """.info-like columns of a synthetic universe (same ranges as providers.write_synthetic_fixtures)"""
+    rng = np.random.default_rng(seed)
+    price = rng.uniform(10, 400, n).round(2)
+    return {
+        "currentPrice": price,
+        "trailingAnnualDividendRate": (price * rng.uniform(0.005, 0.05, n)).round(2),
+        "beta": rng.uniform(0.3, 1.8, n).round(3),
+        "returnOnEquity": rng.uniform(0.05, 0.35, n),
+        "payoutRatio": rng.uniform(0.2, 0.9, n),
+        "sharesOutstanding": rng.integers(10**8, 10**10, n).astype(np.float64),
+        "bookValue": (price / rng.uniform(1, 8, n)).round(2),
+        "netIncomeToCommon": rng.uniform(1e8, 5e10, n),
+    }
+
+
+def info(columns, i):
+    row = {key: float(values[i]) for key, values in columns.items()}
+    row.update(longName=f"T{i:06d} Corp", dividendDate=1735603200,
+               dividendRate=round(row["trailingAnnualDividendRate"] * 1.03, 2))
+    return row
+
+
+def allocated(build):
+    """(result, bytes still allocated once ``build`` returns)"""
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, size
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tickers", type=int, default=50_000, help="number of tickers in the universe")
+    args = parser.parse_args()
+
+    n = args.tickers
+    columns = make_infos(n)
+    infos = [info(columns, i) for i in range(n)]
+    market = MarketInputs(0.0422, 0.1119)
+
+    # Fresh symbols for every build, so each one pays for its own ticker strings
+    dicts, dicts_bytes = allocated(lambda: {f"D{i:06d}": stock_data_from_info(infos[i]) for i in range(n)})
+    tables = {}
+    for dtype, prefix in ((np.float64, "F"), (np.float32, "H")):
+        tables[dtype] = allocated(lambda: FundamentalsTable.from_stock_data(
+            {f"{prefix}{i:06d}": stock_data_from_info(infos[i]) for i in range(n)}, dtype=dtype))
+
+    print(f"Universe:             {n:,} tickers")
+    print(f"dict of dicts:        {dicts_bytes/2**20:8.1f} MB   {dicts_bytes/n:6.0f} B/ticker")
+    for dtype, (table, size) in tables.items():
+        label = f"FundamentalsTable {np.dtype(dtype).name}:"
+        print(f"{label:<22}{size/2**20:8.1f} MB   {size/n:6.0f} B/ticker   "
+              f"(columns {table.nbytes/2**20:.1f} MB, {dicts_bytes/size:.1f}x smaller)")
+
+    table = tables[np.float64][0]
+    prices = columns["currentPrice"] * 1.01
+
+    # A price feed sends (symbol, price) pairs; both sides look each symbol up
+    feed, table_feed = list(dicts), table.tickers
+
+    def refresh_dicts():
+        for ticker, price in zip(feed, prices.tolist()):
+            dicts[ticker]["Last Stock Price"] = price
+
+    dict_refresh, _ = timed(refresh_dicts)
+    table_refresh, _ = timed(lambda: table.update_many(table_feed, price=prices))
+    print(f"Refresh all prices:   dicts {dict_refresh*1e3:8.1f} ms   table {table_refresh*1e3:8.1f} ms")
+
+    def value_dicts():
+        inputs = {key: np.array([np.nan if d[key] is None else d[key] for d in dicts.values()]) for key in
+                  ("Dividend Per Share (trailing)", "Return on Equity (ROE)", "Dividend Payout Ratio", "Beta")}
+        growth = inputs["Return on Equity (ROE)"] * (1 - inputs["Dividend Payout Ratio"])
+        k_e = market.risk_free_rate + inputs["Beta"] * market.market_risk_premium
+        return batch_intrinsic_value(inputs["Dividend Per Share (trailing)"], growth, k_e, DEFAULT_LONG_TERM_GROWTH,
+                                     0.5)
+
+    dict_value, expected = timed(value_dicts)
+    table_value, values = timed(lambda: table.value(market, year_fraction=0.5))
+    sample = [value_stock(t, d, market, year_fraction=0.5)["intrinsic_value"] for t, d in list(dicts.items())[:1000]]
+    print(f"Value the universe:   dicts {dict_value*1e3:8.1f} ms   table {table_value*1e3:8.1f} ms   (max abs diff "
+          f"{np.nanmax(np.abs(values - expected)):.1e}, {np.nanmax(np.abs(values[:len(sample)] - sample)):.1e} "
+          f"against value_stock)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Benchmark: cold import time of the app's modules, measured with ``-X importtime``
+
+Each module is imported in a fresh interpreter, and the cumulative time
+``-X importtime`` reports for it is kept (best of --repeat runs). With
+--save the results become a JSON baseline; with --baseline they are compared
+against one and the exit status is 1 if any module got slower than allowed.
+
+Usage:
+    python benchmarks/bench_import_time.py [--repeat 5] [--save baseline.json]
+    python benchmarks/bench_import_time.py --baseline baseline.json [--tolerance 0.25]
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+from baseline import add_baseline_arguments, check_baseline, save_baseline
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The core modules must stay cheap; app is the full Streamlit page for reference
+MODULES = ("ddm_core", "monte_carlo", "valuation", "market_data", "fetch_pipeline", "cli", "app")
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|\s*(\S+)")
+
+
+def import_time(module):
+    """Cumulative import time of ``module`` in microseconds, and the set of modules it loaded"""
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          cwd=ROOT, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"importing {module} failed:\n{proc.stderr}")
+    cumulative, loaded = None, set()
+    for line in proc.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            loaded.add(match.group(3))
+            # Modules are reported after their imports, so the last line is the top-level one;
+            # its indentation varies between interpreters
+            if match.group(3) == module:
+                cumulative = int(match.group(2))
+    if cumulative is None:
+        raise RuntimeError(f"-X importtime reported no line for {module}:\n{proc.stderr}")
+    return cumulative, loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="fresh interpreters per module (best is reported)")
+    add_baseline_arguments(parser)
+    args = parser.parse_args()
+
+    results = {}
+    print(f"{'Module':<16}{'Import (ms)':>12}  Heavy dependencies loaded")
+    for module in MODULES:
+        best, loaded = None, set()
+        for _ in range(args.repeat):
+            micros, loaded = import_time(module)
+            best = micros if best is None else min(best, micros)
+        heavy = sorted(m for m in ("pandas", "plotly", "streamlit", "yfinance") if m in loaded)
+        results[module] = best / 1e3
+        print(f"{module:<16}{best/1e3:>12.1f}  {', '.join(heavy) or '-'}")
+
+    if args.save:
+        save_baseline(args.save, results, unit="ms")
+    if args.baseline and not check_baseline(args.baseline, results, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Benchmark: Monte Carlo valuation throughput at different chunk sizes
+
+Usage:
+    python benchmarks/bench_monte_carlo.py [--paths 1000000] [--repeat 3]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from monte_carlo import simulate_intrinsic_value  # noqa: E402
+
+# Roughly WMT-like inputs
+INPUTS = dict(trailing_dividend=0.83, growth=0.12, growth_sd=0.03, long_term_growth=0.035,
+              long_term_growth_sd=0.005, beta=0.5, beta_sd=0.1, risk_free_rate=0.042,
+              market_risk_premium=0.07, market_risk_premium_sd=0.015, year_fraction=0.25, last_price=95.0)
+
+
+def best_of(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--paths", type=int, default=1_000_000, help="number of simulated paths")
+    parser.add_argument("--repeat", type=int, default=3, help="timing repetitions (best is reported)")
+    args = parser.parse_args()
+
+    print(f"Paths:              {args.paths:,}")
+    for chunk_size in (50_000, 250_000, args.paths):
+        elapsed, result = best_of(lambda: simulate_intrinsic_value(**INPUTS, paths=args.paths,
+                                                                   chunk_size=chunk_size, seed=0), args.repeat)
+        print(f"Chunk {chunk_size:>10,}:   {elapsed*1e3:10.2f} ms  ({args.paths/elapsed:,.0f} paths/s)"
+              f"  median ${result.percentiles[50]:,.2f}  P(value > price) {result.prob_above_price:.3f}")
+
+
+if __name__ == "__main__":
+    main()
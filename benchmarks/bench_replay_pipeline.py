@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Benchmark: throughput and tail latency of fetch + valuation on replayed data
+
+Writes synthetic fixtures for --tickers tickers, replays them with injected
+latency and failures (no network needed), and runs them through the
+concurrent fetch pipeline and the default valuation, like the CLI does.
+
+Usage:
+    python benchmarks/bench_replay_pipeline.py [--tickers 500] [--latency 0.05] [--jitter 0.1]
+                                               [--failure-rate 0.02] [--workers 16] [--rate 1000]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ddm_core import partial_year_fraction  # noqa: E402
+from fetch_pipeline import fetch_batch  # noqa: E402
+from market_data import use_provider  # noqa: E402
+from providers import ReplayProvider, write_synthetic_fixtures  # noqa: E402
+from valuation import value_stock  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tickers", type=int, default=500, help="number of synthetic tickers")
+    parser.add_argument("--latency", type=float, default=0.05, help="fixed latency per request (s)")
+    parser.add_argument("--jitter", type=float, default=0.1, help="extra uniform latency per request (s)")
+    parser.add_argument("--failure-rate", type=float, default=0.02, help="probability a request fails")
+    parser.add_argument("--workers", type=int, default=16, help="fetch threads")
+    parser.add_argument("--rate", type=float, default=1000.0, help="rate limit (requests/s)")
+    parser.add_argument("--seed", type=int, default=0, help="seed for fixtures, latency and failures")
+    args = parser.parse_args()
+
+    tickers = [f"T{i:05d}" for i in range(args.tickers)]
+    with tempfile.TemporaryDirectory() as root:
+        write_synthetic_fixtures(os.path.join(root, "fixtures"), tickers, seed=args.seed)
+        provider = ReplayProvider(os.path.join(root, "fixtures"), latency=args.latency, jitter=args.jitter,
+                                  failure_rate=args.failure_rate, seed=args.seed)
+        with use_provider(provider, os.path.join(root, "cache")):
+            start = time.perf_counter()
+            market, results = fetch_batch(tickers, max_workers=args.workers, rate=args.rate, backoff=0.05)
+            year_fraction, _ = partial_year_fraction()
+            first = None
+            latencies, failed = [], 0
+            for result in results:
+                first = first or time.perf_counter() - start
+                latencies.append(result.elapsed)
+                row = value_stock(result.ticker, result.data, market, year_fraction=year_fraction)
+                failed += result.error is not None or row["error"] is not None
+            wall = time.perf_counter() - start
+
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    print(f"Tickers:            {args.tickers:,}  ({args.workers} workers, "
+          f"{args.latency*1e3:.0f}+U(0,{args.jitter*1e3:.0f}) ms latency, {args.failure_rate:.0%} failures)")
+    print(f"Wall time:          {wall:10.2f} s   ({args.tickers/wall:,.0f} tickers/s)")
+    print(f"First result after: {first*1e3:10.1f} ms")
+    print(f"Ticker latency:     p50 {p50*1e3:.1f} ms   p95 {p95*1e3:.1f} ms   p99 {p99*1e3:.1f} ms")
+    print(f"Requests:           {provider.calls:,} ({provider.failures:,} injected failures), {failed} tickers failed")
+
+
+if __name__ == "__main__":
+    main()
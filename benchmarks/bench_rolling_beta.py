@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Benchmark: rolling betas recomputed over the full history vs. updated per day
+
+rolling_beta values every window of --days days × --tickers tickers at once;
+RollingBeta then adds --new-days days one at a time, as a daily refresh does.
+
+Usage:
+    python benchmarks/bench_rolling_beta.py [--tickers 3000] [--days 2520] [--window 252]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from betas import RollingBeta, rolling_beta  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tickers", type=int, default=3000, help="number of tickers")
+    parser.add_argument("--days", type=int, default=2520, help="days of returns (10 years by default)")
+    parser.add_argument("--window", type=int, default=252, help="beta window in days")
+    parser.add_argument("--new-days", type=int, default=20, help="days added incrementally")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    days = args.days + args.new_days
+    market = rng.normal(0.0004, 0.011, days)
+    stocks = market[:, None] * rng.uniform(0.3, 1.8, args.tickers) + rng.normal(0, 0.015, (days, args.tickers))
+
+    start = time.perf_counter()
+    full = rolling_beta(stocks[:args.days], market[:args.days], args.window)
+    full_time = time.perf_counter() - start
+
+    engine = RollingBeta(range(args.tickers), args.window)
+    for day in range(args.days - args.window, args.days):
+        engine.update(stocks[day], market[day])
+    start = time.perf_counter()
+    for day in range(args.days, days):
+        engine.update(stocks[day], market[day])
+    update_time = (time.perf_counter() - start) / args.new_days
+
+    recompute_time = full_time / args.days * args.window
+    max_diff = float(np.nanmax(np.abs(engine.beta - rolling_beta(stocks, market, args.window)[-1])))
+
+    print(f"Tickers × days:     {args.tickers:,} × {args.days:,} (window {args.window})")
+    print(f"Full history:       {full_time*1e3:10.2f} ms  ({full.size/full_time:,.0f} betas/s)")
+    print(f"Incremental day:    {update_time*1e3:10.3f} ms per day for all tickers")
+    print(f"Speed-up vs. one window recompute: {recompute_time/update_time:6.1f}x")
+    print(f"Max abs difference: {max_diff:.2e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Benchmark: every stage of the valuation hot path, from 1 to 10k tickers
+
+Runs on replayed synthetic fixtures (no network) and times each stage of the
+"Calculate Valuation" flow separately, for every ticker in the universe:
+
+    fetch            concurrent fetch of the replayed fundamentals, cold cache
+    perpetuity_pv    terminal value only
+    cash_flows       cf_list and the cash flow schedule built in app.main()
+    cash_flow_table  the pandas cash_flow_table
+    display_table    rounding, date formatting and transposition for display
+    figure           the Plotly cash flow chart
+    batch            the vectorized batch_intrinsic_value for the whole universe
+
+Each stage reports the best of --repeat runs; at scales where that would
+exceed ~1000 ticker-runs it is timed once. The full default run takes a
+couple of minutes, mostly building 10k Plotly figures.
+
+Usage:
+    python benchmarks/bench_valuation_pipeline.py [--scales 1,10,100,1000,10000] [--repeat 3]
+    python benchmarks/bench_valuation_pipeline.py --save valuation_baseline.json
+    python benchmarks/bench_valuation_pipeline.py --baseline valuation_baseline.json
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from baseline import add_baseline_arguments, check_baseline, save_baseline  # noqa: E402
+from ddm_core import batch_intrinsic_value, partial_year_fraction, perpetuity_pv  # noqa: E402
+from fetch_pipeline import fetch_universe  # noqa: E402
+from market_data import get_market_inputs, use_provider  # noqa: E402
+from providers import ReplayProvider, write_synthetic_fixtures  # noqa: E402
+from valuation_report import (build_cash_flow_figure, build_cash_flow_table,  # noqa: E402
+                              build_display_table, cash_flow_schedule)
+
+LONG_TERM_GROWTH = 0.035
+STAGES = ("fetch", "perpetuity_pv", "cash_flows", "cash_flow_table", "display_table", "figure", "batch")
+
+
+def model_inputs(data, market):
+    """(trailing dividend, growth, k_e) the way the page's default approach derives them"""
+    growth = data["Return on Equity (ROE)"] * (1 - data["Dividend Payout Ratio"])
+    k_e = market.risk_free_rate + data["Beta"] * market.market_risk_premium
+    return data["Dividend Per Share (trailing)"], growth, k_e
+
+
+def best_of(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def run_scale(n, fixtures, repeat):
+    tickers = [f"T{i:05d}" for i in range(n)]
+    year_fraction, div_payment_date = partial_year_fraction()
+    timings = {}
+
+    def fetch():
+        # A fresh temporary cache every time, so every fetch is cold
+        with use_provider(ReplayProvider(fixtures)):
+            return get_market_inputs(), {r.ticker: r.data for r in fetch_universe(tickers, rate=1e9)}
+
+    start = time.perf_counter()
+    market, fetched = fetch()
+    timings["fetch"] = time.perf_counter() - start
+    if repeat > 1:
+        timings["fetch"] = min(timings["fetch"], best_of(fetch, repeat - 1))
+
+    inputs = [model_inputs(fetched[t], market) for t in tickers]
+
+    def cash_flows():
+        return [(cf_list, cash_flow_schedule(cf_list, [g] * 5, year_fraction, div_payment_date, k_e, LONG_TERM_GROWTH))
+                for d0, g, k_e in inputs
+                for cf_list in ([d0 * (1 + g) ** i for i in range(1, 6)],)]
+
+    schedules = [schedule for _, schedule in cash_flows()]
+    tables = [build_cash_flow_table(schedule) for schedule in schedules]
+    columns = [np.array(c) for c in zip(*inputs)]
+
+    timings["perpetuity_pv"] = best_of(
+        lambda: [perpetuity_pv(d0 * (1 + g) ** 5, LONG_TERM_GROWTH, k_e) for d0, g, k_e in inputs], repeat)
+    timings["cash_flows"] = best_of(cash_flows, repeat)
+    timings["cash_flow_table"] = best_of(lambda: [build_cash_flow_table(s) for s in schedules], repeat)
+    timings["display_table"] = best_of(lambda: [build_display_table(t) for t in tables], repeat)
+    timings["figure"] = best_of(lambda: [build_cash_flow_figure(t) for t in tables], repeat)
+    timings["batch"] = best_of(
+        lambda: batch_intrinsic_value(columns[0], columns[1], columns[2], LONG_TERM_GROWTH, year_fraction), repeat)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", default="1,10,100,1000,10000", help="comma-separated universe sizes")
+    parser.add_argument("--repeat", type=int, default=3, help="timing repetitions (best is reported)")
+    add_baseline_arguments(parser)
+    args = parser.parse_args()
+    scales = [int(s) for s in args.scales.split(",")]
+
+    results = {}
+    with tempfile.TemporaryDirectory() as root:
+        fixtures = os.path.join(root, "fixtures")
+        write_synthetic_fixtures(fixtures, [f"T{i:05d}" for i in range(max(scales))])
+
+        print(f"{'Tickers':>8}" + "".join(f"{stage:>17}" for stage in STAGES) + "   (ms)")
+        for n in scales:
+            timings = run_scale(n, fixtures, max(1, min(args.repeat, 1000 // n)))
+            print(f"{n:>8,}" + "".join(f"{timings[stage]*1e3:>17.2f}" for stage in STAGES))
+            results.update({f"{stage}@{n}": timings[stage] * 1e3 for stage in STAGES})
+
+    if args.save:
+        save_baseline(args.save, results, unit="ms")
+    if args.baseline and not check_baseline(args.baseline, results, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
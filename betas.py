@@ -0,0 +1,208 @@
+"""
+Rolling CAPM betas from the locally stored daily closes.
+
+Instead of Yahoo's opaque ``info['beta']``, the beta of each ticker is the
+slope of its daily returns on the ^SP500TR returns over a trailing window of
+trading days. Every estimate is built from five running sums per ticker
+(count, Σx, Σy, Σxy, Σx²), so:
+
+- ``rolling_beta`` computes a whole (days × tickers) matrix of betas with
+  cumulative sums, without a Python loop over windows;
+- ``RollingBeta`` keeps the last window in a ring buffer and, as new days
+  arrive, adds the new day's terms and subtracts the dropped day's in
+  O(tickers) instead of recomputing the window. When the last day's close
+  is corrected (the history store refetches it, it may have been
+  intraday), its terms are swapped for the corrected ones the same way.
+
+A ticker's history only needs to cover the window, so it is seeded with
+``history_period(window)`` rather than the store's whole-history default.
+
+Days where a ticker has no close (not yet listed, halted) are skipped for that
+ticker only.
+"""
+
+import numpy as np
+
+from history_store import get_history_store
+
+MARKET_SYMBOL = "^SP500TR"
+DEFAULT_BETA_WINDOW = 252   # about one year of trading days
+
+# yfinance history periods and about how many trading days each covers
+HISTORY_PERIODS = (("3mo", 63), ("6mo", 126), ("1y", 252), ("2y", 504), ("5y", 1260), ("10y", 2520))
+
+
+def history_period(window):
+    """Shortest yfinance period with a close for each of ``window`` returns, with 5% to spare for holidays"""
+    needed = (window + 1) * 1.05
+    return next((period for period, days in HISTORY_PERIODS if days >= needed), "max")
+
+
+def window_start(window, store=None, market=MARKET_SYMBOL):
+    """Market day whose close is the base of the first return in the last ``window``, None without history"""
+    records = (store or get_history_store()).load(market)
+    if records is None or not len(records):
+        return None
+    return records["date"][max(0, len(records) - window - 1)]
+
+
+def aligned_returns(tickers, store=None, market=MARKET_SYMBOL, start=None):
+    """
+    Daily returns of ``tickers`` on the market's trading days.
+
+    Returns (dates, returns, market_returns) where ``returns`` has one column
+    per ticker and NaN where a close is missing. With ``start``, only returns
+    on days after ``start`` are included. Only stored history is read.
+    """
+    store = store or get_history_store()
+    records = store.load(market)
+    if records is None:
+        raise LookupError(f"no stored history for {market}")
+    days = records["date"].astype("datetime64[D]")
+    first = 0 if start is None else int(np.searchsorted(days, np.datetime64(start, "D")))
+    # Keep the close of ``start`` itself, it is the base of the first return
+    days, market_closes = days[first:], np.asarray(records["close"][first:])
+
+    closes = np.full((len(days), len(tickers)), np.nan)
+    for column, ticker in enumerate(tickers):
+        records = store.load(ticker)
+        if records is None or not len(days):
+            continue
+        ticker_days = records["date"].astype("datetime64[D]")
+        first = int(np.searchsorted(ticker_days, days[0]))
+        ticker_days, ticker_closes = ticker_days[first:], records["close"][first:]
+        rows = np.searchsorted(days, ticker_days)
+        found = rows < len(days)
+        found[found] = days[rows[found]] == ticker_days[found]
+        closes[rows[found], column] = ticker_closes[found]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        returns = closes[1:] / closes[:-1] - 1
+        market_returns = market_closes[1:] / market_closes[:-1] - 1
+    return days[1:], returns, market_returns
+
+
+def _moments(stock_returns, market_returns):
+    """count, Σx, Σy, Σxy, Σx² terms of each observation, stacked on a new first axis"""
+    stock_returns, market_returns = np.broadcast_arrays(stock_returns, market_returns)
+    valid = np.isfinite(stock_returns) & np.isfinite(market_returns)
+    x = np.where(valid, market_returns, 0.0)
+    y = np.where(valid, stock_returns, 0.0)
+    return np.stack([valid.astype(np.float64), x, y, x * y, x * x])
+
+
+def _beta(sums, min_periods):
+    count, sx, sy, sxy, sxx = sums
+    with np.errstate(divide="ignore", invalid="ignore"):
+        covariance = sxy - sx * sy / count
+        variance = sxx - sx * sx / count
+        beta = covariance / variance
+    return np.where((count >= min_periods) & (variance > 0), beta, np.nan)
+
+
+def rolling_beta(stock_returns, market_returns, window=DEFAULT_BETA_WINDOW, min_periods=None):
+    """
+    Beta of every ticker over the ``window`` days ending on each day.
+
+    ``stock_returns`` is (days × tickers), ``market_returns`` has one entry per
+    day. Returns a (days × tickers) array, NaN where fewer than
+    ``min_periods`` (default: half the window) days have returns.
+    """
+    min_periods = min_periods or window // 2
+    stock_returns = np.asarray(stock_returns, dtype=np.float64)
+    market_returns = np.asarray(market_returns, dtype=np.float64)[:, None]
+    sums = np.cumsum(_moments(stock_returns, market_returns), axis=1)
+    # Window sums are differences of cumulative sums `window` days apart
+    sums[:, window:] -= sums[:, :-window].copy()
+    return _beta(sums, min_periods)
+
+
+class RollingBeta:
+    """Incrementally updated betas of a fixed list of tickers over the last ``window`` days"""
+
+    def __init__(self, tickers, window=DEFAULT_BETA_WINDOW, min_periods=None):
+        self.tickers = list(tickers)
+        self.window = window
+        self.min_periods = min_periods or window // 2
+        self.last_date = None
+        self._base_date = None      # market day before last_date, the base of its returns
+        self._stock = np.full((window, len(self.tickers)), np.nan)
+        self._market = np.full(window, np.nan)
+        self._next = 0
+        self._sums = np.zeros((5, len(self.tickers)))
+
+    @classmethod
+    def from_history(cls, tickers, store=None, window=DEFAULT_BETA_WINDOW, min_periods=None):
+        """Betas over the last ``window`` stored days, ready for catch_up as new days are stored"""
+        engine = cls(tickers, window, min_periods)
+        dates, returns, market_returns = aligned_returns(engine.tickers, store)
+        days = min(window, len(dates))
+        if days:
+            engine._stock[:days] = returns[-days:]
+            engine._market[:days] = market_returns[-days:]
+            engine._next = days % window
+            engine._recompute()
+            engine.last_date = dates[-1]
+            engine._base_date = dates[-2] if len(dates) > 1 else None
+        return engine
+
+    def update(self, stock_returns, market_return, date=None):
+        """Add one day of returns (NaN where missing), dropping the oldest day in the window"""
+        slot = self._next
+        self._sums -= _moments(self._stock[slot], self._market[slot])
+        self._stock[slot] = stock_returns
+        self._market[slot] = market_return
+        self._sums += _moments(self._stock[slot], self._market[slot])
+        self._next = (slot + 1) % self.window
+        if self._next == 0:
+            # Once per cycle, so rounding errors of the running sums cannot build up
+            self._recompute()
+        if date is not None:
+            self._base_date, self.last_date = self.last_date, date
+
+    def correct_last(self, stock_returns, market_return):
+        """Replace the returns of the latest day, e.g. after its close was corrected; True if they changed"""
+        slot = (self._next - 1) % self.window
+        stock_returns = np.asarray(stock_returns, dtype=np.float64)
+        if np.array_equal(self._stock[slot], stock_returns, equal_nan=True) \
+                and np.array_equal(self._market[slot], market_return, equal_nan=True):
+            return False
+        self._sums -= _moments(self._stock[slot], self._market[slot])
+        self._stock[slot] = stock_returns
+        self._market[slot] = market_return
+        self._sums += _moments(self._stock[slot], self._market[slot])
+        return True
+
+    def catch_up(self, store=None):
+        """
+        Add the market days stored since the last update; returns how many were added.
+
+        A day is added once: refresh the tickers' histories before the
+        market's so their closes for that day are already stored. The last
+        day added before is read again, and its returns are corrected if
+        its closes have changed since.
+        """
+        if self.last_date is None:
+            raise ValueError("catch_up needs a RollingBeta created with from_history")
+        start = self.last_date if self._base_date is None else self._base_date
+        dates, returns, market_returns = aligned_returns(self.tickers, store, start=start)
+        overlap = np.flatnonzero(dates == self.last_date)
+        if len(overlap):
+            self.correct_last(returns[overlap[0]], market_returns[overlap[0]])
+        added = 0
+        for date, row, market_return in zip(dates, returns, market_returns):
+            if date > self.last_date:
+                self.update(row, market_return, date)
+                added += 1
+        return added
+
+    def _recompute(self):
+        self._sums = _moments(self._stock, self._market[:, None]).sum(axis=1)
+
+    @property
+    def beta(self):
+        """Current beta of each ticker, NaN where fewer than ``min_periods`` days have returns"""
+        return _beta(self._sums, self.min_periods)
+
+    def betas(self):
+        return dict(zip(self.tickers, self.beta.tolist()))
@@ -0,0 +1,153 @@
+"""
+Charts that stay light however much data is behind them.
+
+A Plotly figure ships every value of every trace to the browser, so its size
+and build time grow with the data, not with what fits on screen. The
+builders here reduce the data with NumPy before plotly sees it:
+
+- histograms are binned on the server and drawn as one bar per bin
+  (``binned_histogram``), whether there are a hundred tickers or a million
+  Monte Carlo paths; counts that are already binned, like a Monte Carlo
+  run's histogram, are merged into as many bars (``counts_figure``);
+- scatters are drawn with WebGL (``go.Scattergl``) from at most
+  ``max_points`` points (``decimate``), always keeping the extremes;
+- heatmaps are strided down to at most ``max_cells`` cells
+  (``downsample_grid``);
+- numbers are sent as float32, half the bytes of float64 on the wire.
+
+``report_figure`` records the serialized size of a figure in the
+instrumentation output when a trace or metrics are active; wrap the build in
+``instrumentation.stage`` for its time. plotly is only imported inside the
+figure builders.
+"""
+
+import numpy as np
+
+from instrumentation import increment, metrics_enabled, tracing
+
+DEFAULT_BINS = 100
+MAX_POINTS = 2000           # points per scatter
+MAX_HEATMAP_CELLS = 10_000  # e.g. 100 × 100
+
+
+def binned_histogram(values, bins=DEFAULT_BINS, clip=(0.5, 99.5)):
+    """
+    (bin centres, counts, bin width) of the finite ``values``, with the bins
+    spanning the ``clip`` percentiles so a few extreme values do not squash
+    the rest into one bar. Values outside the range are not counted.
+    """
+    values = np.asarray(values)
+    values = values[np.isfinite(values)]
+    if not len(values):
+        return np.empty(0), np.empty(0, dtype=np.int64), 0.0
+    low, high = np.percentile(values, clip) if clip else (values.min(), values.max())
+    if high <= low:
+        low, high = low - 0.5, high + 0.5
+    counts, edges = np.histogram(values, bins=bins, range=(low, high))
+    return (edges[:-1] + edges[1:]) / 2, counts, edges[1] - edges[0]
+
+
+def decimate(n, max_points=MAX_POINTS, keep=()):
+    """
+    Sorted indices of at most about ``max_points`` of ``n`` points: evenly
+    spaced ones plus the indices in ``keep`` (e.g. the argmin and argmax of
+    each axis).
+    """
+    if n <= max_points:
+        return np.arange(n)
+    spaced = np.linspace(0, n - 1, max_points - len(keep)).astype(np.int64)
+    return np.unique(np.concatenate([spaced, np.asarray(keep, dtype=np.int64)]))
+
+
+def downsample_grid(x, y, z, max_cells=MAX_HEATMAP_CELLS):
+    """Every k-th row and column of the grid z (len(y) × len(x)) so it has at most ``max_cells`` cells"""
+    x, y, z = np.asarray(x), np.asarray(y), np.asarray(z)
+    step = max(1, int(np.ceil(np.sqrt(z.size / max_cells))))
+    return x[::step], y[::step], z[::step, ::step]
+
+
+def histogram_figure(values, title, xaxis_title, yaxis_title="Share", bins=DEFAULT_BINS, total=None,
+                     marker=None, height=400):
+    """
+    Bar chart of binned ``values``, each bar the share of ``total`` (default:
+    the number of values) falling in its bin. ``marker`` is an optional
+    (x, label) drawn as a dashed vertical line.
+    """
+    centres, counts, width = binned_histogram(values, bins)
+    return _bar_figure(centres, counts, width, total or max(len(values), 1), title, xaxis_title, yaxis_title,
+                       marker, height)
+
+
+def counts_figure(edges, counts, title, xaxis_title, yaxis_title="Share", bins=DEFAULT_BINS, total=None,
+                  marker=None, height=400):
+    """
+    histogram_figure for values already counted into the equally wide bins
+    between ``edges``, e.g. SimulationResult.histogram: adjacent bins are
+    merged into at most ``bins`` bars. ``total`` defaults to the sum of the
+    counts.
+    """
+    edges, counts = np.asarray(edges, dtype=np.float64), np.asarray(counts)
+    step = max(1, -(-len(counts) // bins))
+    merged = np.add.reduceat(counts, np.arange(0, len(counts), step)) if len(counts) else counts
+    width = (edges[1] - edges[0]) * step if len(counts) else 0.0
+    centres = edges[:-1:step] + width / 2
+    return _bar_figure(centres, merged, width, total or max(int(counts.sum()), 1), title, xaxis_title,
+                       yaxis_title, marker, height)
+
+
+def _bar_figure(centres, counts, width, total, title, xaxis_title, yaxis_title, marker, height):
+    import plotly.graph_objects as go
+
+    fig = go.Figure(go.Bar(
+        x=centres.astype(np.float32),
+        y=(counts / total).astype(np.float32),
+        width=width,
+        marker_color='lightblue',
+        name=title
+    ))
+    if marker is not None:
+        fig.add_vline(x=marker[0], line_color='red', line_dash='dash', annotation_text=marker[1])
+    fig.update_layout(title=title, xaxis_title=xaxis_title, yaxis_title=yaxis_title, bargap=0, height=height)
+    return fig
+
+
+def scatter_figure(x, y, title, xaxis_title, yaxis_title, text=None, max_points=MAX_POINTS, log=False,
+                   height=500):
+    """
+    WebGL scatter of (x, y) decimated to about ``max_points`` points,
+    keeping the extremes of both axes. ``text`` labels the points on hover.
+    """
+    import plotly.graph_objects as go
+
+    x, y = np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64)
+    finite = np.flatnonzero(np.isfinite(x) & np.isfinite(y))
+    extremes = [f(a[finite]) for a in (x, y) for f in (np.argmin, np.argmax)] if len(finite) else []
+    shown = finite[decimate(len(finite), max_points, keep=extremes)]
+    fig = go.Figure(go.Scattergl(
+        x=x[shown].astype(np.float32),
+        y=y[shown].astype(np.float32),
+        text=None if text is None else [text[i] for i in shown],
+        mode='markers',
+        marker=dict(size=5, opacity=0.6),
+        hovertemplate='%{text}<br>%{x:,.2f}, %{y:,.2f}<extra></extra>' if text is not None else None
+    ))
+    if len(shown) < len(finite):
+        title = f"{title} ({len(shown):,} of {len(finite):,} shown)"
+    axis_type = "log" if log else None
+    fig.update_layout(title=title, xaxis_title=xaxis_title, yaxis_title=yaxis_title, height=height,
+                      xaxis_type=axis_type, yaxis_type=axis_type)
+    return fig
+
+
+def report_figure(name, fig):
+    """
+    Serialized size in bytes of ``fig``, recorded as ddm_chart_bytes_total
+    when a trace or metrics are active; None otherwise (serializing costs as
+    much as building).
+    """
+    if not (tracing() or metrics_enabled()):
+        return None
+    size = len(fig.to_json())
+    increment("ddm_charts_total", chart=name)
+    increment("ddm_chart_bytes_total", size, chart=name)
+    return size
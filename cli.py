@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Headless command-line mode of the Dividend Discount Model Calculator.
+
+Values a list of tickers with the page's default approach and streams one
+result per line (CSV or JSONL) as soon as each ticker is valued. Tickers come
+from the command line, a file, or stdin. This module never imports streamlit
+or plotly, so it starts quickly in cron jobs and containers.
+
+Usage:
+    ddm-calculator WMT KO PEP
+    ddm-calculator -f sp500.txt --format jsonl --workers 32
+    ddm-calculator -f universe.txt --format parquet --float32 -o nightly.parquet
+    cat tickers.txt | ddm-calculator > values.csv
+"""
+
+import argparse
+import csv
+import json
+import logging
+import os
+import sys
+from datetime import date
+from contextlib import ExitStack
+from functools import partial
+
+from backtest import BACKTEST_HISTORY, SnapshotStore
+from betas import DEFAULT_BETA_WINDOW
+from ddm_core import FORECAST_YEARS, partial_year_fraction
+from fetch_pipeline import DEFAULT_RATE, DEFAULT_WORKERS, fetch_batch
+from history_store import get_history_store
+from instrumentation import REGISTRY, enable_metrics
+from market_data import fetch_stock_data, get_rolling_beta, use_provider
+from providers import RecordingProvider, ReplayProvider, YahooProvider
+from result_export import COLUMNAR_FORMATS, ColumnarWriter
+from valuation import DEFAULT_LONG_TERM_GROWTH, RESULT_FIELDS, value_stock
+
+
+def read_tickers(args, stdin=sys.stdin):
+    """Tickers from the positional arguments, ``--file`` ("-" for stdin), or piped stdin"""
+    lines = list(args.tickers)
+    if args.file == "-" or (args.file is None and not lines and not stdin.isatty()):
+        lines.extend(stdin)
+    elif args.file is not None:
+        with open(args.file, encoding="utf-8") as fh:
+            lines.extend(fh)
+    # One or more tickers per line, separated by whitespace or commas; '#' starts a comment
+    return [t for line in lines for t in line.split("#", 1)[0].replace(",", " ").split()]
+
+
+class CsvWriter:
+    def __init__(self, out):
+        self.out = out
+        self.writer = csv.DictWriter(out, fieldnames=RESULT_FIELDS, lineterminator="\n")
+        self.writer.writeheader()
+        out.flush()
+
+    def write(self, row):
+        self.writer.writerow(row)
+        self.out.flush()
+
+
+class JsonlWriter:
+    def __init__(self, out):
+        self.out = out
+
+    def write(self, row):
+        self.out.write(json.dumps(row) + "\n")
+        self.out.flush()
+
+
+WRITERS = {"csv": CsvWriter, "jsonl": JsonlWriter}
+
+
+def fetch_with_rolling_beta(ticker, window, limiter=None, refresh=False):
+    """fetch_stock_data with the beta replaced by a rolling beta from the ticker's price history"""
+    data = fetch_stock_data(ticker, limiter=limiter, refresh=refresh)
+    beta = get_rolling_beta(ticker, window, refresh=refresh, limiter=limiter)
+    return data if beta is None else dict(data, Beta=beta)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="ddm-calculator",
+        description="Value tickers with the Dividend Discount Model and stream the results. "
+                    "For the web interface run: streamlit run app.py")
+    parser.add_argument("tickers", nargs="*", help="ticker symbols (default: read from --file or stdin)")
+    parser.add_argument("-f", "--file", help="file with ticker symbols, '-' for stdin")
+    parser.add_argument("--format", choices=sorted(WRITERS) + list(COLUMNAR_FORMATS), default="csv",
+                        help="output format; arrow and parquet need --output (default: csv)")
+    parser.add_argument("-o", "--output", help="write results to this file instead of stdout")
+    parser.add_argument("--float32", action="store_true",
+                        help="with --format arrow or parquet, store numbers as float32 instead of float64")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help=f"concurrent fetch threads (default: {DEFAULT_WORKERS})")
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE,
+                        help=f"maximum network requests per second (default: {DEFAULT_RATE:g})")
+    parser.add_argument("--retries", type=int, default=3, help="retries per ticker (default: 3)")
+    parser.add_argument("--cache-dir", help="directory for the on-disk caches (default: $DDM_CACHE_DIR "
+                                            "or ~/.cache/ddm-calculator)")
+    parser.add_argument("--refresh", action="store_true",
+                        help="refetch fundamentals and market history instead of using cached data")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--replay", metavar="DIR",
+                        help="serve market data from recorded fixtures in DIR instead of Yahoo Finance, cached in "
+                             "a provider/ subdirectory of --cache-dir or else a temporary directory")
+    source.add_argument("--record", metavar="DIR", help="save everything fetched from Yahoo Finance as fixtures in DIR")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="with --replay, seconds of simulated latency per request (default: 0)")
+    parser.add_argument("--jitter", type=float, default=0.0,
+                        help="with --replay, extra uniformly random latency up to this many seconds (default: 0)")
+    parser.add_argument("--failure-rate", type=float, default=0.0,
+                        help="with --replay, probability that a request fails (default: 0)")
+    parser.add_argument("--seed", type=int, help="with --replay, seed for the latency and failure draws")
+    parser.add_argument("--snapshot", metavar="DIR",
+                        help="also save the fetched fundamentals as today's point-in-time snapshot in DIR "
+                             "(for ddm-backtest) and backfill the ^TNX and ^SP500TR history back to the first "
+                             "snapshot in DIR")
+    parser.add_argument("--metrics", metavar="FILE",
+                        help="write Prometheus-format counters and timing histograms to FILE when done")
+    parser.add_argument("--log-timings", action="store_true",
+                        help="log every timed stage as a JSON line on stderr")
+    parser.add_argument("--long-term-growth", type=float, default=DEFAULT_LONG_TERM_GROWTH,
+                        help=f"long-term growth rate (default: {DEFAULT_LONG_TERM_GROWTH})")
+    parser.add_argument("--cost-of-equity", type=float,
+                        help="cost of equity for every ticker (default: CAPM from each ticker's beta)")
+    parser.add_argument("--beta-window", type=int, nargs="?", const=DEFAULT_BETA_WINDOW, metavar="DAYS",
+                        help=f"estimate beta from the last DAYS daily returns against ^SP500TR instead of "
+                             f"using Yahoo's beta (default window: {DEFAULT_BETA_WINDOW})")
+    parser.add_argument("--years", type=int, default=FORECAST_YEARS,
+                        help=f"years of explicitly forecast dividends before the terminal value "
+                             f"(default: {FORECAST_YEARS})")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.cache_dir:
+        # Read when the default cache and history store are first created
+        os.environ["DDM_CACHE_DIR"] = args.cache_dir
+
+    tickers = read_tickers(args)
+    if not tickers:
+        build_parser().error("no tickers given")
+    columnar = args.format in COLUMNAR_FORMATS
+    if columnar and not args.output:
+        build_parser().error(f"--format {args.format} needs --output")
+
+    if args.metrics or args.log_timings:
+        enable_metrics()
+    if args.log_timings:
+        logging.basicConfig(format="%(message)s")
+        logging.getLogger("ddm.perf").setLevel(logging.DEBUG)
+
+    with ExitStack() as stack:
+        if args.replay:
+            stack.enter_context(use_provider(ReplayProvider(args.replay, latency=args.latency, jitter=args.jitter,
+                                                            failure_rate=args.failure_rate, seed=args.seed),
+                                             args.cache_dir))
+        elif args.record:
+            stack.enter_context(use_provider(RecordingProvider(YahooProvider(), args.record), args.cache_dir))
+        return run(args, tickers, columnar)
+
+
+def run(args, tickers, columnar):
+    """Value ``tickers`` and write the results as ``args`` asks; returns the exit status"""
+    year_fraction, _ = partial_year_fraction()
+    fetch = partial(fetch_stock_data, refresh=args.refresh)
+    if args.beta_window:
+        fetch = partial(fetch_with_rolling_beta, window=args.beta_window, refresh=args.refresh)
+    try:
+        market, results = fetch_batch(tickers, refresh_market=args.refresh, max_workers=args.workers,
+                                      rate=args.rate, retries=args.retries, fetch=fetch)
+    except Exception as e:
+        print(f"error: could not fetch the risk-free rate and market return: {e}", file=sys.stderr)
+        return 1
+
+    if columnar:
+        # Buffered in chunks and renamed into place when complete, so nothing is visible before the end
+        out = None
+        writer = ColumnarWriter(args.output, args.format, args.years, args.long_term_growth, year_fraction,
+                                float32=args.float32)
+    else:
+        out = open(args.output, "w", encoding="utf-8", newline="") if args.output else sys.stdout
+    valued = failed = 0
+    fetched = {}
+    try:
+        if not columnar:
+            writer = WRITERS[args.format](out)
+        for result in results:
+            if result.error is not None:
+                row = dict.fromkeys(RESULT_FIELDS)
+                row.update(ticker=result.ticker, error=str(result.error))
+            else:
+                fetched[result.ticker] = result.data
+                row = value_stock(result.ticker, result.data, market, args.long_term_growth,
+                                  args.cost_of_equity, year_fraction, args.years)
+            if row["error"] is None:
+                valued += 1
+            else:
+                failed += 1
+            writer.write(row)
+        if columnar:
+            writer.close()
+    except BrokenPipeError:
+        # Output piped into e.g. `head`; point stdout at devnull so the exit flush does not fail again
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 1
+    except BaseException:
+        if columnar:
+            # Leave no truncated file under the output name
+            writer.abort()
+        raise
+    finally:
+        if out not in (None, sys.stdout):
+            out.close()
+
+    print(f"Valued {valued} tickers, {failed} failed", file=sys.stderr)
+    if args.snapshot and fetched:
+        snapshots = SnapshotStore(args.snapshot)
+        snapshots.write_stock_data(date.today(), fetched)
+        first = snapshots.dates()[0]
+        for symbol in BACKTEST_HISTORY:
+            try:
+                get_history_store().backfill(symbol, first)
+            except Exception as e:
+                print(f"warning: could not backfill {symbol} history to {first}: {e}", file=sys.stderr)
+    if args.metrics:
+        REGISTRY.write_prometheus(args.metrics)
+    return 0 if valued else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
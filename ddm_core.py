@@ -0,0 +1,319 @@
+"""
+Core Dividend Discount Model math.
+
+Everything in this module works on plain floats as well as NumPy arrays, so
+the same formulas back the single-ticker Streamlit page and batch valuations
+of a whole universe. It must only depend on the standard library and NumPy.
+"""
+
+from datetime import datetime, timedelta
+
+import numpy as np
+
+# Length of a year used throughout the model (365 days, 5h 49m 12s)
+ONE_YEAR = timedelta(days=365, hours=5, minutes=49, seconds=12)
+
+# Default number of explicitly forecast dividend years before the terminal value
+FORECAST_YEARS = 5
+
+
+def perpetuity_pv(cash_flow, growth_rate, discount_rate):
+    perpetuity_pv = cash_flow*(1+growth_rate) / (discount_rate - growth_rate)
+    return perpetuity_pv
+
+
+def partial_year_fraction(today=None):
+    """Return the fraction of the year left until the 31 December dividend date, and that date."""
+    today = today or datetime.today()
+    end = datetime(today.year, 12, 31)
+    return (end - today) / ONE_YEAR, end
+
+
+def growing_annuity_factor(growth_rate, k_e, years):
+    """
+    Closed form of sum over t = 1..years of (1 + g)**t / (1 + k_e)**(t - 1).
+
+    This is the value at the first payment date of
+    dividends growing at ``g`` from a dividend of 1. Computed in O(1) from
+    the geometric series, with expm1/log1p so that g close to k_e stays exact.
+    """
+    g, k, n = (np.asarray(x, dtype=np.float64) for x in (growth_rate, k_e, years))
+    log_ratio = np.log1p(g) - np.log1p(k)
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        series = np.where(log_ratio == 0, n, np.expm1(n * log_ratio) / np.expm1(log_ratio))
+    return (1 + g) * series
+
+
+def batch_intrinsic_value(trailing_dividend, growth_rate, k_e, long_term_growth,
+                          year_fraction, years=FORECAST_YEARS):
+    """
+    Value many tickers at once with the same model as the Streamlit page.
+
+    All inputs broadcast against each other, so any of them (``years``
+    included) may be a scalar or an array with one entry per ticker. Dividends
+    grow at ``growth_rate`` for ``years`` years, the first payment is scaled
+    by ``year_fraction``, and a growing perpetuity is added in the final year.
+    The cost does not depend on ``years``: the explicit dividends are summed
+    with growing_annuity_factor. Tickers where ``k_e <= long_term_growth``
+    have no finite value and come back as NaN.
+    """
+    d0, g, k, lt_g, frac, n = np.broadcast_arrays(
+        *(np.asarray(x, dtype=np.float64) for x in
+          (trailing_dividend, growth_rate, k_e, long_term_growth, year_fraction, years))
+    )
+
+    log_discount = np.log1p(k)
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        # Only the first payment is scaled by the partial year
+        explicit = d0 * (growing_annuity_factor(g, k, n) - (1 - frac) * (1 + g))
+        value = explicit * np.exp(-frac * log_discount)
+
+        final_dividend = d0 * np.exp(n * np.log1p(g))
+        terminal_value = perpetuity_pv(final_dividend, lt_g, k)
+        value += terminal_value * np.exp(-(frac + n - 1) * log_discount)
+
+    return np.where(k > lt_g, value, np.nan)
+
+
+def schedule_value(cash_flows, k_e, long_term_growth, year_fraction):
+    """
+    Value explicit dividend paths of any length, one row per ticker.
+
+    ``cash_flows`` has shape (..., years); the other inputs broadcast against
+    its leading dimensions. Discounting follows the page: the first payment is
+    scaled by ``year_fraction`` and a growing perpetuity on the last dividend
+    is added in the final year. Use this when growth changes every year; for a
+    constant growth rate batch_intrinsic_value is O(1) in the horizon.
+    """
+    cf = np.asarray(cash_flows, dtype=np.float64)
+    k = np.asarray(k_e, dtype=np.float64)
+    lt_g = np.asarray(long_term_growth, dtype=np.float64)
+    frac = np.asarray(year_fraction, dtype=np.float64)
+
+    exponents = frac[..., None] + np.arange(cf.shape[-1])
+    factors = np.exp(-exponents * np.log1p(k)[..., None])
+    adjusted = cf.copy()
+    adjusted[..., 0] = adjusted[..., 0] * frac
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        value = (adjusted * factors).sum(axis=-1)
+        value = value + perpetuity_pv(cf[..., -1], lt_g, k) * factors[..., -1]
+
+    return np.where(k > lt_g, value, np.nan)
+
+
+def three_stage_value(trailing_dividend, high_growth, long_term_growth, k_e, year_fraction,
+                      high_years=FORECAST_YEARS, transition_years=5):
+    """
+    Three-stage DDM, vectorized across tickers.
+
+    Dividends grow at ``high_growth`` for ``high_years`` (at least 1) years,
+    then growth declines linearly over ``transition_years`` years until it
+    reaches ``long_term_growth``, where it stays forever. The high-growth
+    stage is summed in closed form. The transition stage costs one vector
+    operation per transition year, so ``transition_years`` must be a single
+    integer shared by the batch. With ``transition_years=0`` this is
+    batch_intrinsic_value.
+    """
+    d0, g1, lt_g, k, frac, n1 = np.broadcast_arrays(
+        *(np.asarray(x, dtype=np.float64) for x in
+          (trailing_dividend, high_growth, long_term_growth, k_e, year_fraction, high_years))
+    )
+    transition_years = int(transition_years)
+    if transition_years == 0:
+        return batch_intrinsic_value(d0, g1, k, lt_g, frac, n1)
+
+    log_discount = np.log1p(k)
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        value = d0 * (growing_annuity_factor(g1, k, n1) - (1 - frac) * (1 + g1)) * np.exp(-frac * log_discount)
+
+        cash_flow = d0 * np.exp(n1 * np.log1p(g1))
+        factor = np.exp(-(frac + n1 - 1) * log_discount)
+        for year in range(1, transition_years + 1):
+            growth = g1 + (lt_g - g1) * year / transition_years
+            cash_flow = cash_flow * (1 + growth)
+            factor = factor / (1 + k)
+            value += cash_flow * factor
+
+        value += perpetuity_pv(cash_flow, lt_g, k) * factor
+
+    return np.where(k > lt_g, value, np.nan)
+
+
+def h_model_value(trailing_dividend, short_term_growth, long_term_growth, half_life, k_e):
+    """
+    Fuller-Hsia H-model: growth starts at ``short_term_growth`` and declines
+    linearly to ``long_term_growth`` over 2 × ``half_life`` years.
+
+    Closed form, valued today on the last annual dividend without the page's
+    partial-year adjustment. NaN where ``k_e <= long_term_growth``.
+    """
+    d0, gs, gl, h, k = (np.asarray(x, dtype=np.float64) for x in
+                        (trailing_dividend, short_term_growth, long_term_growth, half_life, k_e))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        value = d0 * ((1 + gl) + h * (gs - gl)) / (k - gl)
+    return np.where(k > gl, value, np.nan)
+
+
+def _series_slope(log_ratio, n):
+    """
+    Derivative with respect to L of sum over t = 1..n of exp((t - 1) L).
+
+    Uses a Taylor expansion for |L| < 1e-6, where the closed form cancels.
+    """
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        exact = (n * np.exp(n * log_ratio) * np.expm1(log_ratio) - np.expm1(n * log_ratio) * np.exp(log_ratio)) \
+            / np.expm1(log_ratio) ** 2
+    taylor = n * (n - 1) / 2 + log_ratio * n * (n - 1) * (2 * n - 1) / 6
+    return np.where(np.abs(log_ratio) < 1e-6, taylor, exact)
+
+
+def _value_and_slope(d0, g, k, lt_g, frac, n):
+    """batch_intrinsic_value and its analytic derivative with respect to k_e"""
+    log_discount = np.log1p(k)
+    log_ratio = np.log1p(g) - log_discount
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        series = growing_annuity_factor(g, k, n) / (1 + g) - (1 - frac)
+        explicit = d0 * (1 + g) * np.exp(-frac * log_discount)
+        explicit_slope = -explicit / (1 + k) * (frac * series + _series_slope(log_ratio, n))
+
+        terminal = perpetuity_pv(d0 * np.exp(n * np.log1p(g)), lt_g, k) * np.exp(-(frac + n - 1) * log_discount)
+        terminal_slope = -terminal * (1 / (k - lt_g) + (frac + n - 1) / (1 + k))
+
+    return explicit * series + terminal, explicit_slope + terminal_slope
+
+
+def _schedule_value_and_slope(cf, k, lt_g, frac):
+    """schedule_value and its analytic derivative with respect to k_e"""
+    exponents = frac[..., None] + np.arange(cf.shape[-1])
+    factors = np.exp(-exponents * np.log1p(k)[..., None])
+    adjusted = cf.copy()
+    adjusted[..., 0] = adjusted[..., 0] * frac
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        terminal = perpetuity_pv(cf[..., -1], lt_g, k) * factors[..., -1]
+        value = (adjusted * factors).sum(axis=-1) + terminal
+        slope = -(adjusted * factors * exponents).sum(axis=-1) / (1 + k) \
+            - terminal * (1 / (k - lt_g) + exponents[..., -1] / (1 + k))
+    return value, slope
+
+
+def _solve_cost_of_equity(value_and_slope, price, lt_g, guess, tol, max_iter):
+    """
+    Safeguarded Newton iteration for the k_e > lt_g where value_and_slope(k_e) == price.
+
+    The DDM value falls monotonically from +inf at k_e = lt_g towards 0, so
+    [lo, hi] always brackets the root. Newton runs on log(value), which is
+    close to linear in k_e, from a Gordon growth guess; steps that leave the
+    bracket are replaced by bisection, as in Brent's method. Every ticker
+    iterates in the same arrays until all have converged.
+    """
+    lo = lt_g.copy()
+    hi = lt_g + 1.0
+    # Widen the bracket until the value drops below the price (or give up on that ticker)
+    for _ in range(60):
+        value, _ = value_and_slope(hi)
+        short = value > price
+        if not short.any():
+            break
+        hi = np.where(short, lt_g + 2 * (hi - lt_g), hi)
+    solvable = (price > 0) & (value <= price)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        log_price = np.log(price)
+    k = np.where((guess > lo) & (guess < hi), guess, (lo + hi) / 2)
+    for _ in range(max_iter):
+        value, slope = value_and_slope(k)
+        lo = np.where(value > price, k, lo)
+        hi = np.where(value < price, k, hi)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            step = k - (np.log(value) - log_price) * value / slope
+        step = np.where(np.isfinite(step) & (step >= lo) & (step <= hi), step, (lo + hi) / 2)
+        done = ~solvable | (np.abs(step - k) <= tol * (1 + np.abs(k)))
+        k = step
+        if done.all():
+            break
+
+    return np.where(solvable, k, np.nan)
+
+
+def implied_cost_of_equity(price, trailing_dividend, growth_rate, long_term_growth, year_fraction,
+                           years=FORECAST_YEARS, tol=1e-12, max_iter=100):
+    """
+    The cost of equity at which batch_intrinsic_value equals ``price``.
+
+    This is the annual return implied by the market price under the model.
+    Inputs broadcast like batch_intrinsic_value, so a whole universe is solved
+    in one call; each iteration is O(1) in ``years``. NaN where there is no
+    solution (non-positive price or dividend).
+    """
+    price, d0, g, lt_g, frac, n = np.broadcast_arrays(
+        *(np.asarray(x, dtype=np.float64) for x in
+          (price, trailing_dividend, growth_rate, long_term_growth, year_fraction, years))
+    )
+    with np.errstate(divide="ignore", invalid="ignore"):
+        guess = lt_g + d0 * (1 + g) / price
+    result = _solve_cost_of_equity(lambda k: _value_and_slope(d0, g, k, lt_g, frac, n),
+                                   price, lt_g, guess, tol, max_iter)
+    return np.where(d0 > 0, result, np.nan)
+
+
+def schedule_implied_cost_of_equity(price, cash_flows, long_term_growth, year_fraction,
+                                    tol=1e-12, max_iter=100):
+    """implied_cost_of_equity for explicit dividend paths, as valued by schedule_value"""
+    cf = np.asarray(cash_flows, dtype=np.float64)
+    price, lt_g, frac = np.broadcast_arrays(
+        *(np.asarray(x, dtype=np.float64) for x in (price, long_term_growth, year_fraction)),
+        np.empty(cf.shape[:-1])
+    )[:3]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        guess = lt_g + cf[..., 0] / price
+    result = _solve_cost_of_equity(lambda k: _schedule_value_and_slope(cf, k, lt_g, frac),
+                                   price, lt_g, guess, tol, max_iter)
+    return np.where((cf >= 0).all(axis=-1) & (cf[..., -1] > 0), result, np.nan)
+
+
+def implied_long_term_growth(price, trailing_dividend, growth_rate, k_e, year_fraction, years=FORECAST_YEARS):
+    """
+    The long-term growth rate at which batch_intrinsic_value equals ``price``.
+
+    The value is a Möbius function of long-term growth, so this is solved
+    exactly rather than iterated. NaN where the explicit dividends alone are
+    worth more than the price, or where the final dividend is not positive
+    (no growth rate turns it into a positive terminal value).
+    """
+    price, d0, g, k, frac, n = np.broadcast_arrays(
+        *(np.asarray(x, dtype=np.float64) for x in (price, trailing_dividend, growth_rate, k_e, year_fraction, years))
+    )
+    log_discount = np.log1p(k)
+    explicit = d0 * (growing_annuity_factor(g, k, n) - (1 - frac) * (1 + g)) * np.exp(-frac * log_discount)
+    terminal = (price - explicit) * np.exp((frac + n - 1) * log_discount)
+    final_dividend = d0 * np.exp(n * np.log1p(g))
+    # terminal = D_N (1 + lt_g) / (k - lt_g)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        lt_g = (terminal * k - final_dividend) / (terminal + final_dividend)
+    return np.where((terminal > 0) & (final_dividend > 0), lt_g, np.nan)
+
+
+def sensitivity_grid(cash_flows, year_fraction, k_e_values, long_term_growth_values):
+    """
+    Intrinsic value for every (k_e, long-term growth) pair in one pass.
+
+    ``cash_flows`` are the explicit forecast dividends, valued exactly as in
+    the Streamlit cash flow table. Returns an array of shape
+    ``(len(k_e_values), len(long_term_growth_values))``; pairs where
+    ``k_e <= long_term_growth`` have no finite value and are NaN.
+    """
+    cash_flows = np.asarray(cash_flows, dtype=np.float64)
+    k = np.asarray(k_e_values, dtype=np.float64)[:, None]
+    lt_g = np.asarray(long_term_growth_values, dtype=np.float64)[None, :]
+
+    adjusted = cash_flows.copy()
+    adjusted[0] *= year_fraction
+    # Discount factors per (k_e, period); the explicit cash flows do not depend on growth
+    factors = (1 + k) ** -(year_fraction + np.arange(len(cash_flows)))
+    explicit = (factors @ adjusted)[:, None]
+
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        terminal_value = perpetuity_pv(cash_flows[-1], lt_g, k)
+        value = explicit + terminal_value * factors[:, -1:]
+
+    return np.where(k > lt_g, value, np.nan)
@@ -0,0 +1,143 @@
+"""
+Concurrent multi-ticker fetch pipeline.
+
+Fundamentals for a list of tickers are fetched on a bounded thread pool.
+Every network request first takes a token from a shared token bucket, failed
+fetches are retried with exponential backoff, and the market-wide inputs
+(risk-free rate, S&P 500 CAGR) are fetched once, alongside the tickers and
+under the same rate limit and retries, and shared by the whole batch.
+"""
+
+import contextvars
+import random
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from instrumentation import increment, observe
+from market_data import fetch_market_inputs, fetch_stock_data
+
+DEFAULT_WORKERS = 16
+DEFAULT_RATE = 8.0  # network requests per second
+
+FetchResult = namedtuple("FetchResult", ["ticker", "data", "error", "elapsed"])
+
+
+class TokenBucket:
+    """Thread-safe token bucket allowing ``rate`` acquisitions per second with bursts up to ``capacity``"""
+
+    def __init__(self, rate, capacity=None, clock=time.monotonic, sleep=time.sleep):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self.clock = clock
+        self.sleep = sleep
+        self._tokens = self.capacity
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = self.clock()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                # Tolerance so float rounding cannot leave us waiting for 1e-16 of a token
+                if self._tokens >= 1 - 1e-9:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            self.sleep(wait)
+
+
+def with_retries(fn, retries=3, backoff=0.5, max_backoff=8.0, sleep=time.sleep):
+    """Call ``fn()``, retrying up to ``retries`` times with jittered exponential backoff"""
+    for attempt in range(retries + 1):
+        try:
+            return fn()
+        except Exception:
+            if attempt == retries:
+                raise
+            increment("ddm_fetch_retries_total")
+            delay = min(max_backoff, backoff * 2 ** attempt)
+            sleep(delay * random.uniform(0.5, 1.0))
+
+
+def _submit_universe(pool, tickers, retries, backoff, fetch, limiter):
+    """Submit one fetch job per unique ticker to ``pool``; returns the futures"""
+    unique = list(dict.fromkeys(t.strip().upper() for t in tickers if t and t.strip()))
+
+    def job(ticker):
+        start = time.perf_counter()
+        try:
+            data = with_retries(lambda: fetch(ticker, limiter=limiter), retries=retries, backoff=backoff)
+            result = FetchResult(ticker, data, None, time.perf_counter() - start)
+        except Exception as e:
+            result = FetchResult(ticker, None, e, time.perf_counter() - start)
+        outcome = "ok" if result.error is None else "error"
+        increment("ddm_ticker_fetches_total", result=outcome)
+        observe("ddm_ticker_fetch_seconds", result.elapsed, result=outcome)
+        return result
+
+    # Run each job in a copy of the caller's context so its stages land in the caller's trace
+    return [pool.submit(contextvars.copy_context().run, job, ticker) for ticker in unique]
+
+
+def _completed(pool, futures):
+    """Yield the results of ``futures`` as they complete, then shut ``pool`` down"""
+    try:
+        for future in as_completed(futures):
+            yield future.result()
+    finally:
+        for future in futures:
+            future.cancel()
+        pool.shutdown()
+
+
+def fetch_universe(tickers, max_workers=DEFAULT_WORKERS, rate=DEFAULT_RATE, retries=3,
+                   backoff=0.5, fetch=fetch_stock_data, limiter=None):
+    """
+    Fetch fundamentals for ``tickers`` in parallel.
+
+    Yields a FetchResult per unique ticker as soon as it completes, so
+    callers can start valuing while the rest of the batch is in flight.
+    A failing ticker yields a result with ``error`` set instead of raising.
+    """
+    pool = ThreadPoolExecutor(max_workers=max_workers)
+    futures = _submit_universe(pool, tickers, retries, backoff, fetch, limiter or TokenBucket(rate))
+    yield from _completed(pool, futures)
+
+
+def fetch_batch(tickers, market_inputs=None, refresh_market=False, max_workers=DEFAULT_WORKERS,
+                rate=DEFAULT_RATE, retries=3, backoff=0.5, fetch=fetch_stock_data, limiter=None):
+    """
+    Start fetching ``tickers`` and the market-wide inputs together.
+
+    Returns ``(market_inputs, results)`` once the market inputs are in, with
+    the ticker fetches already running; ``results`` yields FetchResults like
+    fetch_universe. Pass ``market_inputs`` to reuse ones already fetched by
+    an earlier batch, ``refresh_market`` to refetch them.
+
+    The market inputs go through the limiter and are retried like a
+    ticker; if they still cannot be fetched, the error is raised and the
+    ticker fetches are cancelled, rather than valuing the whole batch with
+    the default constants.
+    """
+    limiter = limiter or TokenBucket(rate)
+    # One extra worker for the market inputs, so the tickers keep their full concurrency
+    pool = ThreadPoolExecutor(max_workers=max_workers + (market_inputs is None))
+    try:
+        market_future = None
+        if market_inputs is None:
+            def market_job():
+                return with_retries(lambda: fetch_market_inputs(refresh_market, limiter=limiter),
+                                    retries=retries, backoff=backoff)
+
+            market_future = pool.submit(contextvars.copy_context().run, market_job)
+        futures = _submit_universe(pool, tickers, retries, backoff, fetch, limiter)
+        if market_future is not None:
+            market_inputs = market_future.result()
+    except BaseException:
+        pool.shutdown(wait=False, cancel_futures=True)
+        raise
+    return market_inputs, _completed(pool, futures)
@@ -0,0 +1,182 @@
+"""
+Persistent on-disk cache for yfinance ``.info`` fundamentals.
+
+Entries live in a small SQLite database keyed by ticker. Each field has its
+own time-to-live (prices go stale quickly, ROE and payout ratios do not), the
+number of tickers is bounded with least-recently-used eviction, and hit/miss
+counters are kept for monitoring.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from instrumentation import increment, stage
+
+MINUTE = 60
+HOUR = 60 * MINUTE
+DAY = 24 * HOUR
+
+# Time-to-live in seconds for individual .info fields; anything else uses DEFAULT_TTL
+FIELD_TTLS = {
+    "currentPrice": 15 * MINUTE,
+    "regularMarketPrice": 15 * MINUTE,
+    "dividendDate": 12 * HOUR,
+    "dividendRate": DAY,
+    "trailingAnnualDividendRate": DAY,
+    "beta": DAY,
+    "sharesOutstanding": DAY,
+    "returnOnEquity": 7 * DAY,
+    "payoutRatio": 7 * DAY,
+    "bookValue": 7 * DAY,
+    "netIncomeToCommon": 7 * DAY,
+    "longName": 30 * DAY,
+}
+DEFAULT_TTL = DAY
+DEFAULT_MAX_ENTRIES = 10000
+
+
+def default_cache_dir():
+    """Directory for on-disk caches, overridable with DDM_CACHE_DIR"""
+    return os.environ.get("DDM_CACHE_DIR") or os.path.join(
+        os.path.expanduser("~"), ".cache", "ddm-calculator")
+
+
+def yahoo_info(ticker):
+    import yfinance as yf
+    return yf.Ticker(ticker).info
+
+
+class FundamentalsCache:
+    """
+    Ticker -> ``.info`` dict cache backed by SQLite.
+
+    ``fetch`` is called with a ticker on a miss and must return the full
+    ``.info`` dict. The cache is safe to share between threads.
+    """
+
+    def __init__(self, path=None, fetch=yahoo_info, max_entries=DEFAULT_MAX_ENTRIES,
+                 field_ttls=None, default_ttl=DEFAULT_TTL, clock=time.time):
+        if path is None:
+            os.makedirs(default_cache_dir(), exist_ok=True)
+            path = os.path.join(default_cache_dir(), "fundamentals.sqlite")
+        self.path = path
+        self.fetch = fetch
+        self.max_entries = max_entries
+        self.field_ttls = dict(FIELD_TTLS if field_ttls is None else field_ttls)
+        self.default_ttl = default_ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS info ("
+            " ticker TEXT PRIMARY KEY,"
+            " payload TEXT NOT NULL,"
+            " fetched_at REAL NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS info_last_access ON info (last_access)")
+
+    def ttl(self, fields):
+        """Shortest TTL among ``fields``; with no fields any cached entry is fresh"""
+        if fields is None:
+            return min([self.default_ttl, *self.field_ttls.values()])
+        return min((self.field_ttls.get(f, self.default_ttl) for f in fields), default=float("inf"))
+
+    def get(self, ticker, fields=None, fetch=None):
+        """
+        Return the ``.info`` dict for ``ticker``, refetching it when any of
+        ``fields`` (all fields when None) has outlived its TTL. ``fetch``
+        overrides the cache's fetch function for this call.
+        """
+        ticker = ticker.upper()
+        now = self.clock()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload, fetched_at FROM info WHERE ticker = ?", (ticker,)).fetchone()
+            if row is not None and now - row[1] < self.ttl(fields):
+                self.hits += 1
+                increment("ddm_cache_requests_total", cache="fundamentals", result="hit")
+                self._conn.execute("UPDATE info SET last_access = ? WHERE ticker = ?", (now, ticker))
+                return json.loads(row[0])
+            self.misses += 1
+            increment("ddm_cache_requests_total", cache="fundamentals", result="miss")
+
+        info = (fetch or self.fetch_info)(ticker)
+        self.put(ticker, info)
+        return info
+
+    def fetch_info(self, ticker):
+        """Fetch ``ticker`` from the source without touching the cache, timed as the fetch.info stage"""
+        with stage("fetch.info"):
+            return self.fetch(ticker)
+
+    def put(self, ticker, info):
+        now = self.clock()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO info (ticker, payload, fetched_at, last_access) VALUES (?, ?, ?, ?)",
+                (ticker.upper(), json.dumps(info, default=str), now, now))
+            self._evict()
+
+    def fetched_at(self, ticker):
+        """Timestamp of the cached entry for ``ticker``, or None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT fetched_at FROM info WHERE ticker = ?", (ticker.upper(),)).fetchone()
+        return row[0] if row else None
+
+    def invalidate(self, ticker=None):
+        """Drop one ticker, or everything when ``ticker`` is None"""
+        with self._lock:
+            if ticker is None:
+                self._conn.execute("DELETE FROM info")
+            else:
+                self._conn.execute("DELETE FROM info WHERE ticker = ?", (ticker.upper(),))
+
+    def _evict(self):
+        count = self._conn.execute("SELECT COUNT(*) FROM info").fetchone()[0]
+        excess = count - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM info WHERE ticker IN "
+                "(SELECT ticker FROM info ORDER BY last_access LIMIT ?)", (excess,))
+            self.evictions += excess
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM info").fetchone()[0]
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses,
+                "evictions": self.evictions, "entries": len(self)}
+
+    def close(self):
+        self._conn.close()
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_default_cache():
+    """Process-wide cache in the default cache directory"""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = FundamentalsCache()
+        return _default_cache
+
+
+def set_default_cache(cache):
+    """Replace the process-wide cache, e.g. with one fed by a different data provider"""
+    global _default_cache
+    with _default_lock:
+        _default_cache = cache
@@ -0,0 +1,187 @@
+"""
+Compact in-memory fundamentals of a ticker universe.
+
+``fetch_stock_data`` returns a dict of a dozen boxed values under long
+descriptive keys; a universe held as one such dict per ticker takes about
+620 bytes per ticker (benchmarks/bench_fundamentals_memory.py).
+``FundamentalsTable`` keeps only the inputs of the batch model, column by
+column, in about 220 bytes per ticker, most of it the index:
+
+- one typed NumPy array per field in TABLE_FIELDS (float64 by default,
+  float32 on request), NaN where a value is missing;
+- a dict from upper-cased ticker symbol to row. Symbols are interned as
+  they are added, so the index and row order list of every table share
+  one string per symbol: a further table of the same universe (e.g. one
+  per snapshot date) takes about 125 bytes per ticker, 100 in float32.
+  A ticker refreshed many times a day keeps its row and adds nothing;
+- capacity that doubles as tickers are added, like a list.
+
+Refreshes overwrite rows in place (``update`` for one fetched dict,
+``update_many`` for whole columns, e.g. intraday prices), and ``value``
+hands the columns straight to ``ddm_core.batch_intrinsic_value`` with no
+per-ticker objects in between. ``table[column]`` returns a view of the
+filled rows, so ``backtest.value_snapshot`` also accepts a table.
+"""
+
+import sys
+import threading
+from collections import namedtuple
+
+import numpy as np
+
+from ddm_core import FORECAST_YEARS, batch_intrinsic_value, partial_year_fraction
+from valuation import DEFAULT_LONG_TERM_GROWTH
+
+# Table columns and the fetch_stock_data keys they are taken from
+TABLE_FIELDS = {
+    "price": "Last Stock Price",
+    "trailing_dividend": "Dividend Per Share (trailing)",
+    "beta": "Beta",
+    "roe": "Return on Equity (ROE)",
+    "payout": "Dividend Payout Ratio",
+    "shares": "Shares Outstanding",
+}
+
+DEFAULT_CAPACITY = 1024
+
+
+class Fundamentals(namedtuple("Fundamentals", ("ticker",) + tuple(TABLE_FIELDS))):
+    """One row of a FundamentalsTable, missing values as None"""
+    __slots__ = ()
+
+
+class FundamentalsTable:
+    """Fundamentals of a ticker universe in typed NumPy columns, one row per ticker"""
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, dtype=np.float64):
+        self.dtype = np.dtype(dtype)
+        self._index = {}
+        self._tickers = []
+        self._columns = {name: np.full(max(capacity, 1), np.nan, dtype=self.dtype) for name in TABLE_FIELDS}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_stock_data(cls, stock_data, dtype=np.float64):
+        """Table of ``{ticker: fetch_stock_data(ticker)}``"""
+        table = cls(len(stock_data), dtype)
+        for ticker, data in stock_data.items():
+            table.update(ticker, data)
+        return table
+
+    def __len__(self):
+        return len(self._tickers)
+
+    def __contains__(self, ticker):
+        return ticker.upper() in self._index
+
+    def __getitem__(self, column):
+        """View of ``column`` over the filled rows; writes to it change the table"""
+        return self._columns[column][:len(self._tickers)]
+
+    @property
+    def tickers(self):
+        """Ticker of each row, in row order"""
+        return list(self._tickers)
+
+    @property
+    def capacity(self):
+        return len(self._columns["price"])
+
+    @property
+    def nbytes(self):
+        """Bytes held by the column arrays (the index is a dict of the ticker strings)"""
+        return sum(column.nbytes for column in self._columns.values())
+
+    def row(self, ticker):
+        """Row of ``ticker``, None if it is not in the table"""
+        return self._index.get(ticker.upper())
+
+    def rows(self, tickers, add=False):
+        """Rows of ``tickers`` as an index array; unknown tickers are appended with ``add``, -1 otherwise"""
+        if not add:
+            return np.array([self._index.get(t.upper(), -1) for t in tickers], dtype=np.intp)
+        with self._lock:
+            return np.array([self._add(t) for t in tickers], dtype=np.intp)
+
+    def _add(self, ticker):
+        # Called with the lock held
+        ticker = ticker.upper()
+        row = self._index.get(ticker)
+        if row is None:
+            ticker = sys.intern(ticker)
+            row = len(self._tickers)
+            if row == self.capacity:
+                self._grow(2 * row)
+            self._tickers.append(ticker)
+            self._index[ticker] = row
+        return row
+
+    def _grow(self, capacity):
+        for name, column in self._columns.items():
+            grown = np.full(capacity, np.nan, dtype=self.dtype)
+            grown[:len(column)] = column
+            self._columns[name] = grown
+
+    def update(self, ticker, data):
+        """
+        Overwrite the row of ``ticker`` with a fetch_stock_data dict, adding
+        the ticker if needed; returns its row. Missing values become NaN.
+        """
+        with self._lock:
+            row = self._add(ticker)
+            for name, key in TABLE_FIELDS.items():
+                value = data.get(key)
+                self._columns[name][row] = np.nan if value is None else value
+        return row
+
+    def update_many(self, tickers, **columns):
+        """
+        Overwrite the given columns of ``tickers`` in one assignment each,
+        e.g. ``update_many(symbols, price=last_prices)``; other columns keep
+        their values. Returns the rows.
+        """
+        unknown = set(columns) - set(TABLE_FIELDS)
+        if unknown:
+            raise ValueError(f"unknown columns: {', '.join(sorted(unknown))}")
+        with self._lock:
+            rows = np.array([self._add(t) for t in tickers], dtype=np.intp)
+            for name, values in columns.items():
+                self._columns[name][rows] = np.asarray(values, dtype=np.float64)
+        return rows
+
+    def update_results(self, results):
+        """Update from fetch_universe results as they arrive; returns how many tickers failed"""
+        failed = 0
+        for result in results:
+            if result.error is not None or result.data is None:
+                failed += 1
+            else:
+                self.update(result.ticker, result.data)
+        return failed
+
+    def record(self, ticker):
+        """Fundamentals of ``ticker``, None if it is not in the table"""
+        row = self.row(ticker)
+        if row is None:
+            return None
+        values = (float(self._columns[name][row]) for name in TABLE_FIELDS)
+        return Fundamentals(self._tickers[row], *(None if np.isnan(v) else v for v in values))
+
+    def value(self, market, long_term_growth=DEFAULT_LONG_TERM_GROWTH, k_e=None, year_fraction=None,
+              years=FORECAST_YEARS):
+        """
+        Intrinsic value of every row with the page's default approach, as
+        value_stock computes it: growth = ROE × plowback and CAPM cost of
+        equity unless ``k_e`` is given. Rows with missing inputs or
+        k_e <= long-term growth are NaN.
+        """
+        if year_fraction is None:
+            year_fraction, _ = partial_year_fraction()
+        # One row count for every column, in case tickers are added meanwhile
+        n = len(self._tickers)
+        columns = {name: column[:n] for name, column in self._columns.items()}
+        growth = columns["roe"] * (1 - columns["payout"])
+        if k_e is None:
+            k_e = market.risk_free_rate + columns["beta"] * market.market_risk_premium
+        return batch_intrinsic_value(columns["trailing_dividend"], growth, k_e, long_term_growth, year_fraction,
+                                     years)
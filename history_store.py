@@ -0,0 +1,180 @@
+"""
+Local, incrementally refreshed store of daily closing prices.
+
+Each symbol is kept as one memory-mapped ``.npy`` file of (date, close)
+records. A refresh downloads only the days after the last stored bar, so
+after the first ("max") download the market-wide inputs of the model - the
+latest ``^TNX`` yield and the ``^SP500TR`` CAGR - are read from local arrays in
+constant time without touching the network.
+"""
+
+import os
+import re
+import threading
+import time
+
+import numpy as np
+
+from ddm_core import ONE_YEAR
+from fundamentals_cache import HOUR, default_cache_dir
+from instrumentation import increment, stage
+
+RECORD_DTYPE = np.dtype([("date", "datetime64[s]"), ("close", "<f8")])
+DEFAULT_REFRESH_INTERVAL = 12 * HOUR
+
+
+def yahoo_history(symbol, start=None, period="max"):
+    """Daily closes from yfinance as (datetime64[s] dates, float closes)"""
+    import pandas as pd
+    import yfinance as yf
+
+    ticker = yf.Ticker(symbol)
+    if start is not None:
+        hist = ticker.history(start=str(np.datetime64(start, "D")))
+    else:
+        hist = ticker.history(period=period)
+    index = pd.DatetimeIndex(hist.index)
+    if index.tz is not None:
+        index = index.tz_convert("UTC").tz_localize(None)
+    return index.values.astype("datetime64[s]"), hist["Close"].to_numpy(dtype=np.float64)
+
+
+def cagr_from_history(dates, closes):
+    """Compound annual growth rate between the first and last close"""
+    years = (dates[-1] - dates[0]) / np.timedelta64(int(ONE_YEAR.total_seconds()), "s")
+    return float((closes[-1] / closes[0]) ** (1 / years) - 1)
+
+
+class HistoryStore:
+    """
+    Directory of per-symbol price histories.
+
+    ``fetch(symbol, start=None, period=...)`` must return (dates, closes)
+    arrays; with ``start`` set it only needs to cover days from ``start`` on.
+    """
+
+    def __init__(self, root=None, fetch=yahoo_history,
+                 refresh_interval=DEFAULT_REFRESH_INTERVAL, clock=time.time):
+        self.root = root or os.path.join(default_cache_dir(), "history")
+        os.makedirs(self.root, exist_ok=True)
+        self.fetch = fetch
+        self.refresh_interval = refresh_interval
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._mapped = {}
+
+    def path(self, symbol):
+        return os.path.join(self.root, re.sub(r"[^A-Za-z0-9.-]", "_", symbol) + ".npy")
+
+    def load(self, symbol):
+        """Memory-mapped records for ``symbol``, or None if nothing is stored"""
+        path = self.path(symbol)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+        cached = self._mapped.get(symbol)
+        if cached is None or cached[0] != mtime:
+            cached = (mtime, np.load(path, mmap_mode="r"))
+            self._mapped[symbol] = cached
+        return cached[1]
+
+    def refreshed_at(self, symbol):
+        """Unix time ``symbol`` was last brought up to date from the network, None if nothing is stored"""
+        try:
+            return os.path.getmtime(self.path(symbol))
+        except FileNotFoundError:
+            return None
+
+    def is_stale(self, symbol):
+        refreshed = self.refreshed_at(symbol)
+        return refreshed is None or self.clock() - refreshed > self.refresh_interval
+
+    def refresh(self, symbol, initial_period="max", force=False):
+        """Bring ``symbol`` up to date, downloading only the missing days"""
+        with self._lock:
+            records = self.load(symbol)
+            if records is not None and len(records) and not force and not self.is_stale(symbol):
+                increment("ddm_cache_requests_total", cache="history", result="hit")
+                return records
+            increment("ddm_cache_requests_total", cache="history", result="miss")
+
+            if records is None or not len(records):
+                with stage(f"fetch.history:{symbol}"):
+                    dates, closes = self.fetch(symbol, period=initial_period)
+                merged = np.empty(len(dates), dtype=RECORD_DTYPE)
+                merged["date"], merged["close"] = dates, closes
+            else:
+                # Refetch the last stored day too, its close may have been intraday
+                with stage(f"fetch.history:{symbol}"):
+                    dates, closes = self.fetch(symbol, start=records["date"][-1])
+                if len(dates):
+                    new = np.empty(len(dates), dtype=RECORD_DTYPE)
+                    new["date"], new["close"] = dates, closes
+                    merged = np.concatenate([records[records["date"] < dates[0]], new])
+                else:
+                    merged = None
+
+            if merged is None:
+                now = self.clock()
+                os.utime(self.path(symbol), (now, now))
+            else:
+                self._write(symbol, merged)
+            return self.load(symbol)
+
+    def backfill(self, symbol, start, period="max"):
+        """
+        Make the stored history of ``symbol`` reach back to ``start``,
+        refetching ``period`` when it begins later, e.g. because it was
+        seeded with a short initial period. Stored days after the fetched
+        ones are kept.
+        """
+        with self._lock:
+            records = self.load(symbol)
+            if records is not None and len(records) and records["date"][0] <= np.datetime64(start, "s"):
+                return records
+            with stage(f"fetch.history:{symbol}"):
+                dates, closes = self.fetch(symbol, period=period)
+            merged = np.empty(len(dates), dtype=RECORD_DTYPE)
+            merged["date"], merged["close"] = dates, closes
+            if records is not None and len(records) and len(merged):
+                merged = np.concatenate([merged, records[records["date"] > merged["date"][-1]]])
+            self._write(symbol, merged)
+            return self.load(symbol)
+
+    def _write(self, symbol, records):
+        path = self.path(symbol)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as fh:
+            np.save(fh, records)
+        os.replace(tmp, path)
+        now = self.clock()
+        os.utime(path, (now, now))
+
+    def latest_close(self, symbol, initial_period="max", force=False):
+        records = self.refresh(symbol, initial_period=initial_period, force=force)
+        return float(records["close"][-1])
+
+    def cagr(self, symbol, initial_period="max", force=False):
+        records = self.refresh(symbol, initial_period=initial_period, force=force)
+        return cagr_from_history(records["date"], records["close"])
+
+
+_default_store = None
+_default_lock = threading.Lock()
+
+
+def get_history_store():
+    """Process-wide store in the default cache directory"""
+    global _default_store
+    with _default_lock:
+        if _default_store is None:
+            _default_store = HistoryStore()
+        return _default_store
+
+
+def set_history_store(store):
+    """Replace the process-wide store, e.g. with one fed by a different data provider"""
+    global _default_store
+    with _default_lock:
+        _default_store = store
@@ -0,0 +1,200 @@
+"""
+Per-stage timing, counters and histograms for the valuation hot path.
+
+Two independent switches keep this near-free when nobody is looking:
+
+- Tracing is per context. ``start_trace()`` begins collecting the stages of
+  the current run (the Streamlit page does this when its performance
+  expander is enabled); without a trace, ``stage()`` records nothing.
+- Metrics are process-wide. ``enable_metrics()`` (or DDM_METRICS=1) turns on
+  Prometheus-style counters and histograms and a structured log line per
+  stage on the ``ddm.perf`` logger.
+
+When both are off, ``stage()`` returns a shared no-op context manager and
+``increment()`` returns immediately.
+"""
+
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+
+logger = logging.getLogger("ddm.perf")
+
+# Upper bounds in seconds, from cache hits to a full ^SP500TR download
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_metrics_enabled = os.environ.get("DDM_METRICS", "").lower() in ("1", "true", "yes")
+_trace = contextvars.ContextVar("ddm_trace", default=None)
+
+
+class _NullStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _Stage:
+    def __init__(self, name, trace):
+        self.name = name
+        self.trace = trace
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.start
+        if self.trace is not None:
+            self.trace.append((self.name, elapsed))
+        if _metrics_enabled:
+            REGISTRY.observe("ddm_stage_seconds", elapsed, stage=self.name)
+            logger.debug(json.dumps({"stage": self.name, "seconds": round(elapsed, 6),
+                                     "error": exc_type.__name__ if exc_type else None}))
+        return False
+
+
+def stage(name):
+    """Context manager timing one stage of the current run"""
+    trace = _trace.get()
+    if trace is None and not _metrics_enabled:
+        return _NULL_STAGE
+    return _Stage(name, trace)
+
+
+def increment(name, amount=1, **labels):
+    """Add ``amount`` to the counter ``name`` when metrics are enabled"""
+    if _metrics_enabled:
+        REGISTRY.increment(name, amount, **labels)
+
+
+def observe(name, value, **labels):
+    """Record ``value`` in the histogram ``name`` when metrics are enabled"""
+    if _metrics_enabled:
+        REGISTRY.observe(name, value, **labels)
+
+
+def start_trace():
+    """Start collecting stages in the current context; returns the list they are appended to"""
+    trace = []
+    _trace.set(trace)
+    return trace
+
+
+def stop_trace():
+    _trace.set(None)
+
+
+def tracing():
+    """True when stages of the current context are being collected"""
+    return _trace.get() is not None
+
+
+def enable_metrics(enabled=True):
+    global _metrics_enabled
+    _metrics_enabled = enabled
+
+
+def metrics_enabled():
+    return _metrics_enabled
+
+
+def summarize_trace(trace):
+    """Total seconds and call count per stage name, in first-seen order"""
+    summary = {}
+    for name, elapsed in trace:
+        total, calls = summary.get(name, (0.0, 0))
+        summary[name] = (total + elapsed, calls + 1)
+    return summary
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+
+class MetricsRegistry:
+    """Thread-safe counters and cumulative histograms with Prometheus text output"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+
+    def increment(self, name, amount=1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            hist[0][bisect_left(self.buckets, value)] += 1
+            hist[1] += value
+            hist[2] += 1
+
+    def counter(self, name, **labels):
+        with self._lock:
+            return self._counters.get((name, _label_key(labels)), 0)
+
+    def histogram(self, name, **labels):
+        """(count, sum) of a histogram, or (0, 0.0)"""
+        with self._lock:
+            hist = self._histograms.get((name, _label_key(labels)))
+            return (hist[2], hist[1]) if hist else (0, 0.0)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def render_prometheus(self):
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            for name in sorted({name for name, _ in self._counters}):
+                lines.append(f"# TYPE {name} counter")
+                for (metric, key), value in sorted(self._counters.items()):
+                    if metric == name:
+                        lines.append(f"{name}{_format_labels(key)} {value}")
+            for name in sorted({name for name, _ in self._histograms}):
+                lines.append(f"# TYPE {name} histogram")
+                for (metric, key), (counts, total, count) in sorted(self._histograms.items()):
+                    if metric != name:
+                        continue
+                    cumulative = 0
+                    for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                        cumulative += bucket_count
+                        le = "+Inf" if bound == float("inf") else repr(bound)
+                        lines.append(f"{name}_bucket{_format_labels(key, [('le', le)])} {cumulative}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {total!r}")
+                    lines.append(f"{name}_count{_format_labels(key)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        """Write the metrics atomically, e.g. for node_exporter's textfile collector"""
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as fh:
+            fh.write(self.render_prometheus())
+        os.replace(tmp, path)
+
+
+REGISTRY = MetricsRegistry()
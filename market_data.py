@@ -0,0 +1,228 @@
+"""
+UI-free access to the market data used by the model.
+
+These functions are shared by the Streamlit page and batch jobs. They go
+through the on-disk fundamentals cache and history store, and never import
+streamlit or plotly.
+"""
+
+import math
+import os
+import tempfile
+import threading
+from collections import OrderedDict, namedtuple
+from contextlib import ExitStack, contextmanager
+from datetime import datetime
+
+from betas import DEFAULT_BETA_WINDOW, MARKET_SYMBOL, RollingBeta, history_period, window_start
+from fundamentals_cache import FundamentalsCache, get_default_cache, set_default_cache
+from history_store import HistoryStore, get_history_store, set_history_store
+from instrumentation import stage
+
+# .info fields read by stock_data_from_info; their TTLs decide when the cache refetches
+STOCK_DATA_FIELDS = ('longName', 'dividendDate', 'netIncomeToCommon', 'bookValue', 'sharesOutstanding',
+                     'dividendRate', 'trailingAnnualDividendRate', 'beta', 'returnOnEquity',
+                     'payoutRatio', 'currentPrice')
+
+# Rolling beta engines kept between calls, by (ticker, window)
+MAX_BETA_ENGINES = 1024
+
+DEFAULT_RISK_FREE_RATE = 0.0422
+DEFAULT_EQUITY_RETURN = 0.1119
+
+
+class MarketInputs(namedtuple("MarketInputs", ["risk_free_rate", "sp500_cagr"])):
+    """Market-wide inputs shared by every ticker in a valuation run"""
+    __slots__ = ()
+
+    @property
+    def market_risk_premium(self):
+        return self.sp500_cagr - self.risk_free_rate
+
+
+def stock_data_from_info(info):
+    def safe_timestamp(ts):
+        return datetime.fromtimestamp(ts) if ts else None
+
+    book = info.get('bookValue')
+    shares = info.get('sharesOutstanding')
+
+    return {
+        "Company Name": info.get('longName'),
+        "Next Dividend Date (datetime)": safe_timestamp(info.get('dividendDate')),
+        "Net Income (last FY)": info.get('netIncomeToCommon'),
+        "Book Value per Share": book,
+        "Shares Outstanding": shares,
+        "Total Book Value (equity est.)": book * shares if book and shares else None,
+        "Dividend Per Share (forward)": info.get('dividendRate'),
+        "Dividend Per Share (trailing)": info.get('trailingAnnualDividendRate'),
+        "Beta": info.get('beta'),
+        "Return on Equity (ROE)": info.get('returnOnEquity'),
+        "Dividend Payout Ratio": info.get('payoutRatio'),
+        "Last Stock Price": info.get('currentPrice')
+    }
+
+
+def fetch_stock_data(ticker, cache=None, limiter=None, refresh=False):
+    """
+    Fundamentals for ``ticker`` as the dict the model reads. Errors are
+    raised, not swallowed. When ``limiter`` is given, every network fetch
+    (but not cache hits) first takes a token from it. ``refresh`` bypasses
+    the cached entry and replaces it once the new data has been fetched.
+    """
+    cache = cache or get_default_cache()
+    fetch = None
+    if limiter is not None:
+        def fetch(symbol):
+            with stage("rate_limit_wait"):
+                limiter.acquire()
+            return cache.fetch_info(symbol)
+    if refresh:
+        info = (fetch or cache.fetch_info)(ticker.upper())
+        cache.put(ticker, info)
+    else:
+        info = cache.get(ticker, fields=STOCK_DATA_FIELDS, fetch=fetch)
+    return stock_data_from_info(info)
+
+
+def _acquire_for_history(store, symbol, force, limiter):
+    """Take a token from ``limiter`` if ``symbol``'s history is about to be downloaded"""
+    if limiter is not None and (force or store.is_stale(symbol)):
+        with stage("rate_limit_wait"):
+            limiter.acquire()
+
+
+def fetch_risk_free_rate(refresh=False, limiter=None):
+    """Latest 10-year Treasury yield; errors are raised"""
+    store = get_history_store()
+    _acquire_for_history(store, "^TNX", refresh, limiter)
+    latest_raw = store.latest_close("^TNX", force=refresh)
+    return latest_raw / 100
+
+
+def fetch_equity_returns(refresh=False, limiter=None):
+    """CAGR over the locally stored ^SP500TR history, topped up with the missing days; errors are raised"""
+    store = get_history_store()
+    _acquire_for_history(store, "^SP500TR", refresh, limiter)
+    return store.cagr("^SP500TR", force=refresh)
+
+
+def get_risk_free_rate(refresh=False):
+    try:
+        return fetch_risk_free_rate(refresh)
+    except Exception:
+        return DEFAULT_RISK_FREE_RATE  # Default fallback
+
+
+def get_equity_returns(refresh=False):
+    try:
+        return fetch_equity_returns(refresh)
+    except Exception:
+        return DEFAULT_EQUITY_RETURN  # Default fallback
+
+
+_beta_engines = OrderedDict()
+_beta_lock = threading.Lock()
+
+
+def get_rolling_beta(ticker, window=DEFAULT_BETA_WINDOW, refresh=False, limiter=None):
+    """
+    Beta of ``ticker`` over its last ``window`` daily returns against ^SP500TR,
+    from the local history store, or None when its history is unavailable.
+
+    The ticker's history is seeded with just enough days for the window
+    (betas.history_period), and refetched further back when a larger window
+    is asked for later. The RollingBeta of each ticker and window is kept
+    between calls (the MAX_BETA_ENGINES most recently used), so later calls
+    only add the days stored since with ``catch_up``. ``refresh`` rebuilds
+    it from the stored history, which may have been corrected. When
+    ``limiter`` is given, each history download (but not fresh stored
+    history) first takes a token from it.
+    """
+    symbol = ticker.upper()
+    store = get_history_store()
+    key = (symbol, window)
+    period = history_period(window)
+    try:
+        with stage("rolling_beta"):
+            _acquire_for_history(store, symbol, refresh, limiter)
+            store.refresh(symbol, initial_period=period, force=refresh)
+            _acquire_for_history(store, MARKET_SYMBOL, False, limiter)
+            store.refresh(MARKET_SYMBOL)
+            with _beta_lock:
+                cached = _beta_engines.pop(key, None)
+            if refresh or cached is None or cached[0] is not store:
+                # History seeded for a smaller window than this one
+                start = window_start(window, store)
+                records = store.load(symbol)
+                if start is not None and records is not None and len(records) and records["date"][0] > start:
+                    if limiter is not None:
+                        with stage("rate_limit_wait"):
+                            limiter.acquire()
+                    store.backfill(symbol, start, period=period)
+                engine = RollingBeta.from_history([symbol], store, window)
+            else:
+                engine = cached[1]
+                engine.catch_up(store)
+            with _beta_lock:
+                _beta_engines[key] = (store, engine)
+                while len(_beta_engines) > MAX_BETA_ENGINES:
+                    _beta_engines.popitem(last=False)
+            beta = float(engine.beta[0])
+    except Exception:
+        return None
+    return None if math.isnan(beta) else beta
+
+
+def get_market_inputs(refresh=False):
+    with stage("market_inputs"):
+        return MarketInputs(get_risk_free_rate(refresh), get_equity_returns(refresh))
+
+
+def market_inputs_refreshed_at():
+    """
+    When the histories behind the market inputs were last brought up to
+    date (the older of the two), None if either has never been downloaded
+    """
+    store = get_history_store()
+    times = [store.refreshed_at(symbol) for symbol in ("^TNX", "^SP500TR")]
+    return None if None in times else min(times)
+
+
+def fetch_market_inputs(refresh=False, limiter=None):
+    """
+    Like get_market_inputs, but raises instead of falling back to the
+    default constants. When ``limiter`` is given, each history download
+    (but not fresh stored history) first takes a token from it.
+    """
+    with stage("market_inputs"):
+        return MarketInputs(fetch_risk_free_rate(refresh, limiter), fetch_equity_returns(refresh, limiter))
+
+
+@contextmanager
+def use_provider(provider, cache_dir=None):
+    """
+    Route every fetch in this process through ``provider`` (see providers.py)
+    while the context is active.
+
+    The provider gets its own fundamentals cache and history store, so
+    provider data never mixes with the real caches: a ``provider``
+    subdirectory of ``cache_dir``, kept for the next run, or a temporary
+    directory that starts cold and is removed on exit. On exit the
+    process-wide cache and store go back to the defaults.
+    """
+    with ExitStack() as stack:
+        if cache_dir:
+            root = os.path.join(cache_dir, "provider")
+            os.makedirs(root, exist_ok=True)
+        else:
+            root = stack.enter_context(tempfile.TemporaryDirectory(prefix="ddm-provider-"))
+        cache = FundamentalsCache(os.path.join(root, "fundamentals.sqlite"), fetch=provider.info)
+        set_default_cache(cache)
+        set_history_store(HistoryStore(os.path.join(root, "history"), fetch=provider.history))
+        try:
+            yield
+        finally:
+            set_default_cache(None)
+            set_history_store(None)
+            cache.close()
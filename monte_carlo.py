@@ -0,0 +1,137 @@
+"""
+Monte Carlo valuation on top of the batch DDM engine.
+
+Short-term growth, long-term growth, beta and the market risk premium are
+drawn from normal distributions, the cost of equity of each path is built
+with CAPM, and every path is valued with ``batch_intrinsic_value``. Paths are
+simulated in chunks, and each chunk is folded into running counters and a
+fixed-size histogram before the next one is drawn, so memory stays bounded
+however many paths are requested:
+
+- the histogram has HISTOGRAM_BINS bins spanning the RANGE_PERCENTILES of
+  the first chunk, plus one bin below and one above it reaching to the
+  smallest and largest value seen; the percentiles are interpolated within
+  its bins, to a small fraction of a bin width;
+- the mean, the share above the price and the share of valid paths are
+  exact running sums.
+
+The raw values are only kept with ``keep_values=True``. Like ddm_core, this
+module only depends on NumPy.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+from ddm_core import FORECAST_YEARS, batch_intrinsic_value
+
+DEFAULT_PATHS = 1_000_000
+DEFAULT_CHUNK_SIZE = 250_000
+DEFAULT_PERCENTILES = (5, 25, 50, 75, 95)
+HISTOGRAM_BINS = 4000
+RANGE_PERCENTILES = (0.1, 99.9)
+
+SimulationResult = namedtuple("SimulationResult", [
+    "percentiles",        # {percentile: intrinsic value} over the valid paths
+    "mean",
+    "prob_above_price",   # share of all paths valued above last_price
+    "valid_fraction",     # share of paths with k_e > long-term growth
+    "paths",
+    "histogram",          # (bin edges, counts) of the valid values within RANGE_PERCENTILES of the first chunk
+    "values",             # float32 values of the valid paths with keep_values=True, else None
+])
+
+
+class _Histogram:
+    """Counts of values in fixed bins set from the first batch, with open-ended bins below and above them"""
+
+    def __init__(self, bins=HISTOGRAM_BINS):
+        self.bins = bins
+        self.edges = None
+        self.counts = np.zeros(bins + 2, dtype=np.int64)
+        self.low = np.inf
+        self.high = -np.inf
+
+    def add(self, values):
+        if not len(values):
+            return
+        if self.edges is None:
+            low, high = np.percentile(values, RANGE_PERCENTILES)
+            if high <= low:
+                low, high = low - 0.5, high + 0.5
+            self.edges = np.linspace(low, high, self.bins + 1)
+        # The bins are equally wide, so each index is arithmetic: 0 below the first edge, bins + 1 above the last
+        low, high = self.edges[0], self.edges[-1]
+        index = np.floor((values - low) * (self.bins / (high - low))) + 1
+        np.clip(index, 0, self.bins + 1, out=index)
+        index[values == high] = self.bins
+        self.counts += np.bincount(index.astype(np.intp), minlength=self.bins + 2)
+        self.low = min(self.low, float(values.min()))
+        self.high = max(self.high, float(values.max()))
+
+    def percentiles(self, percentiles):
+        """Linear interpolation within the bin holding each percentile, clamped to the values seen"""
+        total = self.counts.sum()
+        if not total:
+            return [np.nan] * len(percentiles)
+        edges = np.concatenate([[min(self.low, self.edges[0])], self.edges, [max(self.high, self.edges[-1])]])
+        cumulative = np.cumsum(self.counts)
+        result = []
+        for p in percentiles:
+            rank = p / 100 * total
+            i = min(int(np.searchsorted(cumulative, rank, side="left")), len(self.counts) - 1)
+            before = cumulative[i] - self.counts[i]
+            share = (rank - before) / self.counts[i] if self.counts[i] else 0.0
+            value = edges[i] + share * (edges[i + 1] - edges[i])
+            result.append(min(max(value, self.low), self.high))
+        return result
+
+
+def simulate_intrinsic_value(trailing_dividend, growth, growth_sd, long_term_growth, long_term_growth_sd,
+                             beta, beta_sd, risk_free_rate, market_risk_premium, market_risk_premium_sd,
+                             year_fraction, last_price, paths=DEFAULT_PATHS, chunk_size=DEFAULT_CHUNK_SIZE,
+                             percentiles=DEFAULT_PERCENTILES, years=FORECAST_YEARS, seed=None,
+                             keep_values=False):
+    """
+    Simulate ``paths`` valuations of one ticker.
+
+    Each ``*_sd`` is the standard deviation of a normal draw around the
+    matching mean; a standard deviation of 0 holds that input fixed. Paths
+    where the drawn cost of equity does not exceed the drawn long-term growth
+    have no finite value: they are left out of the percentiles and count as
+    not exceeding ``last_price``. ``keep_values`` also returns every valid
+    value, which takes memory in proportion to ``paths``.
+    """
+    rng = np.random.default_rng(seed)
+    histogram = _Histogram()
+    kept = [] if keep_values else None
+    above = 0
+    valid = 0
+    total = 0.0
+
+    for start in range(0, paths, chunk_size):
+        n = min(chunk_size, paths - start)
+        g = rng.normal(growth, growth_sd, n)
+        lt_g = rng.normal(long_term_growth, long_term_growth_sd, n)
+        k_e = risk_free_rate + rng.normal(beta, beta_sd, n) * rng.normal(market_risk_premium,
+                                                                         market_risk_premium_sd, n)
+
+        values = batch_intrinsic_value(trailing_dividend, g, k_e, lt_g, year_fraction, years=years)
+        values = values[np.isfinite(values)]
+        above += int(np.count_nonzero(values > last_price))
+        valid += len(values)
+        total += float(values.sum())
+        histogram.add(values)
+        if kept is not None:
+            kept.append(values.astype(np.float32))
+
+    inner = histogram.counts[1:-1]
+    return SimulationResult(
+        percentiles={p: float(v) for p, v in zip(percentiles, histogram.percentiles(percentiles))},
+        mean=total / valid if valid else np.nan,
+        prob_above_price=above / paths if paths else np.nan,
+        valid_fraction=valid / paths if paths else np.nan,
+        paths=paths,
+        histogram=(histogram.edges, inner) if histogram.edges is not None else (np.empty(0), inner[:0]),
+        values=None if kept is None else (np.concatenate(kept) if kept else np.empty(0, dtype=np.float32)),
+    )
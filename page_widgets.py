@@ -0,0 +1,26 @@
+"""
+Streamlit widgets shared by the calculator page (app.py) and the pages in
+pages/. Unlike charts.py, which only builds figures, this module draws them
+and imports streamlit.
+"""
+
+import streamlit as st
+
+from charts import report_figure
+from instrumentation import stage
+
+
+def chart_panel(label, key, build, chart_sizes=None):
+    """
+    A chart behind a toggle: ``build`` only runs, and the figure is only
+    sent to the browser, while the toggle is on. Its serialized size (see
+    charts.report_figure) goes into ``chart_sizes[key]`` when given.
+    """
+    if not st.toggle(label, value=False, key=key):
+        return
+    with stage(f"render.{key}"):
+        fig = build()
+    size = report_figure(key, fig)
+    if chart_sizes is not None:
+        chart_sizes[key] = size
+    st.plotly_chart(fig, use_container_width=True)
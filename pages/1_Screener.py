@@ -0,0 +1,160 @@
+import time
+
+import streamlit as st
+
+from charts import histogram_figure, scatter_figure
+from ddm_core import FORECAST_YEARS
+from fetch_pipeline import DEFAULT_RATE, DEFAULT_WORKERS
+from page_widgets import chart_panel
+from screener import SCREENER_FIELDS, rank, read_constituents, screen
+from valuation import DEFAULT_LONG_TERM_GROWTH
+from warmup import MARKET_WARMUP_WAIT, get_market_warmer
+
+# Seconds between table redraws while results stream in; redrawing per ticker is quadratic in the universe
+RENDER_INTERVAL = 0.5
+
+DISPLAY_COLUMNS = {
+    "ticker": "Ticker",
+    "name": "Company",
+    "price": "Price ($)",
+    "intrinsic_value": "Intrinsic Value ($)",
+    "value_to_price": "Value / Price",
+    "upside": "Upside",
+    "implied_return": "Implied Return",
+    "trailing_dividend": "Trailing Dividend ($)",
+    "growth": "Growth",
+    "k_e": "Cost of Equity",
+}
+
+# Page configuration
+st.set_page_config(
+    page_title="DDM Screener",
+    page_icon="📈",
+    layout="wide"
+)
+
+if 'screener_rows' not in st.session_state:
+    st.session_state.screener_rows = {}
+if 'screener_settings' not in st.session_state:
+    st.session_state.screener_settings = None
+
+st.title("🔎 DDM Screener")
+st.markdown("**Rank an index universe by intrinsic value relative to price**")
+st.markdown("*Every ticker is valued with the default approach: growth = ROE × (1 - Payout Ratio), "
+            "cost of equity from CAPM unless set below*")
+
+def render(placeholder, rows, total):
+    """Redraw the ranked table and failure list from the rows received so far"""
+    import pandas as pd
+
+    ranked = rank(rows)
+    failed = [row for row in rows if row["value_to_price"] is None]
+    with placeholder.container():
+        st.markdown(f"**{len(rows)} of {total} tickers done** · {len(ranked)} valued · {len(failed)} not valued")
+        table = pd.DataFrame(ranked, columns=SCREENER_FIELDS)[list(DISPLAY_COLUMNS)].rename(columns=DISPLAY_COLUMNS)
+        st.dataframe(
+            table,
+            use_container_width=True,
+            hide_index=True,
+            column_config={
+                "Price ($)": st.column_config.NumberColumn(format="%.2f"),
+                "Intrinsic Value ($)": st.column_config.NumberColumn(format="%.2f"),
+                "Value / Price": st.column_config.NumberColumn(format="%.3f"),
+                "Upside": st.column_config.NumberColumn(format="percent"),
+                "Implied Return": st.column_config.NumberColumn(format="percent"),
+                "Trailing Dividend ($)": st.column_config.NumberColumn(format="%.2f"),
+                "Growth": st.column_config.NumberColumn(format="percent"),
+                "Cost of Equity": st.column_config.NumberColumn(format="percent"),
+            },
+        )
+        if failed:
+            with st.expander(f"⚠️ Not valued ({len(failed)})", expanded=False):
+                st.dataframe(pd.DataFrame(failed, columns=["ticker", "error"]), use_container_width=True,
+                             hide_index=True)
+
+def show_charts(rows):
+    """Distribution and scatter of the valued universe, reduced on the server whatever its size"""
+    valued = [row for row in rows if row["value_to_price"] is not None]
+    if not valued:
+        return
+    st.subheader("📈 Universe Charts")
+    chart_panel("Show Value / Price Distribution", "screener_distribution",
+                lambda: histogram_figure([row["value_to_price"] for row in valued], "Intrinsic Value / Price",
+                                         "Value / Price", "Share of Valued Tickers", marker=(1.0, "Fair Value")))
+    chart_panel("Show Intrinsic Value vs Price", "screener_scatter",
+                lambda: scatter_figure([row["price"] or float("nan") for row in valued],
+                                       [row["intrinsic_value"] for row in valued],
+                                       "Intrinsic Value vs Price", "Price ($)", "Intrinsic Value ($)",
+                                       text=[row["ticker"] for row in valued], log=True))
+
+def main():
+    st.sidebar.subheader("Valuation Parameters")
+    long_term_growth = st.sidebar.number_input("Long-term Growth Rate (e.g., 0.035 for 3.5%)",
+                                               value=DEFAULT_LONG_TERM_GROWTH, format="%.4f",
+                                               min_value=0.0, max_value=0.2)
+    custom_ke = st.sidebar.checkbox("Use One Cost of Equity for Every Ticker", value=False)
+    k_e = None
+    if custom_ke:
+        k_e = st.sidebar.number_input("Cost of Equity (e.g., 0.10 for 10%)",
+                                      value=0.10, format="%.4f", min_value=0.0, max_value=0.5)
+    years = int(st.sidebar.number_input("Forecast Horizon (years)", value=FORECAST_YEARS,
+                                        min_value=1, max_value=50, step=1))
+
+    st.sidebar.subheader("Fetching")
+    workers = int(st.sidebar.number_input("Concurrent Fetches", value=DEFAULT_WORKERS, min_value=1, max_value=64))
+    rate = st.sidebar.number_input("Max Requests per Second", value=DEFAULT_RATE, min_value=0.5, max_value=100.0)
+
+    uploaded = st.file_uploader("Index constituent list (.txt, or .csv with a Symbol column)", type=["txt", "csv"])
+    pasted = st.text_area("...or paste ticker symbols", value="", height=100,
+                          placeholder="WMT KO PEP PG JNJ")
+    text = uploaded.getvalue().decode("utf-8-sig") if uploaded is not None else pasted
+    tickers = read_constituents(text)
+    st.caption(f"{len(tickers)} tickers in the universe")
+
+    # Results are only reused while the valuation inputs stay the same
+    settings = (long_term_growth, k_e, years)
+    if st.session_state.screener_settings != settings:
+        st.session_state.screener_rows = {}
+        st.session_state.screener_settings = settings
+    rows = st.session_state.screener_rows
+
+    button_col, clear_col = st.columns([1, 5])
+    with button_col:
+        run = st.button("Run Screener", type="primary", disabled=not tickers)
+    with clear_col:
+        if st.button("Clear Results"):
+            rows.clear()
+
+    placeholder = st.empty()
+    universe = set(tickers)
+    done = [row for ticker, row in rows.items() if ticker in universe]
+    # An interrupted run (e.g. by changing a widget) resumes with the tickers it had not reached
+    pending = [ticker for ticker in tickers if ticker not in rows]
+
+    if run and pending:
+        warmer = get_market_warmer()
+        with st.spinner("Fetching market data..."):
+            warmer.wait_ready(MARKET_WARMUP_WAIT)
+        market = warmer.snapshot()
+        if market.source == "default":
+            st.warning("⚠️ Live market data unavailable; using the default risk-free rate and market return.")
+        progress = st.progress(len(done) / len(tickers), text="Valuing tickers...")
+        last_render = 0.0
+        for row in screen(pending, market.inputs, long_term_growth, k_e, years=years,
+                          max_workers=workers, rate=rate):
+            rows[row["ticker"]] = row
+            done.append(row)
+            now = time.monotonic()
+            if now - last_render >= RENDER_INTERVAL:
+                render(placeholder, done, len(tickers))
+                progress.progress(len(done) / len(tickers), text=f"Valued {len(done)} of {len(tickers)} tickers...")
+                last_render = now
+        progress.empty()
+
+    if done:
+        render(placeholder, done, len(tickers))
+        show_charts(done)
+    elif tickers:
+        placeholder.markdown("*Click **Run Screener** to value the universe. Rows appear as each ticker finishes.*")
+
+main()
@@ -0,0 +1,212 @@
+"""
+Pluggable sources of market data.
+
+A provider has two methods, matching the fetch functions the caches take:
+
+- ``info(ticker)`` returns the yfinance-style ``.info`` dict
+- ``history(symbol, start=None, period="max")`` returns daily closes as
+  (datetime64[s] dates, float closes), from ``start`` on when it is given
+
+``YahooProvider`` talks to Yahoo Finance. ``RecordingProvider`` wraps another
+provider and writes everything it returns to fixture files, which
+``ReplayProvider`` serves back without any network access, optionally with
+injected latency and failures for deterministic load tests. Install a
+provider with ``market_data.use_provider``.
+
+Fixture layout::
+
+    <root>/info/<TICKER>.json      the .info dict
+    <root>/history/<SYMBOL>.csv    "date,close" rows, ISO dates
+"""
+
+import json
+import os
+import random
+import re
+import threading
+import time
+
+import numpy as np
+
+from fundamentals_cache import yahoo_info
+from history_store import yahoo_history
+
+# Calendar days per yfinance period unit; "Nd" periods count trading days instead
+PERIOD_DAYS = {"wk": 7, "mo": 30, "y": 365}
+
+
+def fixture_name(symbol):
+    return re.sub(r"[^A-Za-z0-9.^-]", "_", symbol.upper())
+
+
+def info_path(root, ticker):
+    return os.path.join(root, "info", fixture_name(ticker) + ".json")
+
+
+def history_path(root, symbol):
+    return os.path.join(root, "history", fixture_name(symbol) + ".csv")
+
+
+def read_history(path):
+    """(dates, closes) from a fixture CSV"""
+    rows = np.loadtxt(path, delimiter=",", skiprows=1, dtype=str, ndmin=2)
+    return rows[:, 0].astype("datetime64[s]"), rows[:, 1].astype(np.float64)
+
+
+def write_history(path, dates, closes):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        fh.write("date,close\n")
+        for date, close in zip(np.asarray(dates, dtype="datetime64[s]"), closes):
+            fh.write(f"{date},{float(close)!r}\n")
+    os.replace(tmp, path)
+
+
+def slice_history(dates, closes, start=None, period="max"):
+    """The part of a history a yfinance ``history`` call would return"""
+    if start is not None:
+        mask = dates >= np.datetime64(start, "s")
+        return dates[mask], closes[mask]
+    if period == "max" or not len(dates):
+        return dates, closes
+    match = re.fullmatch(r"(\d+)(d|wk|mo|y)", period)
+    if match is None:
+        raise ValueError(f"unsupported period {period!r}")
+    count, unit = int(match.group(1)), match.group(2)
+    if unit == "d":
+        return dates[-count:], closes[-count:]
+    mask = dates > dates[-1] - np.timedelta64(count * PERIOD_DAYS[unit], "D")
+    return dates[mask], closes[mask]
+
+
+class YahooProvider:
+    """Live data from Yahoo Finance via yfinance"""
+
+    def info(self, ticker):
+        return yahoo_info(ticker)
+
+    def history(self, symbol, start=None, period="max"):
+        return yahoo_history(symbol, start=start, period=period)
+
+
+class RecordingProvider:
+    """Pass calls through to ``inner`` and save the results as fixtures under ``root``"""
+
+    def __init__(self, inner, root):
+        self.inner = inner
+        self.root = root
+        self._lock = threading.Lock()
+
+    def info(self, ticker):
+        info = self.inner.info(ticker)
+        path = info_path(self.root, ticker)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as fh:
+            json.dump(info, fh, default=str, indent=1)
+        return info
+
+    def history(self, symbol, start=None, period="max"):
+        dates, closes = self.inner.history(symbol, start=start, period=period)
+        path = history_path(self.root, symbol)
+        with self._lock:
+            if start is not None and os.path.exists(path):
+                # Incremental fetch: keep the recorded days before the new ones
+                old_dates, old_closes = read_history(path)
+                keep = old_dates < dates[0] if len(dates) else slice(None)
+                write_history(path, np.concatenate([old_dates[keep], dates]),
+                              np.concatenate([old_closes[keep], closes]))
+            else:
+                write_history(path, dates, closes)
+        return dates, closes
+
+
+class ReplayProvider:
+    """
+    Serve recorded fixtures from ``root`` without touching the network.
+
+    Every call sleeps ``latency`` seconds plus a uniform draw from
+    ``[0, jitter)``, and fails with ConnectionError with probability
+    ``failure_rate``. The draws come from one seeded generator, so a run
+    with a given ``seed`` is reproducible.
+    """
+
+    def __init__(self, root, latency=0.0, jitter=0.0, failure_rate=0.0, seed=None, sleep=time.sleep):
+        self.root = root
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.sleep = sleep
+        self.calls = 0
+        self.failures = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._histories = {}
+
+    def _simulate_network(self, what):
+        with self._lock:
+            self.calls += 1
+            delay = self.latency + (self._rng.uniform(0, self.jitter) if self.jitter else 0.0)
+            fail = self.failure_rate > 0 and self._rng.random() < self.failure_rate
+            if fail:
+                self.failures += 1
+        if delay > 0:
+            self.sleep(delay)
+        if fail:
+            raise ConnectionError(f"injected failure fetching {what}")
+
+    def info(self, ticker):
+        self._simulate_network(ticker)
+        try:
+            with open(info_path(self.root, ticker), encoding="utf-8") as fh:
+                return json.load(fh)
+        except FileNotFoundError:
+            raise LookupError(f"no recorded .info for {ticker}") from None
+
+    def history(self, symbol, start=None, period="max"):
+        self._simulate_network(symbol)
+        with self._lock:
+            cached = self._histories.get(symbol)
+        if cached is None:
+            try:
+                cached = read_history(history_path(self.root, symbol))
+            except FileNotFoundError:
+                raise LookupError(f"no recorded history for {symbol}") from None
+            with self._lock:
+                self._histories[symbol] = cached
+        return slice_history(*cached, start=start, period=period)
+
+
+def write_synthetic_fixtures(root, tickers, seed=0, start="2000-01-01", end="2025-01-01"):
+    """
+    Write plausible, reproducible fixtures for ``tickers`` plus ^TNX and ^SP500TR,
+    for benchmarks and tests that need a universe larger than anything recorded.
+    """
+    rng = np.random.default_rng(seed)
+    os.makedirs(os.path.join(root, "info"), exist_ok=True)
+    for ticker in tickers:
+        roe = float(rng.uniform(0.05, 0.35))
+        payout = float(rng.uniform(0.2, 0.9))
+        price = float(rng.uniform(10, 400))
+        dividend = round(price * float(rng.uniform(0.005, 0.05)), 2)
+        info = {
+            "longName": f"{ticker} Corp",
+            "dividendDate": 1735603200,
+            "netIncomeToCommon": float(rng.uniform(1e8, 5e10)),
+            "bookValue": round(price / float(rng.uniform(1, 8)), 2),
+            "sharesOutstanding": float(rng.integers(10**8, 10**10)),
+            "dividendRate": round(dividend * 1.03, 2),
+            "trailingAnnualDividendRate": dividend,
+            "beta": round(float(rng.uniform(0.3, 1.8)), 3),
+            "returnOnEquity": roe,
+            "payoutRatio": payout,
+            "currentPrice": round(price, 2),
+        }
+        with open(info_path(root, ticker), "w", encoding="utf-8") as fh:
+            json.dump(info, fh)
+
+    days = np.arange(start, end, dtype="datetime64[D]")
+    days = days[np.is_busday(days)].astype("datetime64[s]")
+    steps = rng.normal(0.10 / 252, 0.18 / np.sqrt(252), len(days))
+    write_history(history_path(root, "^SP500TR"), days, 1000 * np.exp(np.cumsum(steps)))
+    write_history(history_path(root, "^TNX"), days, np.clip(4.2 + np.cumsum(rng.normal(0, 0.03, len(days))), 0.5, 9))
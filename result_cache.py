@@ -0,0 +1,145 @@
+"""
+Process-wide cache of finished valuations, shared by every session.
+
+On a shared deployment many users value the same ticker with the same
+sidebar inputs. The page keys each valuation on its full input vector - the
+ticker first, then the approach, cash flows, growth rates, long-term growth,
+cost of equity, partial-year inputs and the version of the fundamentals it
+was computed from - and keeps the finished result here:
+
+- memory is bounded by an entry count and an approximate byte budget, with
+  least-recently-used eviction;
+- ``invalidate(ticker)`` drops a ticker's results when its data is
+  refreshed, and the data version in the key keeps sessions that still hold
+  older data from sharing results with newer ones;
+- concurrent requests for the same key are coalesced: the first one
+  computes, the others wait for its result instead of computing it again.
+
+Cached values are shared between threads and must not be modified.
+"""
+
+import sys
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from instrumentation import increment
+
+DEFAULT_MAX_ENTRIES = 512
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+def approximate_size(value):
+    """Bytes held by ``value``, counting the items of tuples and lists (DataFrames report their own data)"""
+    size = sys.getsizeof(value)
+    if isinstance(value, (tuple, list)):
+        size += sum(approximate_size(item) for item in value)
+    return size
+
+
+class ResultCache:
+    """Thread-safe LRU cache of computed results with request coalescing"""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES, sizeof=approximate_size):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.bytes = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   # key -> (value, size), least recently used first
+        self._pending = {}              # key -> Future of the computation in progress
+
+    def get_or_compute(self, key, compute):
+        """
+        The result for ``key``, calling ``compute()`` only if no other thread
+        has computed or is computing it. Exceptions are raised to every
+        waiting caller and nothing is cached.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                increment("ddm_cache_requests_total", cache="results", result="hit")
+                return entry[0]
+            future = self._pending.get(key)
+            owner = future is None
+            if owner:
+                future = self._pending[key] = Future()
+                self.misses += 1
+                increment("ddm_cache_requests_total", cache="results", result="miss")
+            else:
+                self.coalesced += 1
+                increment("ddm_cache_requests_total", cache="results", result="coalesced")
+
+        if not owner:
+            return future.result()
+
+        try:
+            value = compute()
+        except BaseException as exc:
+            with self._lock:
+                if self._pending.get(key) is future:
+                    del self._pending[key]
+            future.set_exception(exc)
+            raise
+
+        with self._lock:
+            # Not stored if the ticker was invalidated while this was computing
+            if self._pending.get(key) is future:
+                del self._pending[key]
+                self._store(key, value)
+        future.set_result(value)
+        return value
+
+    def _store(self, key, value):
+        size = self.sizeof(value)
+        if size > self.max_bytes:
+            return
+        self._entries[key] = (value, size)
+        self.bytes += size
+        while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self.bytes -= evicted_size
+            self.evictions += 1
+
+    def invalidate(self, ticker=None):
+        """Drop the results of one ticker (the first item of their keys), or everything when None"""
+        with self._lock:
+            for key in [k for k in self._entries if ticker is None or k[0] == ticker]:
+                self.bytes -= self._entries.pop(key)[1]
+            # Computations in progress still answer their waiters but are not stored
+            for key in [k for k in self._pending if ticker is None or k[0] == ticker]:
+                del self._pending[key]
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "coalesced": self.coalesced,
+                "evictions": self.evictions, "entries": len(self), "bytes": self.bytes}
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_result_cache():
+    """Process-wide result cache shared by every session"""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = ResultCache()
+        return _default_cache
+
+
+def set_result_cache(cache):
+    """Replace the process-wide result cache, e.g. with differently sized bounds"""
+    global _default_cache
+    with _default_lock:
+        _default_cache = cache
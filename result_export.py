@@ -0,0 +1,198 @@
+"""
+Typed columnar export of batch valuations (Parquet or Arrow IPC).
+
+Each row of a valuation run becomes one record with typed columns: floats
+(optionally float32), the valuation date as an Arrow date32 (int32 days
+since the epoch) and, per ticker, fixed-size vectors of the projected
+dividends and of the present value of each period (terminal value included
+in the last one; NaN for tickers that were not valued). Nothing goes
+through strings.
+
+``ColumnarWriter`` buffers at most ``chunk_rows`` rows, computes the
+cash-flow vectors of a whole chunk with NumPy and writes it as one record
+batch (one Parquet row group), so a 100k-row nightly run never holds more
+than one chunk in memory. Files are written to a temporary name and renamed
+when closed.
+
+``read_results`` memory-maps the file: Arrow IPC files are reloaded
+zero-copy, Parquet files are decoded from the mapped bytes. pyarrow is
+imported lazily, it is only needed when these formats are used (the
+``export`` extra: ``pip install .[export]``).
+"""
+
+import os
+import threading
+from datetime import date
+
+import numpy as np
+
+from ddm_core import FORECAST_YEARS, partial_year_fraction, perpetuity_pv
+from valuation import DEFAULT_LONG_TERM_GROWTH
+
+COLUMNAR_FORMATS = ("arrow", "parquet")
+DEFAULT_CHUNK_ROWS = 8192
+
+STRING_FIELDS = ("ticker", "name", "error")
+FLOAT_FIELDS = ("price", "trailing_dividend", "growth", "k_e", "intrinsic_value", "upside", "implied_return")
+
+_ARROW_MAGIC = b"ARROW1"
+
+
+def result_schema(years=FORECAST_YEARS, float32=False):
+    """Arrow schema of the exported rows"""
+    import pyarrow as pa
+
+    number = pa.float32() if float32 else pa.float64()
+    return pa.schema(
+        [pa.field("ticker", pa.string(), nullable=False), pa.field("name", pa.string())]
+        + [pa.field(field, number) for field in FLOAT_FIELDS]
+        + [pa.field("valuation_date", pa.date32(), nullable=False),
+           pa.field("cash_flows", pa.list_(number, years)),
+           pa.field("period_pv", pa.list_(number, years)),
+           pa.field("error", pa.string())]
+    )
+
+
+def cash_flow_vectors(trailing_dividend, growth, k_e, long_term_growth, year_fraction, years=FORECAST_YEARS):
+    """
+    Projected dividends and per-period present values, one row per ticker.
+
+    Same convention as the page's cash flow table: the first payment is
+    scaled by ``year_fraction`` and the terminal value is added to the last
+    period, so each row of the present values sums to the intrinsic value.
+    """
+    d0, g, k = (np.asarray(x, dtype=np.float64)[:, None] for x in (trailing_dividend, growth, k_e))
+    periods = np.arange(1, years + 1)
+    cash_flows = d0 * (1 + g) ** periods
+    discount = (1 + k) ** (year_fraction + periods - 1)
+    adjusted = cash_flows.copy()
+    adjusted[:, 0] *= year_fraction
+    adjusted[:, -1] += perpetuity_pv(cash_flows[:, -1], long_term_growth, k[:, 0])
+    return cash_flows, adjusted / discount
+
+
+class ColumnarWriter:
+    """
+    Stream valuation rows (dicts as returned by value_stock) to ``path``.
+
+    ``year_fraction``, ``long_term_growth`` and ``years`` must be the ones
+    the rows were valued with; they are used to rebuild the cash-flow vectors.
+    """
+
+    def __init__(self, path, format="parquet", years=FORECAST_YEARS, long_term_growth=DEFAULT_LONG_TERM_GROWTH,
+                 year_fraction=None, valuation_date=None, float32=False, chunk_rows=DEFAULT_CHUNK_ROWS):
+        import pyarrow as pa
+
+        if format not in COLUMNAR_FORMATS:
+            raise ValueError(f"unknown columnar format {format!r}, expected one of {COLUMNAR_FORMATS}")
+        if year_fraction is None:
+            year_fraction, _ = partial_year_fraction()
+        self.path = path
+        self.years = years
+        self.long_term_growth = long_term_growth
+        self.year_fraction = year_fraction
+        self.valuation_date = valuation_date or date.today()
+        self.float32 = float32
+        self.chunk_rows = chunk_rows
+        self.schema = result_schema(years, float32)
+        self.rows_written = 0
+        self.committed = False
+        self._files_closed = False
+        self._rows = []
+        self._tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        if format == "parquet":
+            import pyarrow.parquet as pq
+            self._writer = pq.ParquetWriter(self._tmp, self.schema, compression="zstd")
+            self._sink = None
+        else:
+            self._sink = pa.OSFile(self._tmp, "wb")
+            self._writer = pa.ipc.new_file(self._sink, self.schema)
+
+    def write(self, row):
+        self._rows.append(row)
+        if len(self._rows) >= self.chunk_rows:
+            self.flush()
+
+    def flush(self):
+        """Write the buffered rows as one record batch"""
+        import pyarrow as pa
+
+        if not self._rows:
+            return
+        rows, self._rows = self._rows, []
+        number = np.float32 if self.float32 else np.float64
+        columns = {field: pa.array([row[field] for row in rows], type=pa.string()) for field in STRING_FIELDS}
+        floats = {}
+        for field in FLOAT_FIELDS:
+            values = np.array([np.nan if row[field] is None else row[field] for row in rows], dtype=np.float64)
+            floats[field] = values
+            columns[field] = pa.array(values.astype(number), mask=np.isnan(values))
+
+        # Rows that were not valued get vectors of NaN (null fixed-size lists do not round-trip through Parquet)
+        valued = ~np.isnan(floats["intrinsic_value"])
+        with np.errstate(invalid="ignore"):
+            vectors = cash_flow_vectors(floats["trailing_dividend"], floats["growth"], floats["k_e"],
+                                        self.long_term_growth, self.year_fraction, self.years)
+        for field, values in zip(("cash_flows", "period_pv"), vectors):
+            values[~valued] = np.nan
+            columns[field] = pa.FixedSizeListArray.from_arrays(pa.array(values.astype(number).ravel()), self.years)
+
+        days = np.full(len(rows), np.datetime64(self.valuation_date, "D"))
+        columns["valuation_date"] = pa.array(days, type=pa.date32())
+        self._writer.write_batch(pa.record_batch([columns[f.name] for f in self.schema], schema=self.schema))
+        self.rows_written += len(rows)
+
+    def _close_files(self):
+        if not self._files_closed:
+            self._files_closed = True
+            self._writer.close()
+            if self._sink is not None:
+                self._sink.close()
+
+    def close(self):
+        """Write the remaining rows and move the finished file to ``path``; does nothing the second time"""
+        if self.committed:
+            return
+        self.flush()
+        self._close_files()
+        os.replace(self._tmp, self.path)
+        self.committed = True
+
+    def abort(self):
+        """Discard everything written so far; does nothing once close() has moved the file into place"""
+        if self.committed:
+            return
+        try:
+            self._close_files()
+        finally:
+            if os.path.exists(self._tmp):
+                os.remove(self._tmp)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+
+def read_results(path):
+    """
+    Load an exported file as a pyarrow Table backed by a memory map of it.
+
+    For Arrow IPC files no data is copied: the columns point into the
+    mapped file. Use ``table.to_pandas()`` for a DataFrame.
+    """
+    import pyarrow as pa
+
+    with open(path, "rb") as fh:
+        magic = fh.read(len(_ARROW_MAGIC))
+    if magic == _ARROW_MAGIC:
+        # The table's buffers keep the mapping alive, so it is not closed here
+        return pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+
+    import pyarrow.parquet as pq
+    return pq.read_table(path, memory_map=True)
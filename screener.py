@@ -0,0 +1,68 @@
+"""
+Rank a universe of tickers by intrinsic value relative to price.
+
+``screen`` fetches the universe through the concurrent fetch pipeline and
+yields one valued row per ticker as soon as its data arrives, so the
+screener page (pages/1_Screener.py) can show a growing, ranked table while
+the rest of the universe is still in flight. Failing tickers come back as
+rows with ``error`` set and never stop the run. Like valuation.py, this
+module does not import streamlit.
+"""
+
+import csv
+
+from ddm_core import FORECAST_YEARS, partial_year_fraction
+from fetch_pipeline import fetch_batch
+from valuation import DEFAULT_LONG_TERM_GROWTH, RESULT_FIELDS, value_stock
+
+SCREENER_FIELDS = RESULT_FIELDS[:-1] + ("value_to_price", "error")
+
+# Header names of the ticker column in constituent CSVs
+SYMBOL_COLUMNS = ("symbol", "ticker", "ticker symbol")
+
+
+def read_constituents(text):
+    """
+    Ticker symbols from a constituent list.
+
+    Accepts a CSV whose header has a Symbol or Ticker column (as published
+    for most indices), or symbols separated by whitespace or commas with
+    '#' starting a comment, like the CLI's ticker files. Duplicates are
+    dropped, order is kept.
+    """
+    lines = [line for line in text.splitlines() if line.split("#", 1)[0].strip()]
+    if lines:
+        header = [cell.strip().lower() for cell in next(csv.reader([lines[0]]))]
+        column = next((header.index(name) for name in SYMBOL_COLUMNS if name in header), None)
+        if column is not None:
+            symbols = (row[column].strip() for row in csv.reader(lines[1:]) if len(row) > column)
+            return list(dict.fromkeys(s.upper() for s in symbols if s))
+    tokens = (t for line in lines for t in line.split("#", 1)[0].replace(",", " ").split())
+    return list(dict.fromkeys(t.upper() for t in tokens))
+
+
+def screen(tickers, market_inputs=None, long_term_growth=DEFAULT_LONG_TERM_GROWTH, k_e=None,
+           year_fraction=None, years=FORECAST_YEARS, **fetch_kwargs):
+    """
+    Yield a dict with SCREENER_FIELDS for each ticker, in completion order.
+
+    ``fetch_kwargs`` go to fetch_universe (max_workers, rate, retries, fetch...).
+    """
+    market, results = fetch_batch(tickers, market_inputs=market_inputs, **fetch_kwargs)
+    if year_fraction is None:
+        year_fraction, _ = partial_year_fraction()
+    for result in results:
+        if result.error is not None:
+            row = dict.fromkeys(RESULT_FIELDS)
+            row.update(ticker=result.ticker, error=str(result.error))
+        else:
+            row = value_stock(result.ticker, result.data, market, long_term_growth, k_e, year_fraction, years)
+        value, price = row["intrinsic_value"], row["price"]
+        row["value_to_price"] = value / price if value is not None and price else None
+        yield {field: row[field] for field in SCREENER_FIELDS}
+
+
+def rank(rows):
+    """Valued rows by intrinsic value / price, most undervalued first"""
+    valued = [row for row in rows if row["value_to_price"] is not None]
+    return sorted(valued, key=lambda row: row["value_to_price"], reverse=True)
@@ -16,6 +16,10 @@ setup(
     long_description_content_type="text/markdown",
     url="",
     packages=find_packages(),
+    py_modules=["api", "app", "backtest", "betas", "charts", "cli", "ddm_core", "fetch_pipeline",
+                "fundamentals_cache", "fundamentals_table", "history_store", "instrumentation", "market_data",
+                "monte_carlo", "page_widgets", "providers", "result_cache", "result_export", "screener", "valuation",
+                "valuation_report", "warmup"],
     classifiers=[
         "Development Status :: 4 - Beta",
         "Intended Audience :: Financial and Insurance Industry",
@@ -29,9 +33,15 @@ setup(
     ],
     python_requires=">=3.8",
     install_requires=requirements,
+    extras_require={
+        # Arrow IPC and Parquet output (ddm-calculator --format arrow/parquet)
+        "export": ["pyarrow>=7.0.0"],
+    },
     entry_points={
         "console_scripts": [
-            "ddm-calculator=app:main",
+            "ddm-calculator=cli:main",
+            "ddm-backtest=backtest:main",
+            "ddm-api=api:main",
         ],
     },
     include_package_data=True,
@@ -53,8 +53,9 @@ def test_functions():
     print("\nTesting core functions...")
     
     try:
-        # Import functions from app
-        from app import perpetuity_pv, get_risk_free_rate, get_equity_returns
+        # Import the UI-free functions directly so the Streamlit page is not loaded
+        from ddm_core import perpetuity_pv
+        from market_data import get_risk_free_rate, get_equity_returns
         
         # Test perpetuity_pv function
         result = perpetuity_pv(100, 0.05, 0.10)
@@ -85,15 +86,1108 @@ def test_functions():
         traceback.print_exc()
         return False
 
+def test_batch_engine():
+    """Test the vectorized batch DDM engine and sensitivity grid against the single-ticker math"""
+    print("\nTesting batch DDM engine...")
+    
+    try:
+        import numpy as np
+        from ddm_core import batch_intrinsic_value, perpetuity_pv, sensitivity_grid
+        
+        # Single ticker, computed the same way as the app's cash flow table
+        d0, g, k_e, lt_g, frac = 2.0, 0.06, 0.09, 0.035, 0.25
+        cf_list = [d0 * (1 + g) ** i for i in range(1, 6)]
+        adjustments = [frac, 1.0, 1.0, 1.0, 1.0]
+        periods_to_discount = [frac + i for i in range(5)]
+        in_period_sum = [cf * adj for cf, adj in zip(cf_list, adjustments)]
+        in_period_sum[-1] += perpetuity_pv(cf_list[-1], lt_g, k_e)
+        expected = sum(a / (1 + k_e) ** b for a, b in zip(in_period_sum, periods_to_discount))
+        
+        values = batch_intrinsic_value([d0, d0], [g, g], [k_e, 0.03], lt_g, frac)
+        grid = sensitivity_grid(cf_list, frac, [k_e, 0.03], [lt_g, 0.0])
+        if abs(values[0] - expected) < 1e-9 and np.isnan(values[1]) \
+                and abs(grid[0, 0] - expected) < 1e-9 and np.isnan(grid[1, 0]) and np.isfinite(grid[1, 1]):
+            print(f"✓ batch_intrinsic_value matches single-ticker math ({values[0]:.4f})")
+            return True
+        else:
+            print(f"✗ batch_intrinsic_value failed: expected [{expected}, nan], got {values}, grid {grid}")
+            return False
+            
+    except Exception as e:
+        print(f"✗ Batch engine test failed: {e}")
+        traceback.print_exc()
+        return False
+
+def test_multi_stage():
+    """Test the closed-form N-year, three-stage and H-model values against explicit schedules"""
+    print("\nTesting multi-stage DDM engine...")
+    
+    try:
+        import numpy as np
+        from ddm_core import batch_intrinsic_value, h_model_value, schedule_value, three_stage_value
+        
+        d0, g, k_e, lt_g, frac = 2.0, 0.06, 0.09, 0.035, 0.25
+        # Closed form against explicit schedules, with one horizon per ticker
+        horizons = np.array([5, 30])
+        schedules = [d0 * (1 + g) ** np.arange(1, n + 1) for n in horizons]
+        expected = [float(schedule_value(cf, k_e, lt_g, frac)) for cf in schedules]
+        values = batch_intrinsic_value(d0, g, k_e, lt_g, frac, years=horizons)
+        # Growth equal to the cost of equity hits the n / 1 limit of the geometric series
+        flat = float(batch_intrinsic_value(d0, k_e, k_e, lt_g, frac, years=30))
+        flat_expected = float(schedule_value(d0 * (1 + k_e) ** np.arange(1, 31), k_e, lt_g, frac))
+        
+        # Three stages: 5 years at 10%, then 4 years falling linearly to long-term growth
+        growth = [0.10] * 5 + [0.10 + (lt_g - 0.10) * j / 4 for j in range(1, 5)]
+        three_expected = float(schedule_value(d0 * np.cumprod(1 + np.array(growth)), k_e, lt_g, frac))
+        three = float(three_stage_value(d0, 0.10, lt_g, k_e, frac, high_years=5, transition_years=4))
+        
+        h_value = float(h_model_value(d0, 0.10, lt_g, 5, k_e))
+        h_expected = d0 * ((1 + lt_g) + 5 * (0.10 - lt_g)) / (k_e - lt_g)
+        
+        if np.allclose(values, expected, rtol=1e-12) and abs(flat - flat_expected) < 1e-9 \
+                and abs(three - three_expected) < 1e-9 and abs(h_value - h_expected) < 1e-12 \
+                and np.isnan(three_stage_value(d0, 0.10, 0.10, 0.09, frac)):
+            print(f"✓ Closed-form values match explicit schedules (5y {values[0]:.4f}, 30y {values[1]:.4f}, "
+                  f"three-stage {three:.4f})")
+            return True
+        else:
+            print(f"✗ Multi-stage engine failed: {values} vs {expected}, {flat} vs {flat_expected}, "
+                  f"{three} vs {three_expected}, {h_value} vs {h_expected}")
+            return False
+            
+    except Exception as e:
+        print(f"✗ Multi-stage engine test failed: {e}")
+        traceback.print_exc()
+        return False
+
+def test_implied_returns():
+    """Test that the implied cost of equity and long-term growth reproduce the price"""
+    print("\nTesting implied return solver...")
+    
+    try:
+        import numpy as np
+        from ddm_core import (batch_intrinsic_value, implied_cost_of_equity, implied_long_term_growth,
+                              schedule_implied_cost_of_equity)
+        
+        rng = np.random.default_rng(0)
+        d0 = rng.uniform(0.2, 5.0, 1000)
+        g = rng.uniform(0.0, 0.15, 1000)
+        k_e = rng.uniform(0.07, 0.14, 1000)
+        prices = batch_intrinsic_value(d0, g, k_e, 0.035, 0.4, years=30)
+        
+        implied_k = implied_cost_of_equity(prices, d0, g, 0.035, 0.4, years=30)
+        implied_g = implied_long_term_growth(prices, d0, g, k_e, 0.4, years=30)
+        cf_list = [2.0 * 1.06 ** i for i in range(1, 6)]
+        schedule_k = float(schedule_implied_cost_of_equity(50.0, cf_list, 0.035, 0.25))
+        single_k = float(implied_cost_of_equity(50.0, 2.0, 0.06, 0.035, 0.25))
+        # No dividend or no price: no implied return
+        missing = implied_cost_of_equity([50.0, 0.0], [0.0, 2.0], 0.06, 0.035, 0.25)
+        # No growth rate values a zero dividend at a positive price
+        zero_dividend_g = float(implied_long_term_growth(50.0, 0.0, 0.06, 0.09, 0.25))
+        
+        if np.allclose(implied_k, k_e, rtol=0, atol=1e-10) and np.allclose(implied_g, 0.035, rtol=0, atol=1e-10) \
+                and abs(schedule_k - single_k) < 1e-10 \
+                and abs(batch_intrinsic_value(2.0, 0.06, single_k, 0.035, 0.25) - 50.0) < 1e-8 \
+                and np.isnan(missing).all() and np.isnan(zero_dividend_g):
+            print(f"✓ Implied returns reproduce prices (WMT-like $50 → {single_k*100:.2f}%)")
+            return True
+        else:
+            print(f"✗ Implied return solver failed: max k error {np.max(np.abs(implied_k - k_e))}, "
+                  f"max g error {np.max(np.abs(implied_g - 0.035))}, {schedule_k} vs {single_k}, {missing}, "
+                  f"zero dividend {zero_dividend_g}")
+            return False
+            
+    except Exception as e:
+        print(f"✗ Implied return test failed: {e}")
+        traceback.print_exc()
+        return False
+
+def test_valuation_report():
+    """Test that the cash flow table, display table and chart agree with the batch engine"""
+    print("\nTesting valuation report...")
+    
+    try:
+        from datetime import datetime
+        from ddm_core import batch_intrinsic_value
+        from valuation_report import (build_cash_flow_figure, build_cash_flow_table, build_display_table,
+                                      build_sensitivity_figure, cash_flow_schedule)
+        
+        d0, g, k_e, lt_g, frac = 2.0, 0.06, 0.09, 0.035, 0.25
+        cf_list = [d0 * (1 + g) ** i for i in range(1, 6)]
+        schedule = cash_flow_schedule(cf_list, [g] * 5, frac, datetime(2025, 12, 31), k_e, lt_g)
+        table = build_cash_flow_table(schedule)
+        display = build_display_table(table)
+        fig = build_cash_flow_figure(table)
+        heatmap = build_sensitivity_figure(cf_list, frac, k_e, lt_g)
+        
+        expected = float(batch_intrinsic_value(d0, g, k_e, lt_g, frac))
+        stock_value = table['Period PV'].sum()
+        if abs(stock_value - expected) < 1e-9 and display.shape == (9, 5) \
+                and display.loc['Dividend Date', 5] == '2029-12-31' and len(fig.data) == 3 \
+                and len(heatmap.data[0].z) * len(heatmap.data[0].z[0]) <= 10_000:
+            print(f"✓ Valuation report matches batch engine ({stock_value:.4f})")
+            return True
+        else:
+            print(f"✗ Valuation report failed: expected {expected}, got {stock_value}, display shape {display.shape}")
+            return False
+            
+    except Exception as e:
+        print(f"✗ Valuation report test failed: {e}")
+        traceback.print_exc()
+        return False
+
+def test_fundamentals_cache():
+    """Test TTL expiry, LRU eviction and hit/miss counters of the fundamentals cache"""
+    print("\nTesting fundamentals cache...")
+    
+    try:
+        from fundamentals_cache import FundamentalsCache
+        
+        now = [0.0]
+        calls = []
+        
+        def fetch(ticker):
+            calls.append(ticker)
+            return {"currentPrice": 100.0 + len(calls), "returnOnEquity": 0.2}
+        
+        cache = FundamentalsCache(":memory:", fetch=fetch, max_entries=2,
+                                  field_ttls={"currentPrice": 60, "returnOnEquity": 3600},
+                                  clock=lambda: now[0])
+        
+        cache.get("WMT", fields=["currentPrice"])
+        now[0] = 30
+        cache.get("WMT", fields=["currentPrice"])      # fresh price -> hit
+        now[0] = 120
+        cache.get("WMT", fields=["returnOnEquity"])    # stale price but fresh ROE -> hit
+        cache.get("WMT", fields=["currentPrice"])      # stale price -> refetch
+        cache.get("KO")
+        now[0] = 130
+        cache.get("WMT", fields=())                    # touch WMT so KO is least recent
+        cache.get("PEP")                               # evicts KO
+        
+        stats = cache.stats()
+        if calls == ["WMT", "WMT", "KO", "PEP"] and stats["hits"] == 3 and stats["evictions"] == 1 \
+                and cache.fetched_at("KO") is None and cache.fetched_at("WMT") is not None:
+            print(f"✓ Fundamentals cache TTL/LRU behaviour correct ({stats})")
+            return True
+        else:
+            print(f"✗ Fundamentals cache failed: calls={calls}, stats={stats}")
+            return False
+            
+    except Exception as e:
+        print(f"✗ Fundamentals cache test failed: {e}")
+        traceback.print_exc()
+        return False
+
+def test_history_store():
+    """Test that the history store only downloads missing days and computes CAGR locally"""
+    print("\nTesting market history store...")
+    
+    try:
+        import tempfile
+        import numpy as np
+        from history_store import HistoryStore
+        
+        days = np.arange("2000-01-01", "2010-01-01", dtype="datetime64[D]").astype("datetime64[s]")
+        closes = 100 * 1.08 ** (np.arange(len(days)) / 365.2425)
+        available = [len(days) - 10]
+        requests = []
+        
+        def fetch(symbol, start=None, period="max"):
+            requests.append(start)
+            n = available[0]
+            mask = days[:n] >= start if start is not None else slice(None)
+            return days[:n][mask], closes[:n][mask]
+        
+        now = [1e9]
+        with tempfile.TemporaryDirectory() as root:
+            store = HistoryStore(root, fetch=fetch, refresh_interval=3600, clock=lambda: now[0])
+            store.cagr("^SP500TR")
+            available[0] = len(days)
+            store.cagr("^SP500TR")                 # within refresh interval -> no download
+            now[0] += 7200
+            cagr = store.cagr("^SP500TR")          # stale -> fetch from last stored day only
+            stored = len(store.load("^SP500TR"))
+        
+        if len(requests) == 2 and requests[1] == days[-11] and stored == len(days) and abs(cagr - 0.08) < 1e-3:
+            print(f"✓ History store appends missing days only (CAGR {cagr:.4f})")
+            return True
+        else:
+            print(f"✗ History store failed: requests={requests}, stored={stored}, cagr={cagr}")
+            return False
+            
+    except Exception as e:
+        print(f"✗ History store test failed: {e}")
+        traceback.print_exc()
+        return False
+
+def test_fetch_pipeline():
+    """Test the concurrent fetch pipeline's retries, failure isolation and rate limiter"""
+    print("\nTesting concurrent fetch pipeline...")
+    
+    try:
+        import threading
+        import fetch_pipeline
+        from fetch_pipeline import TokenBucket, fetch_batch, fetch_universe
+        
+        attempts = {}
+        
+        def fetch(ticker, limiter=None):
+            limiter.acquire()
+            attempts[ticker] = attempts.get(ticker, 0) + 1
+            if ticker == "BAD":
+                raise ValueError("unknown ticker")
+            if ticker == "FLAKY" and attempts[ticker] == 1:
+                raise ConnectionError("transient")
+            return {"Last Stock Price": 10.0}
+        
+        results = {r.ticker: r for r in fetch_universe(["wmt", "KO", "FLAKY", "BAD", "WMT"], max_workers=4,
+                                                        rate=1000, retries=2, backoff=0.001, fetch=fetch)}
+        
+        now = [0.0]
+        def sleep(seconds):
+            now[0] += seconds
+        bucket = TokenBucket(rate=10, capacity=1, clock=lambda: now[0], sleep=sleep)
+        for _ in range(11):
+            bucket.acquire()
+        
+        # The market inputs are fetched while the tickers are already in flight, through the
+        # same limiter and with retries; when they cannot be fetched the batch fails
+        ticker_started = threading.Event()
+        market_calls = []
+        def market_inputs(refresh=False, limiter=None):
+            market_calls.append(limiter)
+            if len(market_calls) == 1:
+                raise ConnectionError("transient")
+            return ticker_started.wait(5)
+        def unreachable(refresh=False, limiter=None):
+            raise ConnectionError("unreachable")
+        def fetch_started(ticker, limiter=None):
+            ticker_started.set()
+            return {"Last Stock Price": 10.0}
+        shared = TokenBucket(rate=1000)
+        original = fetch_pipeline.fetch_market_inputs
+        try:
+            fetch_pipeline.fetch_market_inputs = market_inputs
+            overlapped, batch = fetch_batch(["WMT", "KO"], fetch=fetch_started, limiter=shared, backoff=0.001)
+            batch = sorted(r.ticker for r in batch)
+            fetch_pipeline.fetch_market_inputs = unreachable
+            try:
+                fetch_batch(["WMT"], fetch=fetch_started, rate=1000, retries=1, backoff=0.001)
+                market_error = None
+            except ConnectionError as e:
+                market_error = e
+        finally:
+            fetch_pipeline.fetch_market_inputs = original
+        
+        if sorted(results) == ["BAD", "FLAKY", "KO", "WMT"] and results["BAD"].error is not None \
+                and results["FLAKY"].data is not None and attempts["BAD"] == 3 and abs(now[0] - 1.0) < 1e-9 \
+                and overlapped is True and batch == ["KO", "WMT"] \
+                and market_calls == [shared, shared] and str(market_error) == "unreachable":
+            print("✓ Fetch pipeline retries, isolates failures and rate limits")
+            return True
+        else:
+            print(f"✗ Fetch pipeline failed: results={results}, attempts={attempts}, clock={now[0]}, "
+                  f"overlapped={overlapped}, market_calls={market_calls}, market_error={market_error!r}")
+            return False
+            
+    except Exception as e:
+        print(f"✗ Fetch pipeline test failed: {e}")
+        traceback.print_exc()
+        return False
+
+def test_monte_carlo():
+    """Test that the Monte Carlo valuation collapses to the deterministic value without noise"""
+    print("\nTesting Monte Carlo valuation...")
+    
+    try:
+        import numpy as np
+        from ddm_core import batch_intrinsic_value
+        from monte_carlo import simulate_intrinsic_value
+        
+        d0, g, lt_g, beta, rf, mrp, frac = 2.0, 0.06, 0.035, 0.8, 0.04, 0.06, 0.25
+        expected = float(batch_intrinsic_value(d0, g, rf + beta * mrp, lt_g, frac))
+        
+        fixed = simulate_intrinsic_value(d0, g, 0.0, lt_g, 0.0, beta, 0.0, rf, mrp, 0.0, frac,
+                                         last_price=expected - 1, paths=10_000, chunk_size=3_000)
+        noisy = simulate_intrinsic_value(d0, g, 0.02, lt_g, 0.01, beta, 0.3, rf, mrp, 0.02, frac,
+                                         last_price=expected, paths=200_000, chunk_size=30_000, seed=7,
+                                         keep_values=True)
+        # Without keep_values only the running histogram is kept; the percentiles come from its bins
+        streamed = simulate_intrinsic_value(d0, g, 0.02, lt_g, 0.01, beta, 0.3, rf, mrp, 0.02, frac,
+                                            last_price=expected, paths=200_000, chunk_size=30_000, seed=7)
+        exact = np.percentile(noisy.values.astype(np.float64), list(noisy.percentiles))
+        
+        bands = list(noisy.percentiles.values())
+        edges, counts = streamed.histogram
+        if all(abs(v - expected) < 1e-3 for v in fixed.percentiles.values()) and fixed.prob_above_price == 1.0 \
+                and bands == sorted(bands) and 0.0 < noisy.prob_above_price < 1.0 \
+                and 0.0 < noisy.valid_fraction <= 1.0 and len(noisy.values) == round(noisy.valid_fraction * 200_000) \
+                and np.allclose(bands, exact, rtol=1e-3) and streamed.values is None \
+                and streamed.percentiles == noisy.percentiles and len(edges) == len(counts) + 1 \
+                and 0.99 * len(noisy.values) < counts.sum() <= len(noisy.values) \
+                and abs(streamed.mean - noisy.values.mean(dtype=np.float64)) < 1e-3 * abs(streamed.mean):
+            print(f"✓ Monte Carlo valuation consistent (P(value > price) = {noisy.prob_above_price:.3f})")
+            return True
+        else:
+            print(f"✗ Monte Carlo valuation failed: fixed={fixed.percentiles}, noisy={noisy.percentiles}, "
+                  f"exact={exact}, streamed={streamed.percentiles}")
+            return False
+            
+    except Exception as e:
+        print(f"✗ Monte Carlo test failed: {e}")
+        traceback.print_exc()
+        return False
+
+def test_instrumentation():
+    """Test stage tracing, cache counters and Prometheus output of the instrumentation"""
+    print("\nTesting instrumentation...")
+    
+    try:
+        import instrumentation
+        from fundamentals_cache import FundamentalsCache
+        
+        disabled = instrumentation.stage("anything") is instrumentation.stage("else")
+        
+        cache = FundamentalsCache(":memory:", fetch=lambda ticker: {"currentPrice": 1.0})
+        registry = instrumentation.REGISTRY
+        registry.reset()
+        instrumentation.enable_metrics()
+        trace = instrumentation.start_trace()
+        try:
+            cache.get("WMT")
+            cache.get("WMT")
+            with instrumentation.stage("compute"):
+                pass
+        finally:
+            instrumentation.stop_trace()
+            instrumentation.enable_metrics(False)
+        
+        stages = [name for name, _ in trace]
+        hits = registry.counter("ddm_cache_requests_total", cache="fundamentals", result="hit")
+        count, _ = registry.histogram("ddm_stage_seconds", stage="fetch.info")
+        text = registry.render_prometheus()
+        registry.reset()
+        
+        if disabled and stages == ["fetch.info", "compute"] and hits == 1 and count == 1 \
+                and 'ddm_stage_seconds_bucket{stage="compute",le="+Inf"} 1' in text:
+            print("✓ Instrumentation traces stages and counts cache hits")
+            return True
+        else:
+            print(f"✗ Instrumentation failed: disabled={disabled}, stages={stages}, hits={hits}, count={count}")
+            return False
+            
+    except Exception as e:
+        print(f"✗ Instrumentation test failed: {e}")
+        traceback.print_exc()
+        return False
+
+def test_replay_provider():
+    """Test recording, replaying and failure injection of the offline market data provider"""
+    print("\nTesting offline replay provider...")
+    
+    try:
+        import os
+        import tempfile
+        import numpy as np
+        import fundamentals_cache
+        import history_store
+        from market_data import fetch_stock_data, get_market_inputs, use_provider, DEFAULT_RISK_FREE_RATE
+        from providers import RecordingProvider, ReplayProvider, write_synthetic_fixtures
+        
+        with tempfile.TemporaryDirectory() as root:
+            write_synthetic_fixtures(f"{root}/source", ["WMT", "KO"], seed=1)
+            source = ReplayProvider(f"{root}/source")
+            
+            # Record through a provider and replay the recording
+            recorder = RecordingProvider(source, f"{root}/recorded")
+            recorder.info("WMT")
+            recorder.history("^TNX", period="5d")
+            replay = ReplayProvider(f"{root}/recorded")
+            same_info = replay.info("WMT") == source.info("WMT")
+            dates, closes = replay.history("^TNX")
+            same_history = len(dates) == 5 and np.array_equal(closes, source.history("^TNX")[1][-5:])
+            
+            failing = ReplayProvider(f"{root}/source", failure_rate=1.0)
+            try:
+                failing.info("WMT")
+                injected = False
+            except ConnectionError:
+                injected = True
+            
+            with use_provider(source, f"{root}/cache"):
+                market = get_market_inputs()
+                data = fetch_stock_data("wmt")
+            # Kept apart from the real cache files under the same directory
+            isolated = os.path.exists(f"{root}/cache/provider/fundamentals.sqlite") \
+                and not os.path.exists(f"{root}/cache/fundamentals.sqlite")
+            
+            with use_provider(source):
+                temporary = history_store.get_history_store().root
+                fetch_stock_data("KO")
+            restored = fundamentals_cache._default_cache is None and history_store._default_store is None
+        
+        if same_info and same_history and injected and market.risk_free_rate != DEFAULT_RISK_FREE_RATE \
+                and data["Company Name"] == "WMT Corp" and source.calls == 8 and isolated and restored \
+                and not os.path.exists(temporary):
+            print(f"✓ Replay provider serves recorded data offline (risk-free rate {market.risk_free_rate:.4f})")
+            return True
+        else:
+            print(f"✗ Replay provider failed: info={same_info}, history={same_history}, injected={injected}, "
+                  f"market={market}, calls={source.calls}, isolated={isolated}, restored={restored}")
+            return False
+            
+    except Exception as e:
+        print(f"✗ Replay provider test failed: {e}")
+        traceback.print_exc()
+        return False
+
+def test_cli():
+    """Test the headless CLI's ticker parsing and valuation without streamlit or plotly"""
+    print("\nTesting headless CLI...")
+    
+    try:
+        import io
+        import os
+        import subprocess
+        from cli import build_parser, read_tickers
+        from ddm_core import batch_intrinsic_value
+        from market_data import MarketInputs
+        from valuation import value_stock
+        
+        args = build_parser().parse_args(["-f", "-"])
+        tickers = read_tickers(args, stdin=io.StringIO("WMT, KO\n# comment\nPEP  # trailing\n\n"))
+        
+        data = {"Company Name": "Walmart", "Last Stock Price": 50.0, "Dividend Per Share (trailing)": 2.0,
+                "Return on Equity (ROE)": 0.2, "Dividend Payout Ratio": 0.7, "Beta": 0.8}
+        market = MarketInputs(risk_free_rate=0.04, sp500_cagr=0.1)
+        row = value_stock("WMT", data, market, long_term_growth=0.035, year_fraction=0.25)
+        expected = float(batch_intrinsic_value(2.0, 0.06, 0.04 + 0.8 * 0.06, 0.035, 0.25))
+        bad = value_stock("KO", dict(data, **{"Beta": None}), market)
+        
+        # The CLI must start without the UI stack
+        loaded = subprocess.run([sys.executable, "-c", "import sys, cli; "
+                                 "print(any(m in sys.modules for m in ('streamlit', 'plotly')))"],
+                                capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+        
+        if tickers == ["WMT", "KO", "PEP"] and abs(row["intrinsic_value"] - expected) < 1e-9 \
+                and row["error"] is None and bad["error"] == "missing beta" and loaded == "False":
+            print(f"✓ CLI parses tickers and values them headlessly ({row['intrinsic_value']:.4f})")
+            return True
+        else:
+            print(f"✗ CLI failed: tickers={tickers}, row={row}, bad={bad}, UI modules loaded={loaded}")
+            return False
+            
+    except Exception as e:
+        print(f"✗ CLI test failed: {e}")
+        traceback.print_exc()
+        return False
+
+def test_backtest():
+    """Test the point-in-time backtest: no look-ahead, signals and forward returns"""
+    print("\nTesting point-in-time backtest...")
+    
+    try:
+        import tempfile
+        import numpy as np
+        from backtest import SnapshotStore, market_inputs_at, point_in_time_inputs, run_backtest, summarize_period
+        from ddm_core import batch_intrinsic_value, partial_year_fraction
+        from datetime import datetime
+        from history_store import RECORD_DTYPE, HistoryStore
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            history = HistoryStore(tmp + "/history", fetch=None)
+            days = np.arange("2019-01-01", "2021-01-01", dtype="datetime64[D]").astype("datetime64[s]")
+            tnx = np.rec.fromarrays([days, np.where(days < np.datetime64("2020-01-01"), 2.0, 1.0)], dtype=RECORD_DTYPE)
+            history._write("^TNX", tnx)
+            
+            snapshots = SnapshotStore(tmp + "/snapshots")
+            data = {"Last Stock Price": 50.0, "Dividend Per Share (trailing)": 2.0,
+                    "Return on Equity (ROE)": 0.2, "Dividend Payout Ratio": 0.7, "Beta": 0.8}
+            snapshots.write_stock_data("2019-06-28", {"WMT": data, "KO": dict(data, **{"Last Stock Price": 20.0}),
+                                                      "XYZ": dict(data, **{"Beta": None})})
+            snapshots.write_stock_data("2019-12-31", {"WMT": dict(data, **{"Last Stock Price": 55.0}),
+                                                      "XYZ": data})
+            snapshots.write_stock_data("2020-06-30", {"WMT": data})
+            
+            # A snapshot on 2019-12-31 must not see the 2020 yield drop
+            market = market_inputs_at("2019-12-31", history)
+            periods = list(run_backtest(snapshots, history))
+            first = periods[0]
+            wmt = list(first.tickers).index("WMT")
+            year_fraction, _ = partial_year_fraction(datetime(2019, 6, 28))
+            expected = float(batch_intrinsic_value(2.0, 0.06, 0.02 + 0.8 * (0.1119 - 0.02), 0.035, year_fraction))
+            summary = summarize_period(first)
+            _, before_history = point_in_time_inputs("2018-06-29", history)
+            
+            # A ^TNX store seeded with a few days is refetched in full to reach back to the first snapshot
+            calls = []
+            def fetch_full(symbol, start=None, period="max"):
+                calls.append(period)
+                return days[:300], np.full(300, 3.0)
+            short = HistoryStore(tmp + "/short", fetch=fetch_full)
+            short._write("^TNX", tnx[-5:])
+            short.backfill("^TNX", "2019-06-28")
+            short.backfill("^TNX", "2019-06-28")
+            backfilled = short.load("^TNX")
+        
+        if abs(market.risk_free_rate - 0.02) < 1e-12 and len(periods) == 2 \
+                and list(first.tickers) == ["KO", "WMT", "XYZ"] and abs(first.value[wmt] - expected) < 1e-9 \
+                and list(first.signal) == [1, -1, 0] and np.isnan(first.forward_return[0]) \
+                and abs(first.forward_return[wmt] - (55.0 + 2.0 * (186 / 365.2425)) / 50.0 + 1) < 1e-3 \
+                and summary["buys"] == 1 and summary["sells"] == 1 and summary["buy_return"] is None \
+                and summary["default_inputs"] == "^SP500TR" and before_history == ("^TNX", "^SP500TR") \
+                and calls == ["max"] and len(backfilled) == 305 and backfilled["date"][0] == days[0]:
+            print(f"✓ Backtest values snapshots point-in-time (WMT {first.value[wmt]:.4f}, "
+                  f"forward return {first.forward_return[wmt]:.4f})")
+            return True
+        else:
+            print(f"✗ Backtest failed: market={market}, periods={periods}, summary={summary}, "
+                  f"defaults={before_history}, backfill calls={calls}")
+            return False
+            
+    except Exception as e:
+        print(f"✗ Backtest test failed: {e}")
+        traceback.print_exc()
+        return False
+
+def test_rolling_beta():
+    """Test rolling betas: batch window sums, incremental updates and the history store path"""
+    print("\nTesting rolling beta engine...")
+    
+    try:
+        import tempfile
+        import numpy as np
+        import history_store
+        import market_data
+        from betas import RollingBeta, rolling_beta
+        from market_data import get_rolling_beta, use_provider
+        from providers import ReplayProvider, history_path, read_history, write_history, write_synthetic_fixtures
+        
+        rng = np.random.default_rng(0)
+        market = rng.normal(0, 0.01, 600)
+        stocks = market[:, None] * np.array([0.5, 1.0, 1.5]) + rng.normal(0, 0.005, (600, 3))
+        stocks[:400, 2] = np.nan   # listed late
+        
+        betas = rolling_beta(stocks, market, window=100)
+        window = slice(500, 600)
+        expected = np.cov(stocks[window, 0], market[window])[0, 1] / np.var(market[window], ddof=1)
+        
+        engine = RollingBeta(["A", "B", "C"], window=100)
+        for day in range(600):
+            engine.update(stocks[day], market[day])
+        
+        with tempfile.TemporaryDirectory() as root:
+            write_synthetic_fixtures(f"{root}/source", ["WMT"], seed=1)
+            dates, closes = read_history(history_path(f"{root}/source", "^SP500TR"))
+            # A stock that moves 1.2× the market every day
+            returns = 1.2 * np.diff(closes) / closes[:-1]
+            write_history(history_path(f"{root}/source", "WMT"), dates, 50 * np.cumprod(np.r_[1, 1 + returns]))
+            with use_provider(ReplayProvider(f"{root}/source"), f"{root}/cache"):
+                history_beta = get_rolling_beta("wmt", window=252)
+                missing_beta = get_rolling_beta("KO")
+                cached = market_data._beta_engines[("WMT", 252)][1]
+                store = history_store.get_history_store()
+                # Seeded with two years for the one-year window, not the 25 years of fixtures
+                seeded_days = len(store.load("WMT"))
+                
+                # New days stored later are added to the kept engine instead of recomputing the window
+                for symbol, scale in (("WMT", 2.0), ("^SP500TR", 1.0)):
+                    records = store.load(symbol)
+                    new = np.empty(10, dtype=records.dtype)
+                    new["date"] = records["date"][-1] + np.arange(1, 11) * np.timedelta64(1, "D")
+                    new["close"] = records["close"][-1] * np.cumprod(1 + scale * np.tile([0.01, -0.01], 5))
+                    store._write(symbol, np.concatenate([records, new]))
+                caught_up_beta = get_rolling_beta("WMT", window=252)
+                rebuilt_beta = float(RollingBeta.from_history(["WMT"], store, 252).beta[0])
+                kept = market_data._beta_engines[("WMT", 252)][1] is cached
+                
+                # The last close is refetched with a different value: its return is swapped in the sums
+                for symbol, close in (("WMT", 1.05), ("^SP500TR", 1.0)):
+                    records = np.array(store.load(symbol))
+                    records["close"][-1] *= close
+                    new = records[-1:].copy()
+                    new["date"] += np.timedelta64(1, "D")
+                    store._write(symbol, np.concatenate([records, new]))
+                corrected_beta = get_rolling_beta("WMT", window=252)
+                corrected_rebuilt = float(RollingBeta.from_history(["WMT"], store, 252).beta[0])
+                
+                # A larger window refetches the ticker's history further back
+                long_beta = get_rolling_beta("WMT", window=1000)
+                backfilled_days = len(store.load("WMT"))
+                
+                # Stale histories take one token per download
+                tokens = []
+                limiter = type("Limiter", (), {"acquire": lambda self: tokens.append(1)})()
+                get_rolling_beta("PEP", limiter=limiter)
+        
+        if abs(betas[-1, 0] - expected) < 1e-12 and np.isnan(betas[448, 2]) and np.isfinite(betas[449, 2]) \
+                and np.allclose(engine.beta, betas[-1], rtol=0, atol=1e-12) \
+                and history_beta is not None and abs(history_beta - 1.2) < 1e-9 and missing_beta is None \
+                and kept and caught_up_beta > 1.2 and abs(caught_up_beta - rebuilt_beta) < 1e-9 and len(tokens) == 1 \
+                and 500 < seeded_days < 530 and abs(corrected_beta - corrected_rebuilt) < 1e-9 \
+                and abs(corrected_beta - caught_up_beta) > 1e-6 and backfilled_days > 1200 and long_beta is not None:
+            print(f"✓ Rolling betas agree in batch, incremental and stored-history paths ({history_beta:.4f})")
+            return True
+        else:
+            print(f"✗ Rolling beta failed: {betas[-1]} vs {expected}, engine {engine.beta}, "
+                  f"history {history_beta}, missing {missing_beta}, caught up {caught_up_beta} vs {rebuilt_beta}, "
+                  f"kept {kept}, tokens {len(tokens)}, seeded {seeded_days}, corrected {corrected_beta} vs "
+                  f"{corrected_rebuilt}, backfilled {backfilled_days}, long {long_beta}")
+            return False
+            
+    except Exception as e:
+        print(f"✗ Rolling beta test failed: {e}")
+        traceback.print_exc()
+        return False
+
+def test_result_cache():
+    """Test the shared result cache: LRU bounds, invalidation and request coalescing"""
+    print("\nTesting shared result cache...")
+    
+    try:
+        import threading
+        from concurrent.futures import ThreadPoolExecutor
+        from result_cache import ResultCache
+        
+        cache = ResultCache(max_entries=2, max_bytes=100, sizeof=lambda value: value[1])
+        cache.get_or_compute(("WMT", 1), lambda: ("wmt", 10))
+        cache.get_or_compute(("KO", 1), lambda: ("ko", 10))
+        cache.get_or_compute(("WMT", 1), lambda: ("recomputed", 10))    # hit, WMT becomes most recent
+        cache.get_or_compute(("PEP", 1), lambda: ("pep", 10))           # evicts KO
+        cache.get_or_compute(("BIG", 1), lambda: ("big", 1000))         # too large to keep
+        lru_ok = cache.get_or_compute(("WMT", 1), lambda: None)[0] == "wmt" and len(cache) == 2 \
+            and cache.get_or_compute(("KO", 1), lambda: ("ko2", 10))[0] == "ko2"
+        
+        cache.invalidate("KO")
+        invalidated = cache.get_or_compute(("KO", 1), lambda: ("ko3", 10))[0] == "ko3"
+        
+        # Eight concurrent identical requests share one computation
+        calls = []
+        release = threading.Event()
+        def slow():
+            calls.append(1)
+            release.wait(5)
+            return ("shared", 1)
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            futures = [pool.submit(cache.get_or_compute, ("MSFT", 1), slow) for _ in range(8)]
+            while cache.coalesced < 7 and not all(f.done() for f in futures):
+                threading.Event().wait(0.001)
+            release.set()
+            results = [f.result() for f in futures]
+        
+        # Failures reach the caller and are not cached
+        def failing():
+            raise ValueError("boom")
+        try:
+            cache.get_or_compute(("ERR", 1), failing)
+            raised = False
+        except ValueError:
+            raised = True
+        retried = cache.get_or_compute(("ERR", 1), lambda: ("ok", 1))[0] == "ok"
+        
+        if lru_ok and invalidated and len(calls) == 1 and results == [("shared", 1)] * 8 \
+                and raised and retried:
+            print(f"✓ Result cache bounds, invalidates and coalesces requests ({cache.stats()})")
+            return True
+        else:
+            print(f"✗ Result cache failed: lru={lru_ok}, invalidated={invalidated}, calls={len(calls)}, "
+                  f"results={results}, raised={raised}, retried={retried}")
+            return False
+            
+    except Exception as e:
+        print(f"✗ Result cache test failed: {e}")
+        traceback.print_exc()
+        return False
+
+def test_screener():
+    """Test constituent parsing and the streamed, ranked screener rows"""
+    print("\nTesting screener...")
+    
+    try:
+        from market_data import MarketInputs
+        from screener import rank, read_constituents, screen
+        
+        from_csv = read_constituents("Symbol,Security,Sector\nWMT,Walmart,Staples\nKO,Coca-Cola,Staples\nwmt,Walmart,\n")
+        from_text = read_constituents("WMT, KO\n# comment\npep  # trailing\n")
+        
+        def fetch(ticker, limiter=None):
+            if ticker == "BAD":
+                raise ConnectionError("unreachable")
+            price = {"WMT": 50.0, "KO": 30.0, "PEP": 40.0}[ticker]
+            return {"Company Name": ticker, "Last Stock Price": price, "Dividend Per Share (trailing)": 2.0,
+                    "Return on Equity (ROE)": 0.2, "Dividend Payout Ratio": 0.7, "Beta": 0.8}
+        
+        market = MarketInputs(risk_free_rate=0.04, sp500_cagr=0.1)
+        rows = list(screen(["WMT", "KO", "PEP", "BAD"], market, year_fraction=0.25, fetch=fetch, retries=1))
+        ranked = rank(rows)
+        bad = [row for row in rows if row["ticker"] == "BAD"][0]
+        
+        if from_csv == ["WMT", "KO"] and from_text == ["WMT", "KO", "PEP"] and len(rows) == 4 \
+                and [row["ticker"] for row in ranked] == ["KO", "PEP", "WMT"] \
+                and abs(ranked[0]["value_to_price"] - ranked[0]["intrinsic_value"] / 30.0) < 1e-12 \
+                and bad["value_to_price"] is None and "unreachable" in bad["error"]:
+            print(f"✓ Screener ranks the universe by value / price (top {ranked[0]['ticker']} "
+                  f"{ranked[0]['value_to_price']:.3f})")
+            return True
+        else:
+            print(f"✗ Screener failed: csv={from_csv}, text={from_text}, rows={rows}")
+            return False
+            
+    except Exception as e:
+        print(f"✗ Screener test failed: {e}")
+        traceback.print_exc()
+        return False
+
+def test_columnar_export():
+    """Test the chunked Arrow/Parquet export of valuation rows and its reload"""
+    print("\nTesting columnar export...")
+    
+    try:
+        import os
+        import tempfile
+        import numpy as np
+        import pyarrow as pa
+        from datetime import date
+        from market_data import MarketInputs
+        from result_export import ColumnarWriter, read_results
+        from valuation import value_stock
+        
+        data = {"Company Name": "Walmart", "Last Stock Price": 50.0, "Dividend Per Share (trailing)": 2.0,
+                "Return on Equity (ROE)": 0.2, "Dividend Payout Ratio": 0.7, "Beta": 0.8}
+        market = MarketInputs(risk_free_rate=0.04, sp500_cagr=0.1)
+        rows = [value_stock(ticker, dict(data, Beta=beta), market, year_fraction=0.25)
+                for ticker, beta in [("WMT", 0.8), ("KO", 0.6), ("PEP", None), ("PG", 1.1), ("JNJ", 0.7)]]
+        
+        tables = {}
+        with tempfile.TemporaryDirectory() as tmp:
+            for fmt in ("arrow", "parquet"):
+                for float32 in (False, True):
+                    path = f"{tmp}/results.{fmt}"
+                    # Two rows per chunk, so the file is written as several batches
+                    with ColumnarWriter(path, fmt, year_fraction=0.25, valuation_date=date(2024, 3, 29),
+                                        float32=float32, chunk_rows=2) as writer:
+                        for row in rows:
+                            writer.write(row)
+                    tables[fmt, float32] = read_results(path).combine_chunks()
+            
+            # An abort after close leaves the finished file alone, and close twice is harmless
+            writer = ColumnarWriter(f"{tmp}/kept.arrow", "arrow", year_fraction=0.25, chunk_rows=2)
+            for row in rows:
+                writer.write(row)
+            writer.close()
+            writer.close()
+            writer.abort()
+            kept = read_results(f"{tmp}/kept.arrow").num_rows
+            # An abort before close leaves nothing behind
+            writer = ColumnarWriter(f"{tmp}/dropped.parquet", "parquet", year_fraction=0.25)
+            writer.write(rows[0])
+            writer.abort()
+            writer.abort()
+            leftover = sorted(name for name in os.listdir(tmp) if name.startswith("dropped"))
+        
+        values = np.array([row["intrinsic_value"] or np.nan for row in rows])
+        checks = [kept == len(rows), leftover == []]
+        for (fmt, float32), table in tables.items():
+            period_pv = table.column("period_pv").combine_chunks().flatten().to_numpy().reshape(-1, 5)
+            tolerance = 1e-4 if float32 else 1e-9
+            checks.append(table.num_rows == 5
+                          and table.schema.field("price").type == (pa.float32() if float32 else pa.float64())
+                          and table.schema.field("valuation_date").type == pa.date32()
+                          and table.column("valuation_date")[0].as_py() == date(2024, 3, 29)
+                          and table.column("ticker").to_pylist() == [row["ticker"] for row in rows]
+                          and np.allclose(period_pv.sum(axis=1), values, rtol=tolerance, equal_nan=True)
+                          and table.column("intrinsic_value")[2].as_py() is None
+                          and table.column("error")[2].as_py() == "missing beta")
+        
+        if all(checks):
+            print(f"✓ Columnar export round-trips {len(rows)} rows in chunks (Arrow and Parquet, float32 and float64)")
+            return True
+        else:
+            print(f"✗ Columnar export failed: checks={checks}")
+            return False
+            
+    except Exception as e:
+        print(f"✗ Columnar export test failed: {e}")
+        traceback.print_exc()
+        return False
+
+def test_api():
+    """Test the async HTTP API: single and batch valuations on one keep-alive connection, backpressure"""
+    print("\nTesting valuation HTTP API...")
+    
+    try:
+        import asyncio
+        import json
+        import threading
+        from api import ValuationService, start_server
+        from market_data import MarketInputs
+        from valuation import value_stock
+        from warmup import MarketWarmer
+        
+        data = {"Company Name": "Walmart", "Last Stock Price": 50.0, "Dividend Per Share (trailing)": 2.0,
+                "Return on Equity (ROE)": 0.2, "Dividend Payout Ratio": 0.7, "Beta": 0.8}
+        calls = []
+        release = threading.Event()
+        
+        def fetch(ticker, limiter=None):
+            calls.append(ticker)
+            if ticker == "SLOW":
+                release.wait(5)
+            if ticker == "BAD":
+                raise ConnectionError("unreachable")
+            return data
+        
+        market = MarketInputs(risk_free_rate=0.04, sp500_cagr=0.1)
+        warmer = MarketWarmer(fetch_market=lambda refresh=False: market, data_time=None)
+        warmer.refresh()
+        
+        def unreachable(refresh=False):
+            raise ConnectionError("unreachable")
+        
+        # The first refresh failed, so the defaults are in use and responses say so
+        failing = MarketWarmer(fetch_market=unreachable, data_time=None)
+        failing.refresh()
+        
+        async def exchange(reader, writer, raw):
+            writer.write(raw)
+            await writer.drain()
+            head = (await reader.readuntil(b"\r\n\r\n")).decode("latin-1").split("\r\n")
+            length = next(int(line.split(":")[1]) for line in head if line.lower().startswith("content-length"))
+            return int(head[0].split(" ")[1]), json.loads(await reader.readexactly(length))
+        
+        async def session():
+            service = ValuationService(fetch=fetch, warmer=warmer, retries=0, max_pending=2)
+            server = await start_server(service, port=0)
+            reader, writer = await asyncio.open_connection("127.0.0.1", server.sockets[0].getsockname()[1])
+            single = await exchange(reader, writer, b"GET /value/wmt?years=10 HTTP/1.1\r\nHost: test\r\n\r\n")
+            body = json.dumps({"tickers": ["KO", "BAD"], "cost_of_equity": 0.09}).encode()
+            batch = await exchange(reader, writer, b"POST /value HTTP/1.1\r\nContent-Length: %d\r\n\r\n" % len(body)
+                                   + body)
+            # Two requests for a slow ticker fill the limit and share one fetch; a third is refused
+            slow = [asyncio.ensure_future(service.value("SLOW")) for _ in range(2)]
+            service.admit(2)
+            refused = await exchange(reader, writer, b"GET /value/PEP HTTP/1.1\r\n\r\n")
+            release.set()
+            await asyncio.gather(*slow)
+            service.release(2)
+            missing = await exchange(reader, writer, b"GET /nowhere HTTP/1.1\r\n\r\n")
+            writer.close()
+            server.close()
+            await server.wait_closed()
+            service.close()
+            defaulted = ValuationService(fetch=fetch, warmer=failing, retries=0)
+            _, fallback = await defaulted.value("WMT")
+            defaulted.close()
+            return single, batch, refused, missing, defaulted.describe_market(fallback)
+        
+        single, batch, refused, missing, fallback = asyncio.run(session())
+        # Valued a moment after the server did, so the partial year is a few milliseconds shorter
+        expected = value_stock("WMT", data, market, years=10)["intrinsic_value"]
+        results = batch[1]["results"]
+        
+        if single[0] == 200 and single[1]["ticker"] == "WMT" and abs(single[1]["intrinsic_value"] - expected) < 1e-6 \
+                and batch[0] == 200 and [row["ticker"] for row in results] == ["KO", "BAD"] \
+                and results[0]["k_e"] == 0.09 and results[1]["error"] == "unreachable" \
+                and single[1]["market"]["source"] == batch[1]["market"]["source"] == "live" \
+                and single[1]["market"]["risk_free_rate"] == 0.04 and not single[1]["market"]["stale"] \
+                and fallback["source"] == "default" and fallback["stale"] and fallback["age"] is None \
+                and refused[0] == 503 and missing[0] == 404 and calls.count("SLOW") == 1:
+            print(f"✓ HTTP API values tickers over one connection and refuses work beyond its limit "
+                  f"(WMT {single[1]['intrinsic_value']:.2f})")
+            return True
+        else:
+            print(f"✗ HTTP API failed: single={single}, batch={batch}, refused={refused}, missing={missing}, "
+                  f"fallback={fallback}, calls={calls}")
+            return False
+            
+    except Exception as e:
+        print(f"✗ HTTP API test failed: {e}")
+        traceback.print_exc()
+        return False
+
+def test_market_warmer():
+    """Test the background market input warm-up: published snapshots, failures and staleness"""
+    print("\nTesting market input warm-up...")
+    
+    try:
+        from market_data import MarketInputs
+        from warmup import DEFAULT_SNAPSHOT, MarketWarmer
+        
+        now = [1000.0]
+        inputs = [MarketInputs(0.04, 0.1), ConnectionError("unreachable"), MarketInputs(0.05, 0.1)]
+        warmed = []
+        
+        def fetch_market(refresh=False):
+            result = inputs.pop(0)
+            if isinstance(result, Exception):
+                raise result
+            return result
+        
+        def fetch_stock(ticker, limiter=None):
+            warmed.append(ticker)
+            return {}
+        
+        warmer = MarketWarmer(interval=60, fetch_market=fetch_market, clock=lambda: now[0], data_time=None)
+        before = warmer.snapshot()
+        first = warmer.refresh()
+        now[0] += 150
+        # A failed refresh keeps the last good inputs, which are now older than two intervals
+        failed = warmer.refresh()
+        stale = failed.is_stale(warmer.max_age, now=now[0])
+        second = warmer.refresh()
+        
+        # Snapshots carry the time the stored data was downloaded; data older than the interval is refetched
+        downloaded = [now[0] - 30]
+        forced = []
+        def fetch_stored(refresh=False):
+            forced.append(refresh)
+            if refresh:
+                downloaded[0] = now[0]
+            return MarketInputs(0.04, 0.1)
+        stored = MarketWarmer(interval=60, fetch_market=fetch_stored, clock=lambda: now[0],
+                              data_time=lambda: downloaded[0])
+        reused = stored.refresh()
+        reused_age = reused.age(now=now[0])
+        now[0] += 100
+        refetched = stored.refresh()
+        
+        background = MarketWarmer(interval=60, watchlist=["WMT", "KO"], fetch_stock=fetch_stock, data_time=None,
+                                  fetch_market=lambda refresh: MarketInputs(0.03, 0.09)).start()
+        ready = background.wait_ready(5)
+        background.stop(5)
+        
+        if before is DEFAULT_SNAPSHOT and before.is_stale(60) and first.inputs.risk_free_rate == 0.04 \
+                and first.source == "live" and failed is first and stale and warmer.failures == 1 \
+                and second.inputs.risk_free_rate == 0.05 and not second.is_stale(warmer.max_age, now=now[0] - 100) \
+                and forced == [False, True] and reused_age == 30 and refetched.age(now=now[0]) == 0 \
+                and ready and background.snapshot().inputs.risk_free_rate == 0.03 and sorted(warmed) == ["KO", "WMT"]:
+            print("✓ Market warmer publishes snapshots, keeps the last good one on failure and flags staleness")
+            return True
+        else:
+            print(f"✗ Market warmer failed: before={before}, first={first}, failed={failed}, second={second}, "
+                  f"forced={forced}, reused={reused}, refetched={refetched}, background={background.snapshot()}, "
+                  f"warmed={warmed}")
+            return False
+            
+    except Exception as e:
+        print(f"✗ Market warmer test failed: {e}")
+        traceback.print_exc()
+        return False
+
+def test_charts():
+    """Test the server-side reduction of large chart data and the figure size reporting"""
+    print("\nTesting lightweight charts...")
+    
+    try:
+        import numpy as np
+        from charts import (binned_histogram, counts_figure, decimate, downsample_grid, histogram_figure,
+                            report_figure, scatter_figure)
+        from instrumentation import start_trace, stop_trace
+        
+        rng = np.random.default_rng(0)
+        values = np.append(rng.lognormal(3, 0.5, 1_000_000), np.nan)
+        centres, counts, width = binned_histogram(values, bins=50)
+        histogram = histogram_figure(values, "Values", "Value", total=len(values))
+        # 4000 counted bins merge into 100 bars of 40
+        counted = counts_figure(np.linspace(0, 4000, 4001), np.ones(4000, dtype=np.int64), "Counts", "Value")
+        
+        x, y = rng.normal(size=50_000), rng.normal(size=50_000)
+        scatter = scatter_figure(x, y, "Scatter", "x", "y", text=[str(i) for i in range(len(x))], max_points=1000)
+        shown_x = np.asarray(scatter.data[0].x)
+        kept = decimate(10, 4, keep=[7])
+        
+        grid_x, grid_y, grid = downsample_grid(np.arange(200), np.arange(300), np.zeros((300, 200)), max_cells=10_000)
+        
+        untraced = report_figure("histogram", histogram)
+        start_trace()
+        try:
+            size = report_figure("histogram", histogram)
+        finally:
+            stop_trace()
+        
+        if len(centres) == 50 and 0.98 < counts.sum() / 1_000_000 < 0.995 \
+                and len(histogram.data[0].x) == 100 and scatter.data[0].type == "scattergl" \
+                and len(shown_x) <= 1000 and np.float32(x.max()) in shown_x and np.float32(x.min()) in shown_x \
+                and 7 in kept and len(kept) <= 4 and grid.size <= 10_000 and grid.shape == (len(grid_y), len(grid_x)) \
+                and untraced is None and 0 < size < 20_000 and len(counted.data[0].x) == 100 \
+                and counted.data[0].x[0] == 20 and counted.data[0].width == 40 \
+                and abs(sum(counted.data[0].y) - 1) < 1e-6:
+            print(f"✓ Charts reduce 1,000,000 values to {len(histogram.data[0].x)} bars ({size / 1024:.1f} KB) "
+                  f"and 50,000 points to {len(shown_x)}")
+            return True
+        else:
+            print(f"✗ Charts failed: bins={len(centres)}, counted={counts.sum()}, shown={len(shown_x)}, "
+                  f"kept={kept}, grid={grid.shape}, sizes={untraced}, {size}")
+            return False
+            
+    except Exception as e:
+        print(f"✗ Charts test failed: {e}")
+        traceback.print_exc()
+        return False
+
+def test_fundamentals_table():
+    """Test the columnar fundamentals store: in-place updates, growth and batch valuation"""
+    print("\nTesting fundamentals table...")
+    
+    try:
+        import numpy as np
+        from backtest import value_snapshot
+        from fetch_pipeline import FetchResult
+        from fundamentals_table import FundamentalsTable
+        from market_data import MarketInputs, stock_data_from_info
+        from valuation import value_stock
+        
+        market = MarketInputs(0.04, 0.10)
+        rng = np.random.default_rng(0)
+        stock_data = {}
+        for i in range(40):
+            stock_data[f"t{i:03d}"] = stock_data_from_info({
+                "currentPrice": float(rng.uniform(10, 400)), "trailingAnnualDividendRate": float(rng.uniform(0.2, 5)),
+                "beta": float(rng.uniform(0.3, 1.8)), "returnOnEquity": float(rng.uniform(0.05, 0.35)),
+                "payoutRatio": float(rng.uniform(0.2, 0.9)), "sharesOutstanding": 10**9,
+            })
+        stock_data["t001"]["Beta"] = None
+        
+        table = FundamentalsTable(capacity=4, dtype=np.float32)
+        failed = table.update_results([FetchResult(t, d, None, 0.0) for t, d in stock_data.items()]
+                                      + [FetchResult("BAD", None, ValueError("boom"), 0.0)])
+        rows = table.update_many(["T002", "NEW"], price=[1.0, 2.0])
+        values = table.value(market, year_fraction=0.5)
+        expected = [value_stock(t, d, market, year_fraction=0.5)["intrinsic_value"] for t, d in stock_data.items()]
+        expected = np.array([np.nan if v is None else v for v in expected])
+        snapshot_values, _ = value_snapshot(table, market, "2024-07-01")
+        # Symbols are interned, so a second table of the same tickers shares their strings
+        other = FundamentalsTable.from_stock_data({"".join(["t", "002"]): stock_data["t002"]})
+        
+        if failed == 1 and len(table) == 41 and table.capacity == 64 and table["price"].dtype == np.float32 \
+                and list(rows) == [2, 40] and table.record("t002").price == 1.0 and table.record("NEW").roe is None \
+                and table.rows(["T000", "MISSING"]).tolist() == [0, -1] and "t039" in table \
+                and np.allclose(values[:40], expected, rtol=1e-5, equal_nan=True) and np.isnan(values[1]) \
+                and np.isnan(values[40]) and len(snapshot_values) == 41 and other.tickers[0] is table.tickers[2]:
+            print(f"✓ Fundamentals table holds {len(table)} tickers in {table.nbytes:,} bytes of columns "
+                  f"and values them in one call")
+            return True
+        else:
+            print(f"✗ Fundamentals table failed: failed={failed}, rows={len(table)}/{table.capacity}, "
+                  f"updated={list(rows)}, values={values[:3]}, expected={expected[:3]}")
+            return False
+            
+    except Exception as e:
+        print(f"✗ Fundamentals table test failed: {e}")
+        traceback.print_exc()
+        return False
+
 def test_stock_data():
     """Test stock data fetching (requires internet)"""
     print("\nTesting stock data fetching...")
     
     try:
-        from app import get_stock_data
+        from market_data import fetch_stock_data
         
         # Test with a well-known stock
-        data = get_stock_data("AAPL")
+        data = fetch_stock_data("AAPL")
         
         if data and data.get("Company Name"):
             print(f"✓ Successfully fetched data for {data['Company Name']}")
@@ -125,6 +1219,86 @@ def main():
         print("\n❌ Function tests failed.")
         sys.exit(1)
     
+    if not test_batch_engine():
+        print("\n❌ Batch engine tests failed.")
+        sys.exit(1)
+    
+    if not test_multi_stage():
+        print("\n❌ Multi-stage engine tests failed.")
+        sys.exit(1)
+    
+    if not test_implied_returns():
+        print("\n❌ Implied return tests failed.")
+        sys.exit(1)
+    
+    if not test_valuation_report():
+        print("\n❌ Valuation report tests failed.")
+        sys.exit(1)
+    
+    if not test_fundamentals_cache():
+        print("\n❌ Fundamentals cache tests failed.")
+        sys.exit(1)
+    
+    if not test_history_store():
+        print("\n❌ History store tests failed.")
+        sys.exit(1)
+    
+    if not test_fetch_pipeline():
+        print("\n❌ Fetch pipeline tests failed.")
+        sys.exit(1)
+    
+    if not test_monte_carlo():
+        print("\n❌ Monte Carlo tests failed.")
+        sys.exit(1)
+    
+    if not test_instrumentation():
+        print("\n❌ Instrumentation tests failed.")
+        sys.exit(1)
+    
+    if not test_replay_provider():
+        print("\n❌ Replay provider tests failed.")
+        sys.exit(1)
+    
+    if not test_cli():
+        print("\n❌ CLI tests failed.")
+        sys.exit(1)
+    
+    if not test_backtest():
+        print("\n❌ Backtest tests failed.")
+        sys.exit(1)
+    
+    if not test_rolling_beta():
+        print("\n❌ Rolling beta tests failed.")
+        sys.exit(1)
+    
+    if not test_result_cache():
+        print("\n❌ Result cache tests failed.")
+        sys.exit(1)
+    
+    if not test_screener():
+        print("\n❌ Screener tests failed.")
+        sys.exit(1)
+    
+    if not test_columnar_export():
+        print("\n❌ Columnar export tests failed.")
+        sys.exit(1)
+    
+    if not test_api():
+        print("\n❌ HTTP API tests failed.")
+        sys.exit(1)
+    
+    if not test_market_warmer():
+        print("\n❌ Market warm-up tests failed.")
+        sys.exit(1)
+    
+    if not test_charts():
+        print("\n❌ Chart tests failed.")
+        sys.exit(1)
+    
+    if not test_fundamentals_table():
+        print("\n❌ Fundamentals table tests failed.")
+        sys.exit(1)
+    
     # Test stock data (optional)
     test_stock_data()
     
@@ -0,0 +1,87 @@
+"""
+UI-free valuation of one ticker from its fetched data.
+
+This applies the page's default approach (growth = ROE × plowback, cost of
+equity from CAPM unless given) to the dict returned by
+``market_data.fetch_stock_data``, for the CLI and other batch callers.
+"""
+
+import math
+
+import numpy as np
+
+from ddm_core import FORECAST_YEARS, batch_intrinsic_value, implied_cost_of_equity, partial_year_fraction
+
+DEFAULT_LONG_TERM_GROWTH = 0.035
+
+RESULT_FIELDS = ("ticker", "name", "price", "trailing_dividend", "growth", "k_e",
+                 "intrinsic_value", "upside", "implied_return", "error")
+
+
+def value_stock(ticker, data, market, long_term_growth=DEFAULT_LONG_TERM_GROWTH, k_e=None,
+                year_fraction=None, years=FORECAST_YEARS):
+    """
+    Value ``ticker`` and return a dict with RESULT_FIELDS as keys.
+
+    Missing or unusable inputs are reported in ``error`` instead of raising.
+    """
+    return value_stocks([ticker], [data], market, long_term_growth, k_e, year_fraction, years)[0]
+
+
+def value_stocks(tickers, data, market, long_term_growth=DEFAULT_LONG_TERM_GROWTH, k_e=None,
+                 year_fraction=None, years=FORECAST_YEARS):
+    """
+    value_stock for many tickers at once, ``data`` holding the fetched dict
+    (or None) of each ticker. The values and implied returns of the whole
+    batch come from one batch_intrinsic_value and one implied_cost_of_equity
+    call. Returns the rows in the order of ``tickers``.
+    """
+    if year_fraction is None:
+        year_fraction, _ = partial_year_fraction()
+    rows = []
+    valued = []
+    for ticker, stock in zip(tickers, data):
+        row = dict.fromkeys(RESULT_FIELDS)
+        row["ticker"] = ticker
+        rows.append(row)
+        if stock is None:
+            row["error"] = "no data"
+            continue
+
+        row["name"] = stock.get("Company Name")
+        row["price"] = stock.get("Last Stock Price")
+        row["trailing_dividend"] = dividend = stock.get("Dividend Per Share (trailing)")
+        roe = stock.get("Return on Equity (ROE)")
+        payout = stock.get("Dividend Payout Ratio")
+        beta = stock.get("Beta")
+
+        missing = [name for name, value in (("dividend", dividend), ("ROE", roe), ("payout ratio", payout))
+                   if value is None]
+        if k_e is None and beta is None:
+            missing.append("beta")
+        if missing:
+            row["error"] = "missing " + ", ".join(missing)
+            continue
+
+        row["growth"] = roe * (1 - payout)
+        row["k_e"] = market.risk_free_rate + beta * market.market_risk_premium if k_e is None else k_e
+        valued.append(row)
+    if not valued:
+        return rows
+
+    dividend, growth, cost, price = (np.array([np.nan if row[key] is None else row[key] for row in valued],
+                                              dtype=np.float64)
+                                     for key in ("trailing_dividend", "growth", "k_e", "price"))
+    values = batch_intrinsic_value(dividend, growth, cost, long_term_growth, year_fraction, years)
+    # No implied return without a price; the solver gives NaN for a non-positive one
+    implied = implied_cost_of_equity(np.where(price != 0, price, np.nan), dividend, growth, long_term_growth,
+                                     year_fraction, years)
+    for row, value, implied_return in zip(valued, values.tolist(), implied.tolist()):
+        if math.isnan(value):
+            row["error"] = "cost of equity does not exceed long-term growth"
+            continue
+        row["intrinsic_value"] = value
+        if row["price"]:
+            row["upside"] = value / row["price"] - 1
+            row["implied_return"] = None if math.isnan(implied_return) else implied_return
+    return rows
@@ -0,0 +1,160 @@
+"""
+Cash flow table, chart and sensitivity heatmap for one valuation, as shown on the Streamlit page.
+
+Kept out of app.py so the stages can be benchmarked without a running page.
+pandas and plotly are imported inside the functions that need them, so
+importing this module stays cheap.
+"""
+
+import numpy as np
+from dateutil.relativedelta import relativedelta
+
+from charts import downsample_grid
+from ddm_core import perpetuity_pv, sensitivity_grid
+from instrumentation import stage
+
+# Columns rounded to cents in the displayed table
+DISPLAY_NUMERIC_COLUMNS = ['Dividend Cash Flows', 'Dividend Growth from Previous',
+                           'Adjustment for Partial Year', 'Adjusted Dividend Cash Flow',
+                           'Terminal Value', 'Period Sum', 'Period PV']
+
+
+def cash_flow_schedule(cf_list, div_growth_from_prev, year_fraction, div_payment_date, k_e, long_term_growth):
+    """Columns of the cash flow table as plain lists, one entry per forecast year"""
+    years = len(cf_list)
+    periods = list(range(1, years + 1))
+    adjustment_for_partial_year_list = [year_fraction] + [1.0] * (years - 1)
+    
+    terminal_value = [0] * years
+    terminal_value[-1] = perpetuity_pv(cf_list[-1], long_term_growth, k_e)
+    
+    dividend_dates = [div_payment_date + relativedelta(years=i) for i in range(years)]
+    periods_to_discount = [i + year_fraction for i in range(years)]
+    
+    adjusted_cash_flows = [a*b for a, b in zip(cf_list, adjustment_for_partial_year_list)]
+    in_period_sum = [sum(x) for x in zip(adjusted_cash_flows, terminal_value)]
+    period_pv = [a/(1+k_e)**b for a, b in zip(in_period_sum, periods_to_discount)]
+    
+    return {
+        'Periods': periods, 
+        'Dividend Date': dividend_dates, 
+        'Periods to Discount': periods_to_discount, 
+        'Dividend Cash Flows': list(cf_list),
+        'Dividend Growth from Previous': list(div_growth_from_prev),
+        'Adjustment for Partial Year': adjustment_for_partial_year_list,
+        'Adjusted Dividend Cash Flow': adjusted_cash_flows,
+        'Terminal Value': terminal_value,
+        'Period Sum': in_period_sum,
+        'Period PV': period_pv
+    }
+
+
+def build_cash_flow_table(schedule):
+    """DataFrame of a cash_flow_schedule, indexed by period"""
+    import pandas as pd
+    
+    return pd.DataFrame(schedule).set_index('Periods')
+
+
+def build_display_table(cash_flow_table):
+    """Rounded, transposed copy of the cash flow table for display"""
+    display_table = cash_flow_table.copy()
+    
+    # Convert dates to strings to avoid Arrow serialization issues
+    display_table['Dividend Date'] = display_table['Dividend Date'].astype(str)
+    
+    for col in DISPLAY_NUMERIC_COLUMNS:
+        if col in display_table.columns:
+            display_table[col] = display_table[col].round(2)
+    
+    return display_table.T
+
+
+def build_cash_flow_figure(cash_flow_table):
+    """Stacked bars of dividends and terminal value with the present value per period"""
+    import plotly.graph_objects as go
+    
+    plot_data = cash_flow_table.reset_index()
+    
+    fig = go.Figure()
+    
+    # Add dividend cash flows
+    fig.add_trace(go.Bar(
+        x=plot_data['Periods'],
+        y=plot_data['Dividend Cash Flows'],
+        name='Dividend Cash Flows',
+        marker_color='lightblue'
+    ))
+    
+    # Add terminal value
+    fig.add_trace(go.Bar(
+        x=plot_data['Periods'],
+        y=plot_data['Terminal Value'],
+        name='Terminal Value',
+        marker_color='orange'
+    ))
+    
+    # Add present values
+    fig.add_trace(go.Scatter(
+        x=plot_data['Periods'],
+        y=plot_data['Period PV'],
+        mode='lines+markers',
+        name='Present Value',
+        line=dict(color='red', width=3)
+    ))
+    
+    fig.update_layout(
+        title="Cash Flow Breakdown by Period",
+        xaxis_title="Period",
+        yaxis_title="Value ($)",
+        barmode='stack',
+        height=500
+    )
+    
+    return fig
+
+
+def build_sensitivity_figure(cf_list, year_fraction, k_e, long_term_growth, points=200):
+    """
+    Heatmap of the intrinsic value of the same cash flows over a ``points`` ×
+    ``points`` grid of cost of equity and long-term growth around the chosen
+    inputs, marked with an x
+    """
+    import plotly.graph_objects as go
+    
+    ke_values = np.linspace(max(k_e - 0.05, 0.0), k_e + 0.05, points)
+    lt_growth_values = np.linspace(max(long_term_growth - 0.03, 0.0), long_term_growth + 0.03, points)
+    with stage("compute.sensitivity_grid"):
+        grid = sensitivity_grid(cf_list, year_fraction, ke_values, lt_growth_values)
+    
+    # Values explode as k_e approaches g, so clip the colour scale to the bulk of the grid
+    zmin, zmax = np.nanpercentile(grid, [1, 95]) if np.isfinite(grid).any() else (None, None)
+    
+    # Sent at no more than MAX_HEATMAP_CELLS cells and in float32; the colour scale uses the full grid
+    shown_g, shown_ke, shown_grid = downsample_grid(lt_growth_values * 100, ke_values * 100, grid)
+    fig = go.Figure(go.Heatmap(
+        x=shown_g,
+        y=shown_ke,
+        z=shown_grid.astype(np.float32),
+        zmin=zmin,
+        zmax=zmax,
+        colorscale='RdYlGn',
+        colorbar=dict(title='Value ($)'),
+        hovertemplate='g: %{x:.2f}%<br>k_e: %{y:.2f}%<br>Value: $%{z:,.2f}<extra></extra>'
+    ))
+    fig.add_trace(go.Scatter(
+        x=[long_term_growth * 100],
+        y=[k_e * 100],
+        mode='markers',
+        marker=dict(color='black', size=10, symbol='x'),
+        name='Current Inputs',
+        hoverinfo='skip'
+    ))
+    fig.update_layout(
+        title="Intrinsic Value Sensitivity",
+        xaxis_title="Long-term Growth (%)",
+        yaxis_title="Cost of Equity (%)",
+        height=500
+    )
+    
+    return fig
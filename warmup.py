@@ -0,0 +1,203 @@
+"""
+Background warm-up of the market-wide inputs shared by every valuation.
+
+The risk-free rate (^TNX) and the S&P 500 CAGR (^SP500TR) are the same for
+every ticker and change at most daily, so they do not belong on a user's
+critical path. ``MarketWarmer`` refreshes them on a daemon thread every
+``interval`` seconds - and, optionally, the fundamentals of a watchlist, so
+the first click on a popular ticker is a cache hit - and publishes the
+result as an immutable ``MarketSnapshot``:
+
+- readers call ``snapshot()`` and get the latest published snapshot without
+  taking a lock or waiting on the network; a new snapshot replaces the old
+  one in a single assignment;
+- every snapshot carries the time its data was downloaded (the history
+  store's last refresh of ^TNX and ^SP500TR, not the time the snapshot was
+  published), so callers can show its age and whether it is stale;
+- a failed refresh keeps the last good snapshot (and records the error)
+  instead of silently swapping in the hard-coded defaults. Only before the
+  first successful refresh does ``snapshot()`` return the defaults, marked
+  as such.
+
+A refresh only asks the history store to go back to the network once the
+stored data is older than ``interval``, instead of waiting for the store's
+own, much longer, refresh interval; the store then downloads only the days
+it is missing, so frequent refreshes stay cheap. Like market_data.py, this
+module never imports streamlit.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import namedtuple
+
+from fetch_pipeline import fetch_universe
+from market_data import (DEFAULT_EQUITY_RETURN, DEFAULT_RISK_FREE_RATE, MarketInputs, fetch_market_inputs,
+                         fetch_stock_data, market_inputs_refreshed_at)
+
+logger = logging.getLogger("ddm.warmup")
+
+DEFAULT_INTERVAL = 15 * 60      # seconds between refreshes
+DEFAULT_WATCHLIST_RATE = 2.0    # watchlist fetches per second, to stay well clear of the user's requests
+MARKET_WARMUP_WAIT = 10.0       # longest a click or request waits for the first refresh, right after start-up
+
+
+class MarketSnapshot(namedtuple("MarketSnapshot", ["inputs", "fetched_at", "source"])):
+    """
+    Market inputs published by MarketWarmer.
+
+    ``fetched_at`` is the Unix time the data was downloaded (None for the
+    defaults) and ``source`` is "live" or "default".
+    """
+    __slots__ = ()
+
+    def age(self, now=None):
+        """Seconds since the data was downloaded, None for the defaults"""
+        if self.fetched_at is None:
+            return None
+        return (time.time() if now is None else now) - self.fetched_at
+
+    def is_stale(self, max_age, now=None):
+        """True for the defaults and for inputs older than ``max_age`` seconds"""
+        age = self.age(now)
+        return age is None or age > max_age
+
+
+DEFAULT_SNAPSHOT = MarketSnapshot(MarketInputs(DEFAULT_RISK_FREE_RATE, DEFAULT_EQUITY_RETURN), None, "default")
+
+
+class MarketWarmer:
+    """
+    Refreshes the market inputs, and a watchlist's fundamentals, on a background thread.
+
+    ``data_time()`` returns the Unix time the data behind ``fetch_market``
+    was last downloaded, or None if it never was. With ``data_time=None``
+    snapshots are stamped with the time of the refresh, for a
+    ``fetch_market`` that always goes to the network.
+    """
+
+    def __init__(self, interval=DEFAULT_INTERVAL, watchlist=(), fetch_market=fetch_market_inputs,
+                 fetch_stock=fetch_stock_data, watchlist_rate=DEFAULT_WATCHLIST_RATE, clock=time.time,
+                 data_time=market_inputs_refreshed_at):
+        self.interval = interval
+        self.watchlist = list(watchlist)
+        self.fetch_market = fetch_market
+        self.fetch_stock = fetch_stock
+        self.data_time = data_time
+        self.watchlist_rate = watchlist_rate
+        self.clock = clock
+        self.refreshes = 0
+        self.failures = 0
+        self.last_error = None
+        self._snapshot = None
+        self._ready = threading.Event()
+        self._stop = threading.Event()
+        self._refresh_lock = threading.Lock()
+        self._thread = None
+
+    def snapshot(self):
+        """The latest published snapshot, or DEFAULT_SNAPSHOT before the first successful refresh"""
+        snapshot = self._snapshot
+        return DEFAULT_SNAPSHOT if snapshot is None else snapshot
+
+    @property
+    def max_age(self):
+        """Age beyond which a snapshot counts as stale: two missed refreshes"""
+        return 2 * self.interval
+
+    def wait_ready(self, timeout=None):
+        """Wait until the first refresh has finished, successfully or not; True if it has"""
+        return self._ready.wait(timeout)
+
+    def refresh(self, force=False):
+        """
+        Fetch the market inputs and publish them, stamped with the time their
+        data was downloaded. Stored data older than ``interval`` is refetched,
+        and ``force`` refetches it anyway. Returns the published snapshot; on
+        failure the previous one stays published.
+        """
+        with self._refresh_lock:
+            try:
+                if not force and self.data_time is not None:
+                    downloaded = self.data_time()
+                    force = downloaded is None or self.clock() - downloaded > self.interval
+                inputs = self.fetch_market(force)
+                fetched_at = self.data_time() if self.data_time is not None else None
+            except Exception as e:
+                self.failures += 1
+                self.last_error = e
+                logger.warning("market input refresh failed: %s", e)
+            else:
+                if fetched_at is None:
+                    fetched_at = self.clock()
+                # One assignment, so readers see either the old or the new snapshot
+                self._snapshot = MarketSnapshot(inputs, fetched_at, "live")
+                self.refreshes += 1
+                self.last_error = None
+            finally:
+                self._ready.set()
+            return self.snapshot()
+
+    def warm_watchlist(self):
+        """Fetch the watchlist's fundamentals into the cache; returns how many tickers failed"""
+        failed = 0
+        for result in fetch_universe(self.watchlist, max_workers=4, rate=self.watchlist_rate, retries=1,
+                                     fetch=self.fetch_stock):
+            failed += result.error is not None
+        return failed
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.refresh()
+            if self.watchlist:
+                try:
+                    self.warm_watchlist()
+                except Exception as e:
+                    logger.warning("watchlist warm-up failed: %s", e)
+            self._stop.wait(self.interval)
+
+    def start(self):
+        """Start refreshing in the background; does nothing if already running"""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="ddm-market-warmer", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+
+def watchlist_from_env():
+    """Tickers in $DDM_WARMUP_WATCHLIST, separated by commas or whitespace"""
+    return os.environ.get("DDM_WARMUP_WATCHLIST", "").replace(",", " ").upper().split()
+
+
+_default_warmer = None
+_default_lock = threading.Lock()
+
+
+def get_market_warmer():
+    """
+    Process-wide warmer shared by every session, started on first use.
+
+    Configured by $DDM_WARMUP_INTERVAL (seconds) and $DDM_WARMUP_WATCHLIST.
+    """
+    global _default_warmer
+    with _default_lock:
+        if _default_warmer is None:
+            interval = float(os.environ.get("DDM_WARMUP_INTERVAL", DEFAULT_INTERVAL))
+            _default_warmer = MarketWarmer(interval, watchlist_from_env()).start()
+        return _default_warmer
+
+
+def set_market_warmer(warmer):
+    """Replace the process-wide warmer, stopping the previous one; None creates a new one on next use"""
+    global _default_warmer
+    with _default_lock:
+        previous, _default_warmer = _default_warmer, warmer
+    if previous is not None and previous is not warmer:
+        previous.stop(timeout=0)